@@ -1,13 +1,19 @@
-import os
 from datetime import datetime, timezone
 
-import requests
 from flask import flash, redirect, render_template, request, session, url_for, jsonify
 
 from admin import admin_bp
-from auth_utils import hash_password, login_required
+from auth_utils import PasswordBusyError, hash_password, login_required
+from dashboard import dashboard_cache
+from enrichment import enqueue as enqueue_enrichment
+from geocoding import cache_stats, geocode_address
+from http_client import provider_stats
+from metrics import metrics, token_ok
 from models import FieldWork, Job, User, db
-from utils import get_brevard_property_link, get_county_from_coords
+from pagination import job_total, keyset_paginate
+from property_links import cache_stats as property_cache_stats
+from serializers import JobSerializer, UserSerializer
+from versioning import conditional
 
 
 @admin_bp.route("/")
@@ -51,9 +57,12 @@ def create_user():
         flash("User already exists.")
         return redirect(url_for("admin.admin_users"))
 
-    new_user = User(
-        username=username, name=name, password=hash_password(password), role=role
-    )
+    try:
+        hashed = hash_password(password)
+    except PasswordBusyError:
+        flash("Server is busy. Please try again.")
+        return redirect(url_for("admin.admin_users"))
+    new_user = User(username=username, name=name, password=hashed, role=role)
     db.session.add(new_user)
     db.session.commit()
     flash("User created successfully.")
@@ -72,7 +81,11 @@ def reset_password(user_id):
         return redirect(url_for("admin.admin_users"))
 
     user = User.query.get_or_404(user_id)
-    user.password = hash_password(new_password)
+    try:
+        user.password = hash_password(new_password)
+    except PasswordBusyError:
+        flash("Server is busy. Please try again.")
+        return redirect(url_for("admin.admin_users"))
     db.session.commit()
     flash(f"Password reset for {user.name}")
     return redirect(url_for("admin.admin_users"))
@@ -116,7 +129,7 @@ def admin_jobs():
     if session.get("role") != "admin":
         return redirect("/")
 
-    page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor") or None
     per_page = request.args.get("per_page", 20, type=int)
 
     # Filters
@@ -135,8 +148,11 @@ def admin_jobs():
     if address:
         query = query.filter(Job.address.ilike(f"%{address}%"))
 
-    query = query.order_by(Job.job_number.desc())
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        pagination = keyset_paginate(query, cursor, per_page)
+    except ValueError:
+        pagination = keyset_paginate(query, None, per_page)
+    pagination.total, pagination.total_exact = job_total(query)
     jobs = pagination.items
 
     job_ids = [job.id for job in jobs]
@@ -196,29 +212,13 @@ def update_job(job_id):
         job.address = new_address
         job_changed = True
 
-        api_key = os.getenv("GOOGLE_GEOCODING_API_KEY")
-        if api_key:
-            try:
-                geo_url = "https://maps.googleapis.com/maps/api/geocode/json"
-                params = {"address": new_address, "key": api_key}
-                res = requests.get(geo_url, params=params)
-                if res.status_code == 200:
-                    geo_data = res.json()
-                    if geo_data.get("status") == "OK" and geo_data["results"]:
-                        result = geo_data["results"][0]
-                        location = result["geometry"]["location"]
-                        job.lat = location["lat"]
-                        job.long = location["lng"]
-                        job.address = result["formatted_address"]
-                    else:
-                        flash(
-                            f"Geocoding failed: {geo_data.get('status', 'Unknown error')}"
-                        )
-                else:
-                    flash(f"Geocoding API returned status code: {res.status_code}")
-            except Exception as e:
-                flash(f"Geocoding failed: {str(e)}")
-                print(f"Geocoding error details: {str(e)}")
+        geo = geocode_address(new_address)
+        if geo and geo.ok:
+            job.lat = geo.lat
+            job.long = geo.lng
+            job.address = geo.formatted_address
+        elif geo:
+            flash(f"Geocoding failed: {geo.status}")
 
     if job_changed:
         db.session.commit()
@@ -233,8 +233,8 @@ def delete_job(job_id):
     if session.get("role") != "admin":
         return redirect("/")
 
-    job = Job.query.get_or_404(job_id)
-    db.session.delete(job)
+    job = Job.active().filter_by(id=job_id).first_or_404()
+    job.soft_delete(session.get("user_id"))
     db.session.commit()
     flash(f"Deleted job {job.job_number}")
     return redirect(url_for("admin.admin_jobs"))
@@ -247,9 +247,10 @@ def update_fieldwork(entry_id):
     if session.get("role") != "admin":
         return redirect("/")
 
-    fw = FieldWork.query.get_or_404(entry_id)
+    fw = FieldWork.locked(entry_id)
 
     try:
+        previous_time = fw.total_time or 0.0
         fw.work_date = datetime.strptime(request.form["work_date"], "%Y-%m-%d").date()
         fw.start_time = datetime.strptime(request.form["start_time"], "%H:%M").time()
         fw.end_time = datetime.strptime(request.form["end_time"], "%H:%M").time()
@@ -261,11 +262,7 @@ def update_fieldwork(entry_id):
         )
         fw.total_time = round(delta.total_seconds() / 3600, 2)
 
-        # Recalculate aggregate job stats
-        job = fw.job
-        if job:
-            all_entries = FieldWork.query.filter_by(job_id=job.id).all()
-            job.total_time_spent = sum(entry.total_time for entry in all_entries)
+        Job.add_fieldwork_totals(fw.job_id, 0, fw.total_time - previous_time)
 
         db.session.commit()
         flash("Fieldwork updated.")
@@ -281,15 +278,10 @@ def delete_fieldwork(entry_id):
     if session.get("role") != "admin":
         return redirect("/")
 
-    fw = FieldWork.query.get_or_404(entry_id)
-    job = fw.job
+    fw = FieldWork.locked(entry_id)
 
     db.session.delete(fw)
-
-    # Recalculate aggregate stats
-    if job:
-        all_entries = FieldWork.query.filter_by(job_id=job.id).all()
-        job.total_time_spent = sum(entry.total_time for entry in all_entries)
+    Job.add_fieldwork_totals(fw.job_id, -1, -(fw.total_time or 0.0))
 
     db.session.commit()
     flash("Fieldwork entry deleted.")
@@ -324,46 +316,15 @@ def create_job():
         flash("Job number should contain only letters, numbers, and hyphens.")
         return redirect(url_for("admin.admin_jobs"))
 
-    existing = Job.active().filter_by(job_number=job_number).first()
+    existing = Job.query.filter_by(job_number=job_number).first()
     if existing:
         flash("Job number already exists.")
         return redirect(url_for("admin.admin_jobs"))
 
-    lat = long = county = None
-    formatted_address = address
-    api_key = os.getenv("GOOGLE_GEOCODING_API_KEY")
-
-    if api_key:
-        try:
-            geo_url = "https://maps.googleapis.com/maps/api/geocode/json"
-            params = {"address": address, "key": api_key}
-            res = requests.get(geo_url, params=params)
-            if res.status_code == 200:
-                geo_data = res.json()
-                if geo_data.get("status") == "OK" and geo_data["results"]:
-                    result = geo_data["results"][0]
-                    location = result["geometry"]["location"]
-                    lat = location["lat"]
-                    long = location["lng"]
-                    formatted_address = result["formatted_address"]
-                else:
-                    flash(
-                        f"Geocoding failed: {geo_data.get('status', 'Unknown error')}"
-                    )
-            else:
-                flash(f"Geocoding API returned status code: {res.status_code}")
-        except Exception as e:
-            flash(f"Geocoding failed: {str(e)}")
-            print(f"Geocoding error details: {str(e)}")
-
     new_job = Job(
         job_number=job_number,
-        address=formatted_address,
+        address=address,
         client=client,
-        lat=lat,
-        long=long,
-        county=get_county_from_coords(lat, long) if lat and long else None,
-        prop_appr_link=get_brevard_property_link(formatted_address),
         status=status,
         created_at=datetime.now(timezone.utc),
         visited=0,
@@ -372,8 +333,9 @@ def create_job():
     )
 
     db.session.add(new_job)
+    enqueue_enrichment(new_job)
     db.session.commit()
-    flash("Job created.")
+    flash("Job created. Location details will fill in shortly.")
     return redirect(url_for("admin.admin_jobs"))
 
 
@@ -410,8 +372,7 @@ def create_fieldwork(job_id):
         )
 
         db.session.add(fw)
-        job.visited += 1
-        job.total_time_spent += total_time
+        Job.add_fieldwork_totals(job.id, 1, fw.total_time)
         db.session.commit()
         flash("Fieldwork entry added.")
     except Exception as e:
@@ -422,50 +383,57 @@ def create_fieldwork(job_id):
 
 @admin_bp.route("/api/dashboard")
 @login_required
+@conditional
 def api_dashboard():
     """API endpoint for dashboard data"""
     if session.get("role") != "admin":
         return jsonify({"error": "Unauthorized"}), 403
 
-    # Get dashboard metrics (same as existing dashboard route)
-    total_jobs = Job.active().count()
-    total_users = User.query.count()
-    recent_jobs = Job.active().order_by(Job.created_at.desc()).limit(5).all()
+    # Per-worker cache and provider counters change without a data version
+    # bump, so they're only in the uncached /admin/api/metrics
+    return jsonify(dashboard_cache.get())
 
-    # Jobs by status for quick stats
-    status_counts = {}
-    for status in [
-        "On Hold/Pending",
-        "Needs Fieldwork",
-        "Fieldwork Complete/Needs Office Work",
-        "To Be Printed/Packaged",
-        "Survey Complete/Invoice Sent/Unpaid",
-        "Set/Flag Pins",
-        "Completed/To Be Filed",
-        "Ongoing Site Plan",
-    ]:
-        count = Job.active().filter(Job.status == status).count()
-        if count > 0:
-            status_counts[status] = count
 
-    return jsonify(
-        {
-            "total_jobs": total_jobs,
-            "total_users": total_users,
-            "status_counts": status_counts,
-            "recent_jobs": [job.to_dict() for job in recent_jobs],
-        }
+@admin_bp.route("/api/metrics")
+def api_metrics():
+    """API endpoint for request, SQL, provider and cache metrics (JSON or Prometheus)"""
+    # Scrapers can't log in, so they present METRICS_TOKEN instead
+    if session.get("role") != "admin" and not token_ok():
+        return jsonify({"error": "Unauthorized"}), 403
+
+    providers = provider_stats()
+    caches = {
+        "geocode": cache_stats(),
+        "dashboard": dashboard_cache.stats(),
+        "property_links": property_cache_stats(),
+    }
+    # The geocode cache counts hits per tier
+    caches["geocode"]["hits"] = sum(
+        v for k, v in caches["geocode"].items() if k.endswith("_hits")
+    )
+
+    wants_text = request.args.get("format") == "prometheus" or (
+        request.accept_mimetypes.best_match(["application/json", "text/plain"])
+        == "text/plain"
     )
+    if wants_text:
+        return (
+            metrics.prometheus(providers, caches),
+            200,
+            {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+    return jsonify({**metrics.snapshot(), "providers": providers, "caches": caches})
 
 
 @admin_bp.route("/api/jobs")
 @login_required
+@conditional
 def api_jobs():
     """API endpoint for jobs data"""
     if session.get("role") != "admin":
         return jsonify({"error": "Unauthorized"}), 403
 
-    page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor") or None
     per_page = request.args.get("per_page", 20, type=int)
 
     # Filters
@@ -484,9 +452,11 @@ def api_jobs():
     if address:
         query = query.filter(Job.address.ilike(f"%{address}%"))
 
-    query = query.order_by(Job.job_number.desc())
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    jobs = pagination.items
+    try:
+        pagination = keyset_paginate(JobSerializer.query(query), cursor, per_page)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    total, total_exact = job_total(query)
 
     status_options = [
         "On Hold/Pending",
@@ -501,27 +471,35 @@ def api_jobs():
 
     return jsonify(
         {
-            "jobs": [job.to_dict() for job in jobs],
+            "jobs": JobSerializer.dump_many(pagination.items),
             "status_options": status_options,
-            "current_page": page,
-            "total_pages": pagination.pages,
-            "total_jobs": pagination.total,
+            "per_page": pagination.per_page,
+            "total_jobs": total,
+            "total_exact": total_exact,
             "has_next": pagination.has_next,
             "has_prev": pagination.has_prev,
+            "next_cursor": pagination.next_cursor,
+            "prev_cursor": pagination.prev_cursor,
         }
     )
 
 
+def _last_sign_in():
+    # Sign-ins don't bump the data version, but this view shows them
+    return db.session.query(db.func.max(User.last_login)).scalar()
+
+
 @admin_bp.route("/api/users")
 @login_required
+@conditional(key=_last_sign_in)
 def api_users():
     """API endpoint for users data"""
     if session.get("role") != "admin":
         return jsonify({"error": "Unauthorized"}), 403
 
-    users = User.query.all()
+    users = UserSerializer.query().all()
 
-    return jsonify({"users": [user.to_dict() for user in users]})
+    return jsonify({"users": UserSerializer.dump_many(users)})
 
 
 # API endpoints for CRUD operations
@@ -548,9 +526,11 @@ def api_create_user():
     if User.query.filter_by(username=username).first():
         return jsonify({"error": "User already exists"}), 400
 
-    new_user = User(
-        username=username, name=name, password=hash_password(password), role=role
-    )
+    try:
+        hashed = hash_password(password)
+    except PasswordBusyError:
+        return jsonify({"error": "Server is busy. Please try again."}), 503
+    new_user = User(username=username, name=name, password=hashed, role=role)
     db.session.add(new_user)
     db.session.commit()
 
@@ -582,8 +562,8 @@ def api_delete_job(job_id):
     if session.get("role") != "admin":
         return jsonify({"error": "Unauthorized"}), 403
 
-    job = Job.query.get_or_404(job_id)
-    db.session.delete(job)
+    job = Job.active().filter_by(id=job_id).first_or_404()
+    job.soft_delete(session.get("user_id"))
     db.session.commit()
 
     return jsonify({"success": True, "message": f"Job {job.job_number} deleted"})
@@ -603,7 +583,10 @@ def api_reset_password(user_id):
         return jsonify({"error": "Password cannot be empty"}), 400
 
     user = User.query.get_or_404(user_id)
-    user.password = hash_password(new_password)
+    try:
+        user.password = hash_password(new_password)
+    except PasswordBusyError:
+        return jsonify({"error": "Server is busy. Please try again."}), 503
     db.session.commit()
 
     return jsonify({"success": True, "message": f"Password reset for {user.name}"})
@@ -659,43 +642,15 @@ def api_create_job():
         return jsonify({"error": "Job number, client, and address are required"}), 400
 
     # Check for duplicate job number
-    existing = Job.active().filter_by(job_number=job_number).first()
+    existing = Job.query.filter_by(job_number=job_number).first()
     if existing:
         return jsonify({"error": "Job number already exists"}), 400
 
-    # Geocode the address
-    lat = long = county = None
-    formatted_address = address
-    api_key = os.getenv("GOOGLE_GEOCODING_API_KEY")
-
-    if api_key:
-        try:
-            geo_url = "https://maps.googleapis.com/maps/api/geocode/json"
-            params = {"address": address, "key": api_key}
-            res = requests.get(geo_url, params=params)
-            if res.status_code == 200:
-                geo_data = res.json()
-                if geo_data.get("status") == "OK" and geo_data["results"]:
-                    result = geo_data["results"][0]
-                    location = result["geometry"]["location"]
-                    lat = str(location["lat"])  # Store as string per schema
-                    long = str(location["lng"])  # Store as string per schema
-                    formatted_address = result["formatted_address"]
-        except Exception as e:
-            print(f"Geocoding error: {e}")
-
-    # Get county from coordinates if available
-    if lat and long:
-        county = get_county_from_coords(float(lat), float(long))
-
     new_job = Job(
         job_number=job_number,
         client=client,
-        address=formatted_address,
+        address=address,
         status=status,
-        lat=lat,
-        long=long,
-        county=county,
         created_at=datetime.now(timezone.utc),
         visited=0,
         total_time_spent=0.0,
@@ -703,6 +658,8 @@ def api_create_job():
     )
 
     db.session.add(new_job)
+    # Geocoding, county and property link are filled in by enrichment.py
+    enqueue_enrichment(new_job)
     db.session.commit()
 
     return jsonify(
@@ -780,16 +737,10 @@ def api_delete_fieldwork(fieldwork_id):
     if session.get("role") != "admin":
         return jsonify({"error": "Unauthorized"}), 403
 
-    fieldwork = FieldWork.query.get_or_404(fieldwork_id)
-    job = fieldwork.job
+    fieldwork = FieldWork.locked(fieldwork_id)
 
     db.session.delete(fieldwork)
-
-    # Recalculate job aggregate stats
-    if job:
-        all_entries = FieldWork.query.filter_by(job_id=job.id).all()
-        job.total_time_spent = sum(entry.total_time for entry in all_entries)
-        job.visited = len(all_entries)
+    Job.add_fieldwork_totals(fieldwork.job_id, -1, -(fieldwork.total_time or 0.0))
 
     db.session.commit()
 
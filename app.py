@@ -3,31 +3,79 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
+import math
 import os
-import requests
-from auth_utils import hash_password, check_password, login_required
+from auth_utils import (
+    PasswordBusyError,
+    hash_password,
+    login_required,
+    login_throttle,
+    verify_login,
+)
 
 from models import db, Job, FieldWork, Tag, User
-from utils import get_county_from_coords, get_brevard_property_link
+from utils import get_county_from_coords
+from clustering import get_cluster_index
+from county_index import get_county_index
+from enrichment import enqueue as enqueue_enrichment
+from geocoding import geocode_address
+from json_provider import OrjsonProvider
+from search import SEARCH_LIMIT, search_jobs
+from serializers import FieldWorkSerializer, JobSerializer, dump_markers
+from tiles import get_tile, valid_tile
+from versioning import conditional
 
 from admin import admin_bp
+import autocomplete
+import commands
+import compression
+import county_assets
+import enrichment
+import events
+import metrics
+import property_links
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+# Behind Heroku's router remote_addr is the router's; PROXY_HOPS=1 (set in
+# the Procfile) takes the client's address from X-Forwarded-For instead. Off
+# by default: without a proxy in front, clients could spoof the header.
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.getenv("PROXY_HOPS", "0")))
 db_path = os.getenv("DATABASE_URL")
 app.config["SQLALCHEMY_DATABASE_URI"] = db_path
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# One connection per request thread that isn't parked on an /events stream,
+# plus overflow for the LISTEN thread, change broadcasts and background workers
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_size": int(
+        os.getenv("DB_POOL_SIZE", str(events.WEB_THREADS - events.MAX_STREAMS))
+    ),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+}
 
 app.secret_key = os.getenv("SESSION_KEY")
 app.permanent_session_lifetime = timedelta(days=30)
 
 app.register_blueprint(admin_bp, url_prefix="/admin")
 
+# How long /jobs/changes waits before moving its cursor past a write
+CHANGES_SETTLE_TIME = timedelta(seconds=5)
+
 # Initialize extensions
 db.init_app(app)
 migrate = Migrate(app, db)
+# First, so its timing wraps every other hook
+metrics.init_app(app)
+events.init_app(app)
+compression.init_app(app)
+autocomplete.init_app(app)
+commands.init_app(app)
+enrichment.init_app(app)
+property_links.init_app(app)
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -40,56 +88,19 @@ def map_with_jobs():
         if existing:
             return jsonify({"error": "Job number already exists."}), 400
 
-        raw_address = request.form["address"]
-        client = request.form["client"]
-        status = request.form.get("status", None)
-
-        api_key = os.getenv("GOOGLE_GEOCODING_API_KEY")
-        latitude = longitude = None
-        formatted_address = raw_address
-
-        if api_key:
-            geo_url = "https://maps.googleapis.com/maps/api/geocode/json"
-            params = {"address": raw_address, "key": api_key}
-            try:
-                res = requests.get(geo_url, params=params)
-                if res.status_code == 200:
-                    geo_data = res.json()
-                    if geo_data.get("status") == "OK" and geo_data["results"]:
-                        result = geo_data["results"][0]
-                        location = result["geometry"]["location"]
-                        latitude = location["lat"]
-                        longitude = location["lng"]
-                        formatted_address = result["formatted_address"]
-            except Exception as e:
-                print("Geocoding failed:", e)
-
-        county = (
-            get_county_from_coords(latitude, longitude)
-            if latitude and longitude
-            else None
-        )
-        property_link = (
-            get_brevard_property_link(formatted_address)
-            if county and county.upper() == "BREVARD"
-            else None
-        )
-
         new_job = Job(
             job_number=job_number,
-            address=formatted_address,
-            client=client,
-            lat=latitude,
-            long=longitude,
-            county=county,
-            prop_appr_link=property_link,
-            status=status,
+            address=request.form["address"],
+            client=request.form["client"],
+            status=request.form.get("status", None),
             created_at=datetime.now(tz=timezone.utc),
             visited=0,
             total_time_spent=0.0,
             tags=[],
         )
         db.session.add(new_job)
+        # Geocoding, county and property link are filled in by enrichment.py
+        enqueue_enrichment(new_job)
         db.session.commit()
 
         return jsonify(
@@ -100,14 +111,41 @@ def map_with_jobs():
             }
         )
 
-    return render_template("map.html")
-
-
-@app.route("/jobs")
-@login_required
-def jobs():
-    query = Job.query
-
+    return render_template("map.html", county_assets=county_assets.client_manifest())
+
+
+def parse_bbox(value):
+    """Parse bbox=west,south,east,north (Leaflet's toBBoxString order).
+
+    Padded or zoomed-out views run past the poles and across the
+    antimeridian, so latitudes are clamped and longitudes wrapped back into
+    [-180, 180]; a view that still crosses the antimeridian (or spans the
+    whole world) gets every longitude.
+    """
+    west, south, east, north = (float(v) for v in value.split(","))
+    if not all(map(math.isfinite, (west, south, east, north))):
+        raise ValueError("Invalid bbox")
+    if west > east or south > north:
+        raise ValueError("Invalid bbox")
+    south, north = max(south, -90.0), min(north, 90.0)
+    if south > north:
+        raise ValueError("Invalid bbox")
+    shift = math.floor((west + 180) / 360) * 360
+    west, east = west - shift, east - shift
+    if east > 180:
+        west, east = -180.0, 180.0
+    return west, south, east, north
+
+
+def marker_precision(zoom):
+    """Decimal places needed for sub-pixel marker placement at a zoom level."""
+    if zoom is None:
+        return 6
+    return min(6, max(1, math.ceil(math.log10(256 * 2**zoom / 360))))
+
+
+def filter_jobs(query):
+    """Apply the shared /jobs filters; raises ValueError on a malformed bbox."""
     job_number = request.args.get("job_number")
     if job_number:
         query = query.filter(Job.job_number.ilike(f"%{job_number}%"))
@@ -119,8 +157,143 @@ def jobs():
     if status:
         query = query.filter(Job.status == status)
 
+    bbox = request.args.get("bbox")
+    if bbox:
+        query = Job.in_bbox(query, *parse_bbox(bbox))
+    return query
+
+
+@app.route("/jobs")
+@login_required
+@conditional
+def jobs():
+    try:
+        fields = JobSerializer.parse_fields(request.args.get("fields"))
+        query = filter_jobs(JobSerializer.query(Job.active(), fields=fields))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     jobs = query.all()
-    return jsonify([job.to_dict() for job in jobs])
+    return jsonify(JobSerializer.dump_many(jobs, fields))
+
+
+@app.route("/jobs/markers")
+@login_required
+@conditional
+def job_markers():
+    """Compact columnar feed with just what the map needs to place markers"""
+    zoom = request.args.get("zoom", type=int)
+    try:
+        query = filter_jobs(
+            db.session.query(
+                Job.id, Job.job_number, Job.latitude, Job.longitude, Job.status
+            )
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = query.filter(
+        Job.deleted_at == None, Job.latitude != None, Job.longitude != None
+    )
+    return jsonify(dump_markers(query.all(), precision=marker_precision(zoom)))
+
+
+@app.route("/jobs/clusters")
+@login_required
+@conditional(key=lambda: get_cluster_index().fingerprint)
+def job_clusters():
+    """Pre-clustered job markers for one zoom level and bbox (unfiltered)"""
+    zoom = request.args.get("zoom", type=int)
+    if zoom is None:
+        return jsonify({"error": "zoom is required"}), 400
+    try:
+        bbox = parse_bbox(request.args.get("bbox", "-180,-85,180,85"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    index = get_cluster_index()
+    return jsonify(
+        {"zoom": min(zoom, index.max_zoom), "clusters": index.clusters(*bbox, zoom)}
+    )
+
+
+@app.route("/jobs/changes")
+@login_required
+def job_changes():
+    """
+    Jobs created, updated or soft-deleted since ?since=<cursor>.
+
+    Pass the returned cursor back as `since` to get the next batch; keep
+    going while has_more is true. Deleted jobs come back as
+    {"id", "job_number", "deleted": true}.
+    """
+    since = request.args.get("since", 0, type=int)
+    limit = min(request.args.get("limit", 500, type=int), 5000)
+
+    rows = (
+        JobSerializer.query()
+        .filter(Job.revision > since)
+        .order_by(Job.revision)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changes = []
+    for job in rows:
+        if job.deleted_at is not None:
+            changes.append({"id": job.id, "job_number": job.job_number, "deleted": True})
+        else:
+            changes.append({**JobSerializer.dump(job), "deleted": False})
+
+    # Revisions are handed out before commit, so a slow transaction can land
+    # below a cursor we already returned. Don't advance the cursor past rows
+    # touched in the last few seconds, on any page; they'll simply be sent
+    # again. The cursor depends on the clock, so no ETag/304 for this route.
+    settled = datetime.now(timezone.utc).replace(tzinfo=None) - CHANGES_SETTLE_TIME
+    cursor = since
+    for job in rows:
+        if job.updated_at > settled:
+            # Come back later rather than refetching the same page now
+            has_more = False
+            break
+        cursor = job.revision
+
+    return jsonify({"cursor": str(cursor), "changes": changes, "has_more": has_more})
+
+
+@app.route("/jobs/<job_number>", methods=["GET"])
+@login_required
+def get_job(job_number):
+    job = (
+        JobSerializer.query(Job.active())
+        .filter_by(job_number=job_number)
+        .first_or_404()
+    )
+    return jsonify(JobSerializer.dump(job))
+
+
+@app.route("/search")
+@login_required
+def search():
+    """API endpoint for fuzzy job search across job number, client and address"""
+    q = request.args.get("q", "")
+    limit = request.args.get("limit", SEARCH_LIMIT, type=int)
+    return jsonify(search_jobs(q, limit))
+
+
+@app.route("/autocomplete")
+@login_required
+def suggest():
+    """API endpoint for client and address suggestions, served from memory"""
+    field = request.args.get("field")
+    if field not in autocomplete.AUTOCOMPLETE_FIELDS:
+        fields = ", ".join(autocomplete.AUTOCOMPLETE_FIELDS)
+        return jsonify({"error": f"field must be one of {fields}"}), 400
+    q = request.args.get("q", "")
+    limit = min(request.args.get("limit", autocomplete.AUTOCOMPLETE_LIMIT, type=int), 50)
+    return jsonify(autocomplete.get_autocomplete().complete(field, q, limit))
 
 
 # Utility route for geocoding
@@ -130,22 +303,14 @@ def geocode():
     if not address:
         return jsonify({"error": "No address provided"}), 400
 
-    api_key = os.getenv("GOOGLE_GEOCODING_API_KEY")
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
-    params = {"address": address, "key": api_key}
-    response = requests.get(url, params=params)
-
-    if response.status_code != 200:
+    geo = geocode_address(address)
+    if geo is None or (not geo.ok and geo.status != "ZERO_RESULTS"):
         return jsonify({"error": "Geocoding request failed"}), 500
-
-    data = response.json()
-    if not data.get("results"):
+    if not geo.ok:
         return jsonify({"error": "Address not found"}), 404
 
-    result = data["results"][0]
-    location = result["geometry"]["location"]
-    lat = location["lat"]
-    lon = location["lng"]
+    lat = geo.lat
+    lon = geo.lng
     county = get_county_from_coords(lat, lon)
 
     return jsonify(
@@ -153,11 +318,42 @@ def geocode():
             "lat": lat,
             "lon": lon,
             "county": county,
-            "formatted_address": result["formatted_address"],
+            "formatted_address": geo.formatted_address,
         }
     )
 
 
+@app.route("/tiles/<layer>/<int:z>/<int:x>/<int:y>.mvt")
+@login_required
+def vector_tile(layer, z, x, y):
+    if not valid_tile(layer, z, x, y):
+        return jsonify({"error": "Tile not found"}), 404
+
+    resp = app.response_class(
+        get_tile(layer, z, x, y), mimetype="application/vnd.mapbox-vector-tile"
+    )
+    # County tiles are static; job tiles are invalidated as jobs change
+    resp.headers["Cache-Control"] = (
+        "private, max-age=86400" if layer == "counties" else "private, no-cache"
+    )
+    return resp
+
+
+@app.route("/assets/counties/<filename>")
+@login_required
+def county_asset(filename):
+    return county_assets.serve(filename)
+
+
+@app.route("/counties/labels")
+@login_required
+def county_labels():
+    index = get_county_index()
+    if index is None:
+        return jsonify([])
+    return jsonify(index.label_points())
+
+
 @app.route("/jobs/<job_number>", methods=["PUT"])
 @login_required
 def update_job(job_number):
@@ -216,8 +412,7 @@ def add_fieldwork(job_number):
     db.session.add(fieldwork)
 
     # Update job aggregate stats
-    job.visited += 1
-    job.total_time_spent += fieldwork.total_time
+    Job.add_fieldwork_totals(job.id, 1, fieldwork.total_time)
     db.session.commit()
 
     return jsonify({"message": "Field work added", "total_time": fieldwork.total_time})
@@ -228,18 +423,20 @@ def add_fieldwork(job_number):
 def get_fieldwork_for_job(job_number):
     job = Job.query.filter_by(job_number=job_number).first_or_404()
     entries = (
-        FieldWork.query.filter_by(job_id=job.id)
+        FieldWorkSerializer.query()
+        .filter_by(job_id=job.id)
         .order_by(FieldWork.work_date.desc())
         .all()
     )
-    return jsonify([entry.to_dict() for entry in entries])
+    return jsonify(FieldWorkSerializer.dump_many(entries))
 
 
 @app.route("/fieldwork/<int:entry_id>", methods=["PUT"])
 @login_required
 def update_fieldwork(entry_id):
-    fw = FieldWork.query.get_or_404(entry_id)
+    fw = FieldWork.locked(entry_id)
     data = request.get_json()
+    previous_time = fw.total_time or 0.0
 
     if "work_date" in data:
         fw.work_date = datetime.strptime(data["work_date"], "%Y-%m-%d").date()
@@ -257,22 +454,54 @@ def update_fieldwork(entry_id):
         )
         fw.total_time = round(delta.total_seconds() / 3600, 2)
 
-    job = Job.query.get(fw.job_id)
-    all_entries = FieldWork.query.filter_by(job_id=job.id).all()
-    job.total_time_spent = sum(entry.total_time for entry in all_entries)
+    Job.add_fieldwork_totals(fw.job_id, 0, (fw.total_time or 0.0) - previous_time)
 
     db.session.commit()
     return jsonify(fw.to_dict())
 
 
+@app.route("/events")
+@login_required
+def event_stream():
+    """Server-Sent Events stream of job, fieldwork and user changes"""
+    q = events.hub.subscribe(session.get("role"))
+    if q is None:
+        resp = jsonify({"error": "Too many live streams, try again later"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "30"
+        return resp
+    return app.response_class(
+        events.hub.stream(q),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         username = request.form["username"]
         password = request.form["password"]
+        ip = request.remote_addr
+        if login_throttle.blocked(ip, username):
+            return (
+                render_template(
+                    "login.html",
+                    error="Too many failed attempts. Try again in a few minutes.",
+                ),
+                429,
+            )
         user = User.query.filter_by(username=username).first()
 
-        if user and check_password(password, user.password):
+        try:
+            verified = user is not None and verify_login(user, password)
+        except PasswordBusyError:
+            return (
+                render_template("login.html", error="Server is busy. Please try again."),
+                503,
+            )
+        if verified:
+            login_throttle.succeeded(ip, username)
             session.permanent = user.role == "admin"
             session["user_id"] = user.id
             session["role"] = user.role
@@ -280,6 +509,7 @@ def login():
             user.last_ip = request.remote_addr
             db.session.commit()
             return redirect("/")
+        login_throttle.failed(ip, username)
         return render_template("login.html", error="Invalid credentials")
     return render_template("login.html")
 
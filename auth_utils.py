@@ -1,12 +1,174 @@
 import bcrypt
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from functools import wraps
 from flask import session, redirect
 
+# bcrypt work factor for new hashes; older hashes are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+# Hashes running at once per process, and how many more may wait for a slot
+PASSWORD_WORKERS = int(os.getenv('PASSWORD_WORKERS', '2'))
+PASSWORD_QUEUE = int(os.getenv('PASSWORD_QUEUE', '16'))
+PASSWORD_TIMEOUT = 10
+
+LOGIN_WINDOW = 15 * 60
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv('LOGIN_MAX_FAILURES_PER_IP', '20'))
+LOGIN_MAX_FAILURES_PER_USER = int(os.getenv('LOGIN_MAX_FAILURES_PER_USER', '5'))
+
+# A password that verified recently isn't hashed again for this long
+VERIFIED_TTL = int(os.getenv('VERIFIED_LOGIN_TTL', '300'))
+
+
+class PasswordBusyError(Exception):
+    pass
+
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix='bcrypt')
+_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE)
+
+
+def _run(fn, *args):
+    # bcrypt releases the GIL, so request threads keep serving while it runs;
+    # the pool bounds how many cores logins can take, and a full queue fails fast
+    if not _slots.acquire(blocking=False):
+        raise PasswordBusyError('Too many password checks in progress')
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=PASSWORD_TIMEOUT)
+    except TimeoutError:
+        raise PasswordBusyError('Password check timed out')
+
+
+def _hash(plain):
+    return bcrypt.hashpw(plain.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+
+def _check(plain, hashed):
+    return bcrypt.checkpw(plain.encode(), hashed.encode())
+
+
 def hash_password(plain):
-    return bcrypt.hashpw(plain.encode(), bcrypt.gensalt()).decode()
+    return _run(_hash, plain)
+
 
 def check_password(plain, hashed):
-    return bcrypt.checkpw(plain.encode(), hashed.encode())
+    return _run(_check, plain, hashed)
+
+
+def needs_rehash(hashed):
+    try:
+        return int(hashed.split('$')[2]) < BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+class VerifiedCache:
+    """Recently verified (password, hash) pairs, keyed by an HMAC under a per-process secret."""
+
+    def __init__(self, ttl=VERIFIED_TTL):
+        self.ttl = ttl
+        self._secret = secrets.token_bytes(32)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _key(self, plain, hashed):
+        return hmac.new(self._secret, f'{hashed}\0{plain}'.encode(), hashlib.sha256).digest()
+
+    def __contains__(self, pair):
+        key = self._key(*pair)
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False
+            return True
+
+    def add(self, plain, hashed):
+        if not self.ttl:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items() if v >= now}
+            self._entries[self._key(plain, hashed)] = now + self.ttl
+
+
+class LoginThrottle:
+    """
+    Failed logins per IP, and per username from each IP, over a sliding
+    LOGIN_WINDOW. Keying the username limit by IP too means nobody can lock
+    a user out from elsewhere by guessing wrong on purpose.
+
+    Counts are kept per worker process, so with N workers a client can get
+    up to N times the configured number of attempts.
+    """
+
+    def __init__(self, window=LOGIN_WINDOW):
+        self.window = window
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return 0
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return 0
+        return len(failures)
+
+    def blocked(self, ip, username):
+        now = time.monotonic()
+        with self._lock:
+            return (
+                self._recent(('ip', ip), now) >= LOGIN_MAX_FAILURES_PER_IP
+                or self._recent(('user', ip, username.lower()), now)
+                >= LOGIN_MAX_FAILURES_PER_USER
+            )
+
+    def failed(self, ip, username):
+        now = time.monotonic()
+        with self._lock:
+            for key in (('ip', ip), ('user', ip, username.lower())):
+                self._failures.setdefault(key, deque()).append(now)
+
+    def succeeded(self, ip, username):
+        with self._lock:
+            self._failures.pop(('user', ip, username.lower()), None)
+
+
+verified_logins = VerifiedCache()
+login_throttle = LoginThrottle()
+
+
+def verify_login(user, plain):
+    """True if `plain` is `user`'s password, upgrading the stored hash when its cost is out of date."""
+    if (plain, user.password) in verified_logins:
+        return True
+    if not check_password(plain, user.password):
+        return False
+    if needs_rehash(user.password):
+        try:
+            user.password = hash_password(plain)
+        except PasswordBusyError:
+            pass  # the password is right; upgrade it on a quieter login
+    verified_logins.add(plain, user.password)
+    return True
+
 
 def login_required(f):
     @wraps(f)
@@ -15,4 +177,3 @@ def login_required(f):
             return redirect('/login')
         return f(*args, **kwargs)
     return wrapper
-
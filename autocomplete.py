@@ -0,0 +1,216 @@
+"""
+In-memory autocomplete for job clients and addresses.
+
+Each field keeps its distinct values in a sorted array of normalized keys,
+so a prefix is a pair of bisects. Every value carries how many active jobs
+use it and when it was last used; suggestions are ranked by that count,
+decayed by RECENCY_HALF_LIFE_DAYS, so clients the office works with now
+come before equally common ones from years ago.
+
+The index is built once per worker, in the background on the first
+request, and then follows job changes through changes.on_change, so no
+keystroke touches the database. Changes can still slip past it (one
+committed during a build, a relay missed while the LISTEN thread
+reconnects), so once it is AUTOCOMPLETE_MAX_AGE seconds old it is rebuilt
+in the background, and served as is until the new one is ready.
+"""
+
+import bisect
+import heapq
+import os
+import threading
+import time
+from datetime import timezone
+
+from flask import current_app
+from sqlalchemy import func
+
+from changes import on_change
+from models import Job, db
+
+AUTOCOMPLETE_FIELDS = ("client", "address")
+AUTOCOMPLETE_LIMIT = 10
+RECENCY_HALF_LIFE_DAYS = 180
+# A one-letter prefix can match thousands of values; rank only this many
+MAX_CANDIDATES = 5000
+AUTOCOMPLETE_MAX_AGE = int(os.getenv("AUTOCOMPLETE_MAX_AGE", "900"))
+
+
+def normalize(value):
+    return " ".join((value or "").lower().split())
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.keys = []  # sorted normalized values
+        self.entries = {}  # key -> [display value, job count, last used (epoch seconds)]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, value, count=1, last_used=None):
+        key = normalize(value)
+        if not key:
+            return
+        last_used = last_used or time.time()
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = [value.strip(), count, last_used]
+            bisect.insort(self.keys, key)
+        else:
+            entry[1] += count
+            entry[2] = max(entry[2], last_used)
+
+    def remove(self, value):
+        key = normalize(value)
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.entries[key]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def complete(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\uffff", lo)
+        candidates = self.keys[lo : min(hi, lo + MAX_CANDIDATES)]
+
+        now = time.time()
+        half_life = RECENCY_HALF_LIFE_DAYS * 86400
+
+        def rank(key):
+            _, count, last_used = self.entries[key]
+            return count * 0.5 ** (max(now - last_used, 0) / half_life)
+
+        best = heapq.nlargest(limit, candidates, key=rank)
+        return [self.entries[key][0] for key in best]
+
+
+class Autocomplete:
+    def __init__(self):
+        self.indexes = {field: PrefixIndex() for field in AUTOCOMPLETE_FIELDS}
+        self.built_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def complete(self, field, prefix, limit=AUTOCOMPLETE_LIMIT):
+        with self._lock:
+            return self.indexes[field].complete(prefix, limit)
+
+    def add(self, field, value, count=1, last_used=None):
+        with self._lock:
+            self.indexes[field].add(value, count, last_used)
+
+    def remove(self, field, value):
+        with self._lock:
+            self.indexes[field].remove(value)
+
+    @classmethod
+    def from_database(cls):
+        autocomplete = cls()
+        for field in AUTOCOMPLETE_FIELDS:
+            column = getattr(Job, field)
+            rows = (
+                db.session.query(column, func.count(Job.id), func.max(Job.created_at))
+                .filter(Job.deleted_at == None)
+                .group_by(column)
+            )
+            for value, count, last_created in rows:
+                last_used = (
+                    last_created.replace(tzinfo=timezone.utc).timestamp()
+                    if last_created
+                    else 0
+                )
+                autocomplete.add(field, value, count, last_used)
+        return autocomplete
+
+
+_autocomplete = None
+_build_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+
+
+def _build():
+    autocomplete = Autocomplete.from_database()
+    print(
+        "Autocomplete index built ("
+        + ", ".join(f"{len(index)} {field}s" for field, index in autocomplete.indexes.items())
+        + ")"
+    )
+    return autocomplete
+
+
+def _rebuild(app):
+    global _autocomplete
+    try:
+        with app.app_context():
+            autocomplete = _build()
+        with _build_lock:
+            _autocomplete = autocomplete
+    except Exception as e:
+        print("Autocomplete rebuild failed:", e)
+    finally:
+        _rebuild_lock.release()
+
+
+def get_autocomplete():
+    """The process-wide Autocomplete, built on first use and rebuilt in the background when old."""
+    global _autocomplete
+    autocomplete = _autocomplete
+    if autocomplete is not None:
+        stale = time.monotonic() - autocomplete.built_at >= AUTOCOMPLETE_MAX_AGE
+        if stale and _rebuild_lock.acquire(blocking=False):
+            threading.Thread(
+                target=_rebuild,
+                args=(current_app._get_current_object(),),
+                name="autocomplete-rebuild",
+                daemon=True,
+            ).start()
+        return autocomplete
+    with _build_lock:
+        if _autocomplete is None:
+            _autocomplete = _build()
+        return _autocomplete
+
+
+@on_change
+def _apply_job_changes(events):
+    autocomplete = _autocomplete
+    if autocomplete is None:
+        return
+    for change in events:
+        if change["type"] != "job":
+            continue
+        data = change["data"]
+        for field in AUTOCOMPLETE_FIELDS:
+            value, previous = data[field], data[f"previous_{field}"]
+            if change["op"] == "created":
+                autocomplete.add(field, value)
+            elif change["op"] == "deleted":
+                if not data["previous_deleted"]:
+                    autocomplete.remove(field, previous)
+            elif normalize(value) != normalize(previous):
+                autocomplete.remove(field, previous)
+                autocomplete.add(field, value)
+
+
+def init_app(app):
+    started = threading.Event()
+
+    @app.before_request
+    def _warm_autocomplete():
+        if started.is_set():
+            return
+        started.set()
+
+        def build():
+            try:
+                with app.app_context():
+                    get_autocomplete()
+            except Exception as e:
+                print("Autocomplete warm-up failed:", e)
+
+        threading.Thread(target=build, name="autocomplete-warmup", daemon=True).start()
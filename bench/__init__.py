@@ -0,0 +1,26 @@
+"""
+Benchmarks for the app's hot paths.
+
+A typical run against a scratch database:
+
+    # 1. Fill it with synthetic jobs, fieldwork and users
+    python -m bench.generate --jobs 100000
+
+    # 2. Stand in for Google geocoding and BCPAO
+    python -m bench.fake_providers --port 8765 &
+
+    # 3. Start the app against the fakes. Use one worker so that its
+    #    /admin/api/metrics sees every request
+    GOOGLE_GEOCODING_API_KEY=bench \\
+    GEOCODE_URL=http://127.0.0.1:8765/maps/api/geocode/json \\
+    BCPAO_URL=http://127.0.0.1:8765/api/records \\
+    GEOCODE_RATE_LIMIT=1000 BCPAO_RATE_LIMIT=1000 \\
+        gunicorn app:app --worker-class gthread --threads 32 --bind 127.0.0.1:5000 &
+
+    # 4. Drive load, save a baseline, and later compare against it
+    python -m bench.load --duration 60 --concurrency 16 --save bench/baselines/100k.json
+    python -m bench.load --duration 60 --concurrency 16 --compare bench/baselines/100k.json
+
+Everything is seeded, so the same arguments build the same dataset and
+replay the same request mix.
+"""
@@ -0,0 +1,113 @@
+"""Synthetic Florida jobs, shared by the generator, the fake providers and the load driver."""
+
+import hashlib
+import random
+
+# Created by bench.generate, used by bench.load
+ADMIN_USERNAME = "bench-admin"
+ADMIN_PASSWORD = "bench-password"
+
+# (county, city, zip, lat, lng, spread in degrees, share of jobs)
+CITIES = [
+    ("ORANGE", "Orlando", "32801", 28.5383, -81.3792, 0.12, 20),
+    ("BREVARD", "Melbourne", "32901", 28.0836, -80.6081, 0.15, 12),
+    ("SEMINOLE", "Sanford", "32771", 28.8003, -81.2731, 0.08, 10),
+    ("VOLUSIA", "Daytona Beach", "32114", 29.2108, -81.0228, 0.12, 10),
+    ("OSCEOLA", "Kissimmee", "34741", 28.2920, -81.4076, 0.10, 8),
+    ("POLK", "Lakeland", "33801", 28.0395, -81.9498, 0.15, 8),
+    ("LAKE", "Eustis", "32726", 28.8528, -81.6854, 0.12, 7),
+    ("MARION", "Ocala", "34470", 29.1872, -82.1401, 0.15, 6),
+    ("DUVAL", "Jacksonville", "32202", 30.3322, -81.6557, 0.15, 6),
+    ("PINELLAS", "St. Petersburg", "33701", 27.7676, -82.6403, 0.08, 5),
+    ("SUMTER", "Bushnell", "33513", 28.6647, -82.1128, 0.08, 3),
+    ("CITRUS", "Inverness", "34450", 28.8355, -82.3301, 0.08, 2),
+    ("PUTNAM", "Palatka", "32177", 29.6486, -81.6376, 0.08, 2),
+    ("LEVY", "Bronson", "32621", 29.4477, -82.6423, 0.08, 1),
+]
+
+STATUSES = [
+    ("Completed/To Be Filed", 35),
+    ("Survey Complete/Invoice Sent/Unpaid", 12),
+    ("Estimate/Quote Available", 12),
+    ("Needs Fieldwork", 10),
+    ("Fieldwork Complete/Needs Office Work", 8),
+    ("To Be Printed/Packaged", 6),
+    ("On Hold/Pending", 6),
+    ("Set/Flag Pins", 5),
+    ("Ongoing Site Plan", 6),
+]
+
+STREETS = [
+    "Oak", "Pine", "Magnolia", "Palm", "Cypress", "Orange", "Lake", "Citrus",
+    "Live Oak", "Hibiscus", "Sabal", "Heron", "Pelican", "Bay", "Osprey",
+    "Sand Hill", "Indian River", "Wekiva", "Ocklawaha", "Tomoka",
+]
+STREET_TYPES = ["St", "Ave", "Dr", "Blvd", "Ln", "Ct", "Way", "Rd", "Cir", "Trl"]
+
+FIRST_NAMES = [
+    "James", "Maria", "Robert", "Linda", "Michael", "Patricia", "David", "Jennifer",
+    "Carlos", "Elizabeth", "Daniel", "Susan", "Jose", "Karen", "Thomas", "Nancy",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Garcia", "Rodriguez", "Martinez", "Brown",
+    "Davis", "Miller", "Wilson", "Moore", "Taylor", "Anderson", "Hernandez",
+    "Lopez", "Gonzalez", "Clark", "Lewis", "Walker", "Hall",
+]
+COMPANY_SUFFIXES = [
+    "Homes", "Builders", "Title", "Development", "Construction", "Realty",
+    "Properties", "Engineering", "Land Co.", "Law Group",
+]
+
+
+def pick_city(rng):
+    return rng.choices(CITIES, weights=[c[6] for c in CITIES])[0]
+
+
+def point_near(rng, city):
+    """A point scattered around `city`, denser towards its center."""
+    _, _, _, lat, lng, spread, _ = city
+    return round(rng.gauss(lat, spread / 2), 6), round(rng.gauss(lng, spread / 2), 6)
+
+
+def address(rng, city):
+    _, name, zip_code, *_ = city
+    return (
+        f"{rng.randint(100, 19999)} {rng.choice(STREETS)} {rng.choice(STREET_TYPES)},"
+        f" {name}, FL {zip_code}"
+    )
+
+
+def client_pool(rng, size):
+    """`size` client names; individuals and companies, like the real list.
+
+    There are only a few thousand distinct base names, so repeats get a
+    numbered suffix ("Smith Homes 2") and any size can be filled.
+    """
+    names = []
+    seen = {}
+
+    def add(name):
+        count = seen.get(name, 0) + 1
+        seen[name] = count
+        names.append(name if count == 1 else f"{name} {count}")
+
+    while len(names) < size:
+        last = rng.choice(LAST_NAMES)
+        if rng.random() < 0.4:
+            add(f"{last} {rng.choice(COMPANY_SUFFIXES)}")
+        else:
+            add(f"{rng.choice(FIRST_NAMES)} {last}")
+        if len(names) < size and rng.random() < 0.3:
+            # Variants make autocomplete and fuzzy search realistic
+            add(f"{last} & {rng.choice(LAST_NAMES)} {rng.choice(COMPANY_SUFFIXES)}")
+    return sorted(names)
+
+
+def client_weights(count):
+    """Zipf-like: a few repeat clients account for most jobs."""
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+def stable_random(text):
+    """A random.Random seeded from `text`, so fake answers are repeatable."""
+    return random.Random(hashlib.sha256(text.encode()).digest())
@@ -0,0 +1,103 @@
+"""
+Local stand-ins for Google geocoding and BCPAO.
+
+    python -m bench.fake_providers --port 8765 [--latency-ms 80] [--error-rate 0.01]
+
+Point the app at it with GEOCODE_URL and BCPAO_URL (see bench/__init__.py).
+Answers are derived from a hash of the address, so the same address always
+geocodes to the same spot, near the bench city it names (or a hashed one). Addresses
+containing "nowhere" get ZERO_RESULTS, and about a third of addresses have
+no BCPAO record. --latency-ms adds jittered delay, like the real APIs.
+--error-rate makes that share of calls fail with a 503, which exercises
+retries and the circuit breaker.
+"""
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from bench import data
+
+
+def geocode(address):
+    if "nowhere" in address.lower():
+        return {"status": "ZERO_RESULTS", "results": []}
+    rng = data.stable_random(address)
+    # Land in the city the address names, when it is one of the bench cities
+    named = [c for c in data.CITIES if f", {c[1].lower()}," in address.lower()]
+    city = named[0] if named else data.pick_city(rng)
+    lat, lng = data.point_near(rng, city)
+    return {
+        "status": "OK",
+        "results": [
+            {
+                "formatted_address": f"{address.split(',')[0].strip()}, {city[1]}, FL {city[2]}, USA",
+                "geometry": {"location": {"lat": lat, "lng": lng}},
+            }
+        ],
+    }
+
+
+def bcpao(address):
+    rng = data.stable_random("bcpao:" + address)
+    if rng.random() < 1 / 3:
+        return []
+    return [{"account": str(rng.randint(2000000, 3099999))}]
+
+
+ROUTES = {
+    "/maps/api/geocode/json": geocode,
+    "/api/records": bcpao,
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        route = ROUTES.get(url.path)
+        if route is None:
+            self.send_error(404)
+            return
+        if self.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+        if random.random() < self.error_rate:
+            self.send_error(503)
+            return
+
+        address = parse_qs(url.query).get("address", [""])[0]
+        body = json.dumps(route(address)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake geocoding and BCPAO APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    Handler.latency = args.latency_ms / 1000
+    Handler.error_rate = args.error_rate
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Fake providers on http://{args.host}:{args.port}")
+    print(f"  GEOCODE_URL=http://{args.host}:{args.port}/maps/api/geocode/json")
+    print(f"  BCPAO_URL=http://{args.host}:{args.port}/api/records")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Fill the database with a synthetic, reproducible dataset.
+
+    python -m bench.generate --jobs 100000 [--seed 42] [--crews 12] [--reset]
+
+Jobs get BENCH- job numbers and users get bench- usernames, so --reset can
+remove a previous dataset without touching real rows. Rows are inserted
+with bulk INSERTs in batches of --batch-size. Every job's visited and
+total_time_spent totals match its generated fieldwork. The tables are
+ANALYZEd at the end, so planner estimates (used for job totals) are right.
+
+The admin login for bench.load is bench-admin / bench-password.
+"""
+
+import argparse
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select, text
+
+from app import app
+from auth_utils import hash_password
+from bench import data
+from bench.data import ADMIN_PASSWORD, ADMIN_USERNAME
+from models import EnrichmentTask, FieldWork, Job, User, db
+from versioning import bump_data_version
+
+JOB_PREFIX = "BENCH-"
+USER_PREFIX = "bench-"
+CREW_PASSWORD = "bench-password"
+
+HISTORY_DAYS = 3 * 365
+DELETED_SHARE = 0.03
+VISIT_COUNTS = ([0, 1, 2, 3, 4, 6], [30, 35, 18, 9, 5, 3])
+
+
+def reset():
+    bench_jobs = select(Job.id).where(Job.job_number.startswith(JOB_PREFIX))
+    db.session.execute(delete(FieldWork).where(FieldWork.job_id.in_(bench_jobs)))
+    db.session.execute(delete(EnrichmentTask).where(EnrichmentTask.job_id.in_(bench_jobs)))
+    deleted = db.session.execute(
+        delete(Job).where(Job.job_number.startswith(JOB_PREFIX))
+    ).rowcount
+    db.session.execute(delete(User).where(User.username.startswith(USER_PREFIX)))
+    bump_data_version(db.session)
+    db.session.commit()
+    return deleted
+
+
+def create_users(crews):
+    """The admin plus `crews` crew users; returns (admin id, crew names)."""
+    existing = {u.username: u for u in User.query.filter(User.username.startswith(USER_PREFIX))}
+    # One hash per password; bcrypt per user would dominate small runs
+    hashes = {}
+
+    def user(username, name, role, password):
+        if username in existing:
+            return existing[username]
+        if password not in hashes:
+            hashes[password] = hash_password(password)
+        u = User(username=username, name=name, password=hashes[password], role=role)
+        db.session.add(u)
+        return u
+
+    admin = user(ADMIN_USERNAME, "Bench Admin", "admin", ADMIN_PASSWORD)
+    crew_users = [
+        user(f"{USER_PREFIX}crew-{i:02d}", f"Crew {i:02d}", "user", CREW_PASSWORD)
+        for i in range(1, crews + 1)
+    ]
+    db.session.commit()
+    return admin.id, [u.name for u in crew_users]
+
+
+def fieldwork_for(rng, created_at, crews):
+    visits = rng.choices(*VISIT_COUNTS)[0]
+    entries = []
+    first_day = created_at.date()
+    for _ in range(visits):
+        work_date = first_day + timedelta(days=rng.randint(0, 120))
+        if work_date > date.today():
+            work_date = date.today()
+        start_minutes = rng.randint(7 * 4, 10 * 4) * 15
+        duration = rng.randint(4, 24) * 15
+        start = datetime.combine(work_date, datetime.min.time()) + timedelta(minutes=start_minutes)
+        end = start + timedelta(minutes=duration)
+        entries.append(
+            {
+                "work_date": work_date,
+                "start_time": start.time(),
+                "end_time": end.time(),
+                "total_time": round(duration / 60, 2),
+                "crew": rng.choice(crews),
+                "drone_card": rng.choice([None, None, "A", "B"]),
+            }
+        )
+    return entries
+
+
+def generate(jobs, seed, crews, batch_size):
+    rng = data.stable_random(f"bench-{seed}")
+    admin_id, crew_names = create_users(crews)
+
+    clients = data.client_pool(rng, max(200, jobs // 40))
+    client_weights = data.client_weights(len(clients))
+    statuses = [s for s, _ in data.STATUSES]
+    status_weights = [w for _, w in data.STATUSES]
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    started = time.perf_counter()
+    created = fieldwork_rows = 0
+    for batch_start in range(0, jobs, batch_size):
+        count = min(batch_size, jobs - batch_start)
+        batch_clients = rng.choices(clients, weights=client_weights, k=count)
+        batch_statuses = rng.choices(statuses, weights=status_weights, k=count)
+
+        job_rows, fieldwork = [], []
+        for i in range(count):
+            city = data.pick_city(rng)
+            lat, lng = data.point_near(rng, city)
+            created_at = now - timedelta(days=HISTORY_DAYS * rng.random() ** 1.5)
+            entries = fieldwork_for(rng, created_at, crew_names)
+            deleted = rng.random() < DELETED_SHARE
+            job_rows.append(
+                {
+                    "job_number": f"{JOB_PREFIX}{seed}-{batch_start + i:07d}",
+                    "client": batch_clients[i],
+                    "address": data.address(rng, city),
+                    "county": city[0],
+                    "status": batch_statuses[i],
+                    "lat": str(lat),
+                    "long": str(lng),
+                    "latitude": lat,
+                    "longitude": lng,
+                    "enrichment_status": "done",
+                    "visited": len(entries),
+                    "total_time_spent": round(sum(e["total_time"] for e in entries), 2),
+                    "created_at": created_at,
+                    "created_by_id": admin_id,
+                    "deleted_at": created_at + timedelta(days=30) if deleted else None,
+                    "tags": [],
+                }
+            )
+            fieldwork.append(entries)
+
+        ids = db.session.scalars(
+            insert(Job).returning(Job.id, sort_by_parameter_order=True), job_rows
+        ).all()
+        rows = [
+            {**entry, "job_id": job_id}
+            for job_id, entries in zip(ids, fieldwork)
+            for entry in entries
+        ]
+        if rows:
+            db.session.execute(insert(FieldWork), rows)
+        bump_data_version(db.session)
+        db.session.commit()
+
+        created += count
+        fieldwork_rows += len(rows)
+        rate = created / (time.perf_counter() - started)
+        print(f"  {created}/{jobs} jobs, {fieldwork_rows} fieldwork entries ({rate:.0f} jobs/s)")
+
+    return created, fieldwork_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark dataset.")
+    parser.add_argument("--jobs", type=int, default=10_000, help="10k to 1M is the useful range")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--crews", type=int, default=12)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--reset", action="store_true", help="delete earlier bench rows first")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.reset:
+            print(f"🧹 Removed {reset()} bench jobs")
+        print(f"🏗️  Generating {args.jobs} jobs (seed {args.seed})…")
+        jobs, fieldwork = generate(args.jobs, args.seed, args.crews, args.batch_size)
+        # Planner estimates back the unfiltered job totals (see pagination.py)
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE jobs"))
+            conn.execute(text("ANALYZE field_work"))
+    print(f"✅ Done: {jobs} jobs, {fieldwork} fieldwork entries.")
+    print(f"   Log in as {ADMIN_USERNAME} / {ADMIN_PASSWORD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+Drive a running app with a fixed request mix and report how it held up.
+
+    python -m bench.load [--url http://127.0.0.1:5000] [--duration 60]
+                         [--concurrency 16] [--seed 42]
+                         [--save baseline.json] [--compare baseline.json]
+
+Each worker thread logs in as the bench admin and picks scenarios from
+SCENARIOS by weight until --duration runs out. Latency is measured at the
+client, and p50/p95/p99 come from every sample rather than from buckets.
+Queries per request are read from the server's /admin/api/metrics before
+and after the run, so start the app with a single worker process (see
+bench/__init__.py); otherwise only one worker's share is seen.
+
+--save writes the results as a JSON baseline. --compare prints each
+scenario against a saved baseline and exits with status 1 when p95
+latency grew by more than --tolerance or queries per request went up.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+from bench import data
+from bench.data import ADMIN_PASSWORD, ADMIN_USERNAME
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class Context:
+    """State shared by the scenarios: known jobs, fieldwork entries and page cursors."""
+
+    def __init__(self, url, seed):
+        self.url = url.rstrip("/")
+        self.seed = seed
+        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+        self.job_numbers = []
+        self.fieldwork_ids = []
+        self.cursors = []
+        self.created = 0
+        self._lock = threading.Lock()
+
+    def next_job_number(self):
+        with self._lock:
+            self.created += 1
+            return f"LOAD-{self.run_id}-{self.created:06d}"
+
+
+def login(url):
+    session = requests.Session()
+    res = session.post(
+        f"{url}/login",
+        data={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD},
+        allow_redirects=False,
+    )
+    if res.status_code != 302:
+        sys.exit(f"Login as {ADMIN_USERNAME} failed ({res.status_code}); run bench.generate first")
+    return session
+
+
+def viewport(rng):
+    """A bbox around a bench city, anywhere from street to regional scale."""
+    city = data.pick_city(rng)
+    lat, lng = data.point_near(rng, city)
+    half = rng.choice([0.01, 0.03, 0.1, 0.3])
+    west, south, east, north = lng - half * 1.5, lat - half, lng + half * 1.5, lat + half
+    return ",".join(f"{v:.6f}" for v in (west, south, east, north))
+
+
+# --- scenarios: each returns (method, URL rule as the server names it, response) ---
+
+
+def jobs_viewport(session, ctx, rng):
+    res = session.get(f"{ctx.url}/jobs", params={"bbox": viewport(rng)})
+    return "GET", "/jobs", res
+
+
+def admin_jobs(session, ctx, rng):
+    params = {"per_page": rng.choice([20, 50, 100])}
+    if rng.random() < 0.3:
+        params["status"] = rng.choice(data.STATUSES)[0]
+    if rng.random() < 0.2:
+        params["client"] = rng.choice(data.LAST_NAMES)
+    # Sometimes continue from a page seen earlier, as someone paging through would
+    if ctx.cursors and rng.random() < 0.3:
+        params["cursor"] = rng.choice(ctx.cursors)
+    res = session.get(f"{ctx.url}/admin/api/jobs", params=params)
+    if res.ok and res.json().get("next_cursor"):
+        ctx.cursors.append(res.json()["next_cursor"])
+        del ctx.cursors[:-100]
+    return "GET", "/admin/api/jobs", res
+
+
+def dashboard(session, ctx, rng):
+    return "GET", "/admin/api/dashboard", session.get(f"{ctx.url}/admin/api/dashboard")
+
+
+def create_job(session, ctx, rng):
+    city = data.pick_city(rng)
+    res = session.post(
+        f"{ctx.url}/admin/api/jobs",
+        json={
+            "job_number": ctx.next_job_number(),
+            "client": f"{rng.choice(data.FIRST_NAMES)} {rng.choice(data.LAST_NAMES)}",
+            "address": data.address(rng, city),
+            "status": rng.choice(data.STATUSES)[0],
+        },
+    )
+    if res.ok:
+        ctx.job_numbers.append(res.json()["job"]["job_number"])
+    return "POST", "/admin/api/jobs", res
+
+
+def add_fieldwork(session, ctx, rng):
+    job_number = rng.choice(ctx.job_numbers)
+    start = rng.randint(28, 40) * 15
+    end = start + rng.randint(4, 24) * 15
+    res = session.post(
+        f"{ctx.url}/jobs/{job_number}/fieldwork",
+        json={
+            "work_date": datetime.now().strftime("%Y-%m-%d"),
+            "start_time": f"{start // 60:02d}:{start % 60:02d}",
+            "end_time": f"{end // 60:02d}:{end % 60:02d}",
+            "crew": "Crew 01",
+        },
+    )
+    return "POST", "/jobs/<job_number>/fieldwork", res
+
+
+def edit_fieldwork(session, ctx, rng):
+    entry_id = rng.choice(ctx.fieldwork_ids)
+    end = rng.randint(44, 64) * 15
+    res = session.put(
+        f"{ctx.url}/fieldwork/{entry_id}",
+        json={"end_time": f"{end // 60:02d}:{end % 60:02d}"},
+    )
+    return "PUT", "/fieldwork/<int:entry_id>", res
+
+
+SCENARIOS = {
+    "jobs_viewport": (jobs_viewport, 30),
+    "admin_jobs": (admin_jobs, 20),
+    "dashboard": (dashboard, 10),
+    "create_job": (create_job, 5),
+    "add_fieldwork": (add_fieldwork, 10),
+    "edit_fieldwork": (edit_fieldwork, 10),
+}
+
+
+def prepare(session, ctx, sample=200):
+    """Collect job numbers and fieldwork ids for the write scenarios to use."""
+    res = session.get(f"{ctx.url}/jobs/markers")
+    res.raise_for_status()
+    numbers = [n for n in res.json()["job_number"] if n.startswith("BENCH-")]
+    if not numbers:
+        sys.exit("No bench jobs found; run bench.generate first")
+    rng = random.Random(ctx.seed)
+    ctx.job_numbers = rng.sample(numbers, min(len(numbers), 5000))
+    for job_number in ctx.job_numbers[:sample]:
+        entries = session.get(f"{ctx.url}/jobs/{job_number}/fieldwork").json()
+        ctx.fieldwork_ids.extend(e["id"] for e in entries)
+    if not ctx.fieldwork_ids:
+        sys.exit("No fieldwork found on the sampled jobs")
+
+
+def server_metrics(session, ctx):
+    res = session.get(f"{ctx.url}/admin/api/metrics")
+    res.raise_for_status()
+    return {(e["method"], e["endpoint"]): e for e in res.json()["endpoints"]}
+
+
+def worker(ctx, index, deadline, record_after):
+    rng = random.Random(f"{ctx.seed}-{index}")
+    session = login(ctx.url)
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[n][1] for n in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    rules = {}
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights=weights)[0]
+        start = time.perf_counter()
+        try:
+            method, rule, res = SCENARIOS[name][0](session, ctx, rng)
+            failed = res.status_code >= 400
+            rules[name] = (method, rule)
+        except requests.RequestException:
+            failed = True
+        elapsed = time.perf_counter() - start
+        if time.monotonic() < record_after:
+            continue
+        samples[name].append(elapsed)
+        errors[name] += failed
+    return samples, errors, rules
+
+
+def run(url, duration, concurrency, seed, warmup):
+    ctx = Context(url, seed)
+    admin = login(ctx.url)
+    prepare(admin, ctx)
+    total_jobs = admin.get(f"{ctx.url}/admin/api/dashboard").json().get("total_jobs")
+
+    start = time.monotonic()
+    record_after = start + warmup
+    deadline = record_after + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Metrics are read once warm-up is over, so it doesn't count
+        futures = [
+            pool.submit(worker, ctx, i, deadline, record_after) for i in range(concurrency)
+        ]
+        time.sleep(max(0, record_after - time.monotonic()))
+        before = server_metrics(admin, ctx)
+        results = [f.result() for f in futures]
+    after = server_metrics(admin, ctx)
+
+    scenarios = {}
+    for name in SCENARIOS:
+        latencies = sorted(s for samples, _, _ in results for s in samples[name])
+        errors = sum(e[name] for _, e, _ in results)
+        rule = next((r[name] for _, _, r in results if name in r), None)
+        queries = None
+        if rule in after:
+            count = after[rule]["count"] - before.get(rule, {}).get("count", 0)
+            spent = after[rule]["queries"] - before.get(rule, {}).get("queries", 0)
+            queries = round(spent / count, 2) if count else None
+
+        def ms(seconds):
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        scenarios[name] = {
+            "endpoint": " ".join(rule) if rule else None,
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / duration, 1),
+            "p50_ms": ms(percentile(latencies, 0.5)),
+            "p95_ms": ms(percentile(latencies, 0.95)),
+            "p99_ms": ms(percentile(latencies, 0.99)),
+            "queries_per_request": queries,
+        }
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "url": ctx.url,
+            "total_jobs": total_jobs,
+            "duration_seconds": duration,
+            "warmup_seconds": warmup,
+            "concurrency": concurrency,
+            "seed": seed,
+        },
+        "throughput_rps": round(sum(s["requests"] for s in scenarios.values()) / duration, 1),
+        "scenarios": scenarios,
+    }
+
+
+def _git_rev():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(result):
+    meta = result["meta"]
+    print(
+        f"\n{meta['total_jobs']} jobs, {meta['concurrency']} clients, {meta['duration_seconds']}s"
+        f" at {meta['git_rev']}: {result['throughput_rps']} req/s overall\n"
+    )
+    print(f"{'scenario':<16}{'reqs':>7}{'err':>5}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>8}")
+    for name, s in result["scenarios"].items():
+        print(
+            f"{name:<16}{s['requests']:>7}{s['errors']:>5}{s['throughput_rps']:>8}"
+            f"{_fmt(s['p50_ms']):>9}{_fmt(s['p95_ms']):>9}{_fmt(s['p99_ms']):>9}"
+            f"{_fmt(s['queries_per_request']):>8}"
+        )
+
+
+def _fmt(value):
+    return "-" if value is None else str(value)
+
+
+def compare(result, baseline, tolerance):
+    """Print changes against `baseline`; returns the names of regressed scenarios."""
+    print(f"\nAgainst baseline from {baseline['meta']['created_at']} ({baseline['meta']['git_rev']}):")
+    regressed = []
+    for name, s in result["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if not base or not base["p95_ms"] or not s["p95_ms"]:
+            continue
+        change = s["p95_ms"] / base["p95_ms"] - 1
+        more_queries = (
+            s["queries_per_request"] is not None
+            and base["queries_per_request"] is not None
+            and s["queries_per_request"] > base["queries_per_request"] + 0.5
+        )
+        flag = ""
+        if change > tolerance or more_queries:
+            regressed.append(name)
+            flag = "  <-- regression"
+        print(
+            f"  {name:<16} p95 {base['p95_ms']} -> {s['p95_ms']} ms ({change:+.0%}),"
+            f" queries {_fmt(base['queries_per_request'])} -> {_fmt(s['queries_per_request'])}{flag}"
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a running app.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--duration", type=int, default=60, help="measured seconds")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured seconds first")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth")
+    args = parser.parse_args()
+
+    result = run(args.url, args.duration, args.concurrency, args.seed, args.warmup)
+    report(result)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(result, json.load(f), args.tolerance)
+        if regressed:
+            sys.exit(f"\nRegressed: {', '.join(regressed)}")
+
+
+if __name__ == "__main__":
+    main()
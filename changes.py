@@ -0,0 +1,139 @@
+"""
+Commit-time change notifications.
+
+Every flush records which Job, FieldWork and User rows it created, updated
+or deleted. Once the transaction commits, registered listeners get one list
+of compact change events; rolled-back work is discarded. In-memory indexes
+and caches use this to stay current without re-reading the tables.
+
+An event looks like:
+
+    {"type": "job", "op": "updated", "id": 42, "data": {...snapshot...}}
+
+Soft-deleting a job (setting deleted_at) is reported as op "deleted".
+Events relayed from other workers (see events.py) go through the same
+listeners and carry "remote": True. Bulk Core inserts skip the flush hooks,
+so they report their rows with record_created_jobs.
+"""
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import FieldWork, Job, User
+
+_listeners = []
+
+
+def on_change(listener):
+    """Register `listener(events)` to run after each commit that changed data."""
+    _listeners.append(listener)
+    return listener
+
+
+def _previous(obj, attr):
+    # Attribute history is still intact during after_flush
+    history = inspect(obj).attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(obj, attr)
+
+
+def _job_data(job):
+    return {
+        "job_number": job.job_number,
+        "client": job.client,
+        "address": job.address,
+        "status": job.status,
+        "county": job.county,
+        "latitude": job.latitude,
+        "longitude": job.longitude,
+        "previous_client": _previous(job, "client"),
+        "previous_address": _previous(job, "address"),
+        "previous_latitude": _previous(job, "latitude"),
+        "previous_longitude": _previous(job, "longitude"),
+        "previous_deleted": _previous(job, "deleted_at") is not None,
+    }
+
+
+def _fieldwork_data(fw):
+    return {
+        "job_id": fw.job_id,
+        "work_date": fw.work_date.isoformat() if fw.work_date else None,
+        "crew": fw.crew,
+        "total_time": fw.total_time,
+    }
+
+
+SNAPSHOTS = {
+    Job: ("job", _job_data),
+    FieldWork: ("fieldwork", _fieldwork_data),
+    User: ("user", lambda user: {"username": user.username, "role": user.role}),
+}
+
+
+def _record(session, obj, op):
+    kind = SNAPSHOTS.get(type(obj))
+    if kind is None or obj.id is None:
+        return
+    type_name, snapshot = kind
+    if type_name == "job" and op != "deleted" and obj.deleted_at is not None:
+        op = "deleted"
+
+    pending = session.info.setdefault("pending_changes", {})
+    key = (type_name, obj.id)
+    previous = pending.get(key)
+    if previous and previous["op"] == "created" and op == "updated":
+        op = "created"
+    data = snapshot(obj)
+    if previous:
+        # Keep what the row was before the first flush of this transaction
+        for key in data:
+            if key.startswith("previous_"):
+                data[key] = previous["data"][key]
+    pending[key] = {"type": type_name, "op": op, "id": obj.id, "data": data}
+
+
+def record_created_jobs(session, ids, rows):
+    """Report jobs inserted with Core; `rows` are the inserted column values, in `ids` order."""
+    pending = session.info.setdefault("pending_changes", {})
+    for job_id, row in zip(ids, rows):
+        data = {
+            key: row.get(key)
+            for key in (
+                "job_number", "client", "address", "status", "county", "latitude", "longitude"
+            )
+        }
+        for key in ("client", "address", "latitude", "longitude"):
+            data[f"previous_{key}"] = data[key]
+        data["previous_deleted"] = False
+        pending[("job", job_id)] = {"type": "job", "op": "created", "id": job_id, "data": data}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    for obj in session.new:
+        _record(session, obj, "created")
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            _record(session, obj, "updated")
+    for obj in session.deleted:
+        _record(session, obj, "deleted")
+
+
+def dispatch(events):
+    """Hand `events` to every listener; used for local commits and relayed ones."""
+    for listener in _listeners:
+        try:
+            listener(events)
+        except Exception as e:
+            print(f"Change listener {listener.__name__} failed:", e)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changes(session):
+    pending = session.info.pop("pending_changes", None)
+    if pending:
+        dispatch(list(pending.values()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("pending_changes", None)
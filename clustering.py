@@ -0,0 +1,197 @@
+"""
+Server-side marker clustering.
+
+Jobs are projected to Web Mercator and bucketed into a grid per zoom level,
+with cells CLUSTER_RADIUS pixels wide. Each cell at zoom z is exactly four
+cells at z + 1, so the levels form a hierarchy like supercluster's. Every
+level is kept up to date incrementally: adding, moving or removing a job
+only touches the one cell it falls in at each zoom.
+
+The index is built from the database on first use and then follows job
+changes through changes.on_change. It is rebuilt from scratch every
+CLUSTER_MAX_AGE seconds to pick up writes made by other workers. Its
+fingerprint, an order-independent hash of the points it holds, goes into
+the /jobs/clusters ETag, so workers holding the same points agree on it and
+a lagging index never answers 304 for data it hasn't seen.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+
+from changes import on_change
+from models import Job, db
+
+CLUSTER_RADIUS = int(os.getenv("CLUSTER_RADIUS", "60"))
+CLUSTER_MAX_ZOOM = int(os.getenv("CLUSTER_MAX_ZOOM", "16"))
+CLUSTER_MAX_AGE = int(os.getenv("CLUSTER_MAX_AGE", "300"))
+
+# Web Mercator runs off to infinity at the poles
+MAX_LATITUDE = 85.05112878
+
+
+def project(lat, lng):
+    """Web Mercator position of (lat, lng) in the unit square."""
+    lat = min(max(lat, -MAX_LATITUDE), MAX_LATITUDE)
+    sin = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+    return (lng + 180) / 360, min(max(y, 0.0), 1.0)
+
+
+def _point_hash(job_id, point):
+    digest = hashlib.blake2b(repr((job_id, *point)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def unproject(x, y):
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return round(lat, 6), round(x * 360 - 180, 6)
+
+
+class ClusterIndex:
+    def __init__(self, radius=CLUSTER_RADIUS, max_zoom=CLUSTER_MAX_ZOOM):
+        self.radius = radius
+        self.max_zoom = max_zoom
+        self.points = {}  # job id -> (x, y, job_number, status)
+        # One grid per zoom: (cx, cy) -> [sum_x, sum_y, job ids]
+        self.levels = [{} for _ in range(max_zoom + 1)]
+        self.built_at = time.monotonic()
+        self.fingerprint = 0  # XOR of _point_hash over points
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.points)
+
+    def _scale(self, zoom):
+        return 256 * 2**zoom / self.radius
+
+    def add(self, job_id, lat, lng, job_number=None, status=None):
+        """Insert or move a job; jobs without coordinates are dropped."""
+        with self._lock:
+            self.remove(job_id)
+            if lat is None or lng is None:
+                return
+            x, y = project(lat, lng)
+            point = self.points[job_id] = (x, y, job_number, status)
+            self.fingerprint ^= _point_hash(job_id, point)
+            for zoom, cells in enumerate(self.levels):
+                scale = self._scale(zoom)
+                key = (int(x * scale), int(y * scale))
+                cell = cells.get(key)
+                if cell is None:
+                    cell = cells[key] = [0.0, 0.0, set()]
+                cell[0] += x
+                cell[1] += y
+                cell[2].add(job_id)
+
+    def remove(self, job_id):
+        with self._lock:
+            point = self.points.pop(job_id, None)
+            if point is None:
+                return
+            self.fingerprint ^= _point_hash(job_id, point)
+            x, y = point[0], point[1]
+            for zoom, cells in enumerate(self.levels):
+                scale = self._scale(zoom)
+                key = (int(x * scale), int(y * scale))
+                cell = cells[key]
+                cell[2].discard(job_id)
+                if not cell[2]:
+                    del cells[key]
+                else:
+                    cell[0] -= x
+                    cell[1] -= y
+
+    def clusters(self, west, south, east, north, zoom):
+        """Clusters and single jobs at `zoom` whose cells overlap the bbox."""
+        zoom = max(0, min(int(zoom), self.max_zoom))
+        scale = self._scale(zoom)
+        x0, y0 = project(north, west)
+        x1, y1 = project(south, east)
+        cx0, cx1 = int(x0 * scale), int(x1 * scale)
+        cy0, cy1 = int(y0 * scale), int(y1 * scale)
+
+        result = []
+        with self._lock:
+            cells = self.levels[zoom]
+            if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) < len(cells):
+                keys = [
+                    (cx, cy)
+                    for cx in range(cx0, cx1 + 1)
+                    for cy in range(cy0, cy1 + 1)
+                    if (cx, cy) in cells
+                ]
+            else:
+                keys = [
+                    k for k in cells if cx0 <= k[0] <= cx1 and cy0 <= k[1] <= cy1
+                ]
+
+            for key in keys:
+                sum_x, sum_y, ids = cells[key]
+                if len(ids) == 1:
+                    job_id = next(iter(ids))
+                    x, y, job_number, status = self.points[job_id]
+                    lat, lng = unproject(x, y)
+                    result.append(
+                        {
+                            "lat": lat,
+                            "lng": lng,
+                            "count": 1,
+                            "id": job_id,
+                            "job_number": job_number,
+                            "status": status,
+                        }
+                    )
+                else:
+                    lat, lng = unproject(sum_x / len(ids), sum_y / len(ids))
+                    result.append({"lat": lat, "lng": lng, "count": len(ids)})
+        return result
+
+    @classmethod
+    def from_database(cls):
+        index = cls()
+        rows = db.session.query(
+            Job.id, Job.latitude, Job.longitude, Job.job_number, Job.status
+        ).filter(Job.deleted_at == None, Job.latitude != None, Job.longitude != None)
+        for job_id, lat, lng, job_number, status in rows:
+            index.add(job_id, lat, lng, job_number, status)
+        return index
+
+
+_index = None
+_build_lock = threading.Lock()
+
+
+def get_cluster_index():
+    """The process-wide ClusterIndex, (re)built from the database as needed."""
+    global _index
+    index = _index
+    if index is not None and time.monotonic() - index.built_at < CLUSTER_MAX_AGE:
+        return index
+    with _build_lock:
+        if _index is index:
+            _index = ClusterIndex.from_database()
+        return _index
+
+
+@on_change
+def _apply_job_changes(events):
+    index = _index
+    if index is None:
+        return
+    for change in events:
+        if change["type"] != "job":
+            continue
+        if change["op"] == "deleted":
+            index.remove(change["id"])
+        else:
+            data = change["data"]
+            index.add(
+                change["id"],
+                data["latitude"],
+                data["longitude"],
+                data["job_number"],
+                data["status"],
+            )
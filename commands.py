@@ -0,0 +1,64 @@
+"""
+Maintenance commands, registered on the app's `flask` CLI.
+
+    flask --app app reconcile-fieldwork
+    flask --app app run-enrichment
+    flask --app app retry-enrichment
+    flask --app app backfill-property-links
+    flask --app app build-county-assets
+"""
+
+import click
+
+import county_assets
+import enrichment
+import property_links
+from county_index import CountyIndex, get_county_index
+from models import Job, db
+
+
+def init_app(app):
+    @app.cli.command("reconcile-fieldwork")
+    def reconcile_fieldwork():
+        """Fix jobs whose visited/total_time_spent drifted from their fieldwork."""
+        fixed = Job.reconcile_fieldwork_totals()
+        db.session.commit()
+        click.echo(f"Reconciled fieldwork totals on {fixed} jobs")
+
+    @app.cli.command("run-enrichment")
+    def run_enrichment():
+        """Run every due enrichment task now, in this process."""
+        click.echo(f"Ran {enrichment.drain()} enrichment tasks")
+
+    @app.cli.command("retry-enrichment")
+    def retry_enrichment():
+        """Requeue enrichment tasks that ran out of attempts."""
+        click.echo(f"Requeued {enrichment.requeue_failed()} enrichment tasks")
+
+    @app.cli.command("backfill-property-links")
+    @click.option("--workers", default=property_links.BACKFILL_WORKERS, show_default=True)
+    @click.option("--limit", type=int, help="Only look at this many jobs.")
+    def backfill_property_links(workers, limit):
+        """Fill in BCPAO links for Brevard jobs that are missing one."""
+        counts = property_links.run_backfill(workers=workers, limit=limit)
+        if counts is None:
+            click.echo("A backfill is already running")
+        else:
+            click.echo(
+                f"{counts['addresses']} addresses: linked {counts['linked_jobs']} jobs, "
+                f"{counts['not_found']} not found, {counts['failed']} failed"
+            )
+
+    @app.cli.command("build-county-assets")
+    @click.option("--source", help="County GeoJSON to build from.")
+    def build_county_assets(source):
+        """Write the simplified, precompressed county layers the map loads."""
+        index = CountyIndex.from_geojson(source) if source else get_county_index()
+        if index is None:
+            raise click.ClickException("No county boundaries to build from")
+        manifest = county_assets.build(index.names.tolist(), index.geometries)
+        for level in manifest["levels"]:
+            click.echo(
+                f"{level['file']}: {level['bytes']} bytes,"
+                f" {level['gzip_bytes']} gzip, {level['brotli_bytes']} brotli"
+            )
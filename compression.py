@@ -0,0 +1,78 @@
+"""
+Negotiated response compression.
+
+Responses of at least COMPRESS_MIN_SIZE bytes with a compressible mimetype
+are compressed with brotli or gzip, whichever the client prefers.
+COMPRESS_MIN_SIZE defaults to about one packet, below which compression
+saves nothing on the wire. Streams (the /events feed), files sent by
+send_file, and responses that already carry a Content-Encoding (the
+precompressed county assets) pass through untouched.
+
+A strong ETag is turned weak when the body is compressed, as nginx does,
+since the bytes differ per encoding; versioning.conditional compares ETags
+weakly.
+"""
+
+import gzip
+import os
+
+import brotli
+from flask import request
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1400"))
+BROTLI_QUALITY = 4  # brotli's fast end still beats gzip -6 on JSON
+GZIP_LEVEL = 6
+
+COMPRESSIBLE = {
+    "application/json",
+    "application/javascript",
+    "application/vnd.mapbox-vector-tile",
+    "text/css",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+}
+
+
+def _encoding():
+    accept = request.accept_encodings
+    br, gz = accept["br"], accept["gzip"]
+    if not (br or gz):
+        return None
+    return "br" if br >= gz else "gzip"
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def init_app(app):
+    @app.after_request
+    def _compress_response(resp):
+        if (
+            resp.status_code < 200
+            or resp.status_code >= 300
+            or resp.status_code in (204, 206)
+            or resp.direct_passthrough
+            or resp.is_streamed
+            or "Content-Encoding" in resp.headers
+            or resp.mimetype not in COMPRESSIBLE
+        ):
+            return resp
+
+        resp.vary.add("Accept-Encoding")
+        encoding = _encoding()
+        if encoding is None:
+            return resp
+        data = resp.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return resp
+
+        resp.set_data(compress(data, encoding))
+        resp.headers["Content-Encoding"] = encoding
+        etag, weak = resp.get_etag()
+        if etag and not weak:
+            resp.set_etag(etag, weak=True)
+        return resp
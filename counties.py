@@ -4,6 +4,8 @@ import sqlalchemy
 import os
 from dotenv import load_dotenv
 
+import county_assets
+
 load_dotenv()
 
 # Load your Supabase database URL from .env or paste directly for now
@@ -17,3 +19,7 @@ engine = sqlalchemy.create_engine(db_url)
 gdf.to_postgis("counties", engine, if_exists="replace", index=False)
 print("✅ Counties uploaded to Supabase!")
 
+# Rebuild the simplified map layers from the same boundaries
+manifest = county_assets.build(gdf["name"].tolist(), gdf.geometry.values)
+for level in manifest["levels"]:
+    print(f"✅ {level['file']}: {level['bytes']} bytes, {level['brotli_bytes']} brotli")
@@ -0,0 +1,226 @@
+"""
+Prebuilt county boundary assets for the map.
+
+`flask build-county-assets` writes one GeoJSON file per zoom band in LEVELS
+to static/data/counties/. Each file is simplified to that band's tolerance,
+and its coordinates are rounded to the precision the band can show.
+Simplification works on shared borders instead of on each county. The
+boundaries are split into arcs between junctions, each arc is simplified
+once, and the county polygons are rebuilt from the simplified arcs. So
+neighbouring counties still meet exactly, with no gaps or overlaps. Each
+feature carries a label anchor (the pole of inaccessibility of the
+county's largest part), so the browser computes none.
+
+Files are named by a hash of their contents and written next to gzip and
+brotli copies. serve() picks the copy the client accepts and marks it
+immutable for a year. A rebuild writes new names, so old copies in caches
+are simply never asked for again. manifest.json lists the current files
+and the previous build's, which are kept (and still served) so pages
+rendered before a rebuild keep working; the map page embeds it. Workers
+reload the manifest whenever its mtime changes.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import brotli
+import numpy as np
+import shapely
+from flask import abort, request, send_file
+from shapely.geometry import mapping
+from shapely.ops import linemerge, polygonize, polylabel, unary_union
+
+ASSET_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "static", "data", "counties"
+)
+MANIFEST_PATH = os.path.join(ASSET_DIR, "manifest.json")
+ASSET_MAX_AGE = 365 * 86400
+
+# (name, min zoom, max zoom, simplify tolerance in degrees, decimal places)
+LEVELS = [
+    ("low", 0, 8, 0.005, 3),
+    ("mid", 9, 11, 0.0005, 4),
+    ("high", 12, None, 0.00005, 5),
+]
+
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def simplify_shared(geometries, tolerance):
+    """Simplify adjacent polygons together so their shared borders stay shared."""
+    # Node all boundaries, then merge them into arcs that run junction to junction
+    arcs = linemerge(unary_union([g.boundary for g in geometries]))
+    arcs = getattr(arcs, "geoms", [arcs])
+    simplified = [arc.simplify(tolerance, preserve_topology=True) for arc in arcs]
+    # Re-node, in case two simplified arcs now cross
+    faces = list(polygonize(unary_union(simplified)))
+
+    tree = shapely.STRtree(geometries)
+    parts = [[] for _ in geometries]
+    for face in faces:
+        # Simplified faces drift a little, so give each to the county it
+        # mostly overlaps; faces mostly outside every county are gaps
+        overlaps = {
+            i: face.intersection(geometries[i]).area
+            for i in tree.query(face, predicate="intersects")
+        }
+        if overlaps:
+            best = max(overlaps, key=overlaps.get)
+            if overlaps[best] >= face.area / 2:
+                parts[best].append(face)
+
+    return [
+        unary_union(faces) if faces else geom.simplify(tolerance, preserve_topology=True)
+        for geom, faces in zip(geometries, parts)
+    ]
+
+
+def label_anchor(geometry):
+    """(lat, lng) inside the county's largest part, as far from its edges as possible."""
+    largest = max(getattr(geometry, "geoms", [geometry]), key=lambda g: g.area)
+    point = polylabel(largest, tolerance=0.001)
+    return [round(point.y, 5), round(point.x, 5)]
+
+
+def _write(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build(names, geometries, asset_dir=ASSET_DIR):
+    """Write every level's files and the manifest; returns the manifest."""
+    os.makedirs(asset_dir, exist_ok=True)
+    manifest_path = os.path.join(asset_dir, "manifest.json")
+    try:
+        with open(manifest_path) as f:
+            previous = [level["file"] for level in json.load(f)["levels"]]
+    except (OSError, ValueError, KeyError):
+        previous = []
+    geometries = list(geometries)
+    anchors = [label_anchor(g) for g in geometries]
+
+    levels = []
+    for level, min_zoom, max_zoom, tolerance, decimals in LEVELS:
+        features = []
+        for name, geom, anchor in zip(
+            names, simplify_shared(geometries, tolerance), anchors
+        ):
+            geom = shapely.transform(geom, lambda c: np.round(c, decimals))
+            features.append(
+                {
+                    "type": "Feature",
+                    "properties": {"name": name, "label": anchor},
+                    "geometry": mapping(geom),
+                }
+            )
+        body = json.dumps(
+            {"type": "FeatureCollection", "features": features}, separators=(",", ":")
+        ).encode()
+
+        filename = f"counties.{level}.{hashlib.sha256(body).hexdigest()[:12]}.json"
+        path = os.path.join(asset_dir, filename)
+        _write(path, body)
+        _write(path + ".gz", gzip.compress(body, compresslevel=9, mtime=0))
+        _write(path + ".br", brotli.compress(body, quality=11))
+        levels.append(
+            {
+                "name": level,
+                "min_zoom": min_zoom,
+                "max_zoom": max_zoom,
+                "file": filename,
+                "bytes": len(body),
+                "gzip_bytes": os.path.getsize(path + ".gz"),
+                "brotli_bytes": os.path.getsize(path + ".br"),
+            }
+        )
+
+    current = {level["file"] for level in levels}
+    previous = [f for f in previous if f not in current]
+    manifest = {"levels": levels, "previous": previous}
+    _write(manifest_path, json.dumps(manifest, indent=2).encode())
+
+    # Drop files from the builds before the previous one; workers still on
+    # the previous manifest may be rendering links to its files
+    keep = current | set(previous)
+    for filename in os.listdir(asset_dir):
+        if filename.startswith("counties.") and filename.split(".json")[0] + ".json" not in keep:
+            os.remove(os.path.join(asset_dir, filename))
+
+    reset_manifest()
+    return manifest
+
+
+_manifest = None
+_mtime = None
+_lock = threading.Lock()
+
+
+def get_manifest():
+    """The current manifest, or None if the assets haven't been built."""
+    global _manifest, _mtime
+    try:
+        mtime = os.stat(MANIFEST_PATH).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime == _mtime:
+        return _manifest
+    with _lock:
+        if mtime != _mtime:
+            try:
+                with open(MANIFEST_PATH) as f:
+                    _manifest = json.load(f)
+            except (OSError, ValueError):
+                _manifest = None
+            _mtime = mtime
+    return _manifest
+
+
+def reset_manifest():
+    global _manifest, _mtime
+    with _lock:
+        _manifest = None
+        _mtime = None
+
+
+def client_manifest():
+    """What the map page needs: each level's zoom range and URL."""
+    manifest = get_manifest()
+    if manifest is None:
+        return None
+    return [
+        {
+            "min_zoom": level["min_zoom"],
+            "max_zoom": level["max_zoom"],
+            "url": f"/assets/counties/{level['file']}",
+        }
+        for level in manifest["levels"]
+    ]
+
+
+def serve(filename):
+    """Response for one asset, precompressed if the client accepts it."""
+    manifest = get_manifest()
+    if manifest is None:
+        abort(404)
+    served = {l["file"] for l in manifest["levels"]} | set(manifest.get("previous", ()))
+    if filename not in served:
+        abort(404)
+
+    path = os.path.join(ASSET_DIR, filename)
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if request.accept_encodings[name] and os.path.exists(path + suffix):
+            path, encoding = path + suffix, name
+            break
+
+    resp = send_file(path, mimetype="application/json", max_age=ASSET_MAX_AGE)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = f"private, max-age={ASSET_MAX_AGE}, immutable"
+    return resp
@@ -0,0 +1,125 @@
+"""
+In-memory county lookup.
+
+County polygons are loaded once per worker, from
+static/data/florida_counties.geojson when it exists or from the `counties`
+table otherwise, into a shapely STRtree of prepared geometries. Point lookups
+(single or vectorized) then never touch the database.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+import shapely
+from shapely.geometry import shape
+from sqlalchemy import text
+
+from models import db
+
+GEOJSON_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "static",
+    "data",
+    "florida_counties.geojson",
+)
+
+
+class CountyIndex:
+    def __init__(self, names, geometries):
+        self.names = np.asarray(names, dtype=object)
+        self.geometries = np.asarray(geometries, dtype=object)
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_geojson(cls, path=GEOJSON_PATH):
+        with open(path) as f:
+            data = json.load(f)
+        names, geometries = [], []
+        for feature in data["features"]:
+            props = feature.get("properties") or {}
+            names.append(props.get("NAME") or props.get("name"))
+            geometries.append(shape(feature["geometry"]))
+        return cls(names, geometries)
+
+    @classmethod
+    def from_table(cls, conn):
+        rows = conn.execute(
+            text("SELECT name, ST_AsBinary(geometry) FROM counties")
+        ).fetchall()
+        names = [row[0] for row in rows]
+        geometries = shapely.from_wkb([bytes(row[1]) for row in rows])
+        return cls(names, geometries)
+
+    def label_points(self):
+        """One label anchor per county, guaranteed to fall inside it."""
+        anchors = shapely.point_on_surface(self.geometries)
+        return [
+            {"name": name, "lat": round(p.y, 5), "lng": round(p.x, 5)}
+            for name, p in zip(self.names, anchors)
+        ]
+
+    def lookup(self, lat, lon):
+        """County name containing (lat, lon), or None."""
+        return self.lookup_many([lat], [lon])[0]
+
+    def lookup_many(self, lats, lons):
+        """Vectorized lookup; returns a list of county names (or None) per point."""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        pts = shapely.points(lons, lats)
+        # "within" matches ST_Contains(county, point); boundary points don't count
+        point_idx, county_idx = self.tree.query(pts, predicate="within")
+
+        result = [None] * len(pts)
+        # Walk backwards so the first matching county wins, like LIMIT 1
+        for i, c in zip(point_idx[::-1], county_idx[::-1]):
+            result[i] = self.names[c]
+        return result
+
+
+_index = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def _load():
+    if os.path.exists(GEOJSON_PATH):
+        return CountyIndex.from_geojson(GEOJSON_PATH)
+    with db.engine.connect() as conn:
+        return CountyIndex.from_table(conn)
+
+
+def get_county_index():
+    """
+    The process-wide CountyIndex, loaded on first use.
+
+    Returns None if neither the GeoJSON file nor the counties table could be
+    loaded; callers then fall back to querying PostGIS directly.
+    """
+    global _index, _loaded
+    if _loaded:
+        return _index
+    with _lock:
+        if not _loaded:
+            try:
+                _index = _load()
+                print(f"County index loaded ({len(_index)} counties)")
+            except Exception as e:
+                print("County index unavailable, using PostGIS:", e)
+                _index = None
+            _loaded = True
+    return _index
+
+
+def reset_county_index():
+    """Drop the loaded index so the next lookup reloads the geometries."""
+    global _index, _loaded
+    with _lock:
+        _index = None
+        _loaded = False
@@ -0,0 +1,176 @@
+"""
+Cached admin dashboard metrics.
+
+All the dashboard numbers are computed in a handful of aggregate queries.
+Job counts by status and by county come from one GROUP BY GROUPING SETS
+pass. The result is kept for DASHBOARD_TTL seconds. Once a value reaches
+DASHBOARD_REFRESH_AT of its TTL, the next request still gets it, but a
+background thread starts recomputing it so no request waits on the
+aggregates. A committed job or fieldwork change (local or relayed from
+another worker) expires the cached value immediately, as does adding or
+removing a user. User updates don't, since every sign-in writes one and
+none of them change the numbers.
+"""
+
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from changes import on_change
+from models import FieldWork, Job, User, db
+from serializers import JobSerializer
+
+DASHBOARD_TTL = int(os.getenv("DASHBOARD_TTL", "600"))
+DASHBOARD_REFRESH_AT = 0.8
+RECENT_JOBS = 5
+# Always listed in status_counts, with 0 when no job has them
+STATUSES = (
+    "On Hold/Pending",
+    "Needs Fieldwork",
+    "Fieldwork Complete/Needs Office Work",
+    "To Be Printed/Packaged",
+    "Survey Complete/Invoice Sent/Unpaid",
+    "Set/Flag Pins",
+    "Completed/To Be Filed",
+    "Ongoing Site Plan",
+)
+
+
+def compute_dashboard():
+    """Aggregate every dashboard metric straight from the database."""
+    grouped = db.session.execute(
+        select(
+            func.grouping(Job.status).label("by_county"),
+            Job.status,
+            Job.county,
+            func.count(Job.id),
+        )
+        .where(Job.deleted_at == None)
+        .group_by(func.grouping_sets(Job.status, Job.county))
+    ).all()
+
+    status_counts, county_counts, total_jobs = dict.fromkeys(STATUSES, 0), {}, 0
+    for by_county, status, county, count in grouped:
+        if by_county:
+            county_counts[county or "Unknown"] = count
+        else:
+            total_jobs += count
+            if status:
+                status_counts[status] = count
+
+    crew_hours = db.session.execute(
+        select(
+            FieldWork.crew,
+            func.coalesce(func.sum(FieldWork.total_time), 0.0),
+            func.count(FieldWork.id),
+        )
+        .join(Job, FieldWork.job_id == Job.id)
+        .where(Job.deleted_at == None)
+        .group_by(FieldWork.crew)
+    ).all()
+
+    total_users = db.session.execute(select(func.count(User.id))).scalar()
+    recent_jobs = (
+        JobSerializer.query(Job.active())
+        .order_by(Job.created_at.desc())
+        .limit(RECENT_JOBS)
+        .all()
+    )
+
+    return {
+        "total_jobs": total_jobs,
+        "total_users": total_users,
+        "status_counts": dict(
+            sorted(status_counts.items(), key=lambda item: -item[1])
+        ),
+        "county_counts": dict(
+            sorted(county_counts.items(), key=lambda item: -item[1])
+        ),
+        "crew_hours": [
+            {"crew": crew or "Unassigned", "hours": round(hours, 2), "visits": visits}
+            for crew, hours, visits in sorted(crew_hours, key=lambda row: -row[1])
+        ],
+        "recent_jobs": JobSerializer.dump_many(recent_jobs),
+    }
+
+
+class DashboardCache:
+    def __init__(self, ttl=DASHBOARD_TTL):
+        self.ttl = ttl
+        self._value = None
+        self._computed_at = 0.0
+        self._generation = 0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        """Cached metrics, recomputing inline only when missing or expired."""
+        with self._lock:
+            value = self._value
+            age = time.monotonic() - self._computed_at
+            if value is not None and age < self.ttl:
+                self.hits += 1
+                if age >= self.ttl * DASHBOARD_REFRESH_AT and not self._refreshing:
+                    self._refreshing = True
+                    self._start_refresh()
+                return value
+            self.misses += 1
+            generation = self._generation
+
+        value = compute_dashboard()
+        self._store(value, generation)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._generation += 1
+
+    def _store(self, value, generation):
+        with self._lock:
+            # A write that landed while we were computing makes this stale
+            if generation == self._generation:
+                self._value = value
+                self._computed_at = time.monotonic()
+
+    def _start_refresh(self):
+        app = current_app._get_current_object()
+        generation = self._generation
+
+        def refresh():
+            try:
+                with app.app_context():
+                    self._store(compute_dashboard(), generation)
+            except Exception as e:
+                print("Dashboard refresh failed:", e)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=refresh, name="dashboard-refresh", daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "age_seconds": round(time.monotonic() - self._computed_at)
+                if self._value is not None
+                else None,
+            }
+
+
+dashboard_cache = DashboardCache()
+
+
+@on_change
+def _invalidate_dashboard(events):
+    if any(e["type"] != "user" or e["op"] != "updated" for e in events):
+        dashboard_cache.invalidate()
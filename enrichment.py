@@ -0,0 +1,208 @@
+"""
+Background job enrichment.
+
+Creating a job no longer waits on Google, the county lookup or BCPAO. The
+route commits the job with enrichment_status "pending" plus an
+EnrichmentTask row in the same transaction, and returns. A small pool of
+threads in each worker claims due tasks with SELECT ... FOR UPDATE SKIP
+LOCKED, so workers on every host share one queue and never take the same
+task. Each thread then fills in the job's coordinates, county and property
+appraiser link.
+
+A task that fails is retried with jittered exponential backoff, up to
+ENRICHMENT_MAX_ATTEMPTS times. After that both the task and the job are
+marked "failed". A claimed task holds a lease; if its worker dies, the task
+becomes due again once the lease expires. The pool sleeps between polls
+and wakes as soon as a job is created.
+"""
+
+import os
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from changes import on_change
+from geocoding import geocode_address
+from models import EnrichmentTask, db
+from utils import get_brevard_property_link, get_county_from_coords
+
+ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "6"))
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+LEASE = timedelta(minutes=5)
+POLL_SECONDS = 10
+
+# Geocoder answers that retrying won't change
+FINAL_GEOCODE_STATUSES = {"OK", "ZERO_RESULTS", "INVALID_REQUEST"}
+
+
+class RetryableError(Exception):
+    pass
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue(job):
+    """Queue `job` for enrichment; commits with the caller's transaction."""
+    job.enrichment_status = "pending"
+    now = _utcnow()
+    task = EnrichmentTask(job=job, status="pending", attempts=0, run_at=now, created_at=now)
+    db.session.add(task)
+    return task
+
+
+def enrich_job(job):
+    """Fill in whatever of coordinates, county and property link is missing."""
+    if job.latitude is None or job.longitude is None:
+        geo = geocode_address(job.address)
+        if geo is not None and geo.status not in FINAL_GEOCODE_STATUSES:
+            raise RetryableError(f"Geocoding failed: {geo.status}")
+        if geo is not None and geo.ok:
+            job.lat = str(geo.lat)
+            job.long = str(geo.lng)
+            job.address = geo.formatted_address
+
+    if job.latitude is not None and job.longitude is not None and not job.county:
+        job.county = get_county_from_coords(job.latitude, job.longitude)
+
+    if job.county and job.county.upper() == "BREVARD" and not job.prop_appr_link:
+        job.prop_appr_link = get_brevard_property_link(job.address)
+
+
+def claim_next():
+    """Lease the next due task to this thread, or return None."""
+    now = _utcnow()
+    task = db.session.execute(
+        select(EnrichmentTask)
+        .where(
+            EnrichmentTask.status.in_(("pending", "running")),
+            EnrichmentTask.run_at <= now,
+        )
+        .order_by(EnrichmentTask.run_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar()
+    if task is None:
+        db.session.rollback()
+        return None
+
+    task.status = "running"
+    task.attempts += 1
+    task.run_at = now + LEASE
+    db.session.commit()
+    return task
+
+
+def _retry_delay(attempts):
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.5))
+
+
+def run_task(task):
+    job = task.job
+    try:
+        if job is not None and job.deleted_at is None:
+            enrich_job(job)
+    except Exception as e:
+        db.session.rollback()
+        task.last_error = str(e)[:1000]
+        if task.attempts >= MAX_ATTEMPTS:
+            task.status = "failed"
+            task.finished_at = _utcnow()
+            if task.job is not None:
+                task.job.enrichment_status = "failed"
+            print(f"Enrichment of job {task.job_id} failed for good: {e}")
+        else:
+            task.status = "pending"
+            task.run_at = _utcnow() + _retry_delay(task.attempts)
+            print(f"Enrichment of job {task.job_id} failed ({e}); retrying")
+        db.session.commit()
+        return
+
+    task.status = "done"
+    task.finished_at = _utcnow()
+    task.last_error = None
+    if job is not None:
+        job.enrichment_status = "done"
+    db.session.commit()
+
+
+def drain():
+    """Run due tasks in this thread until none are left; returns how many ran."""
+    ran = 0
+    while True:
+        task = claim_next()
+        if task is None:
+            return ran
+        run_task(task)
+        ran += 1
+
+
+def requeue_failed():
+    """Give every failed task a fresh set of attempts; returns how many."""
+    failed = EnrichmentTask.query.filter_by(status="failed").all()
+    for task in failed:
+        task.status = "pending"
+        task.attempts = 0
+        task.run_at = _utcnow()
+        task.finished_at = None
+        task.job.enrichment_status = "pending"
+    db.session.commit()
+    pool.wake()
+    return len(failed)
+
+
+class EnrichmentPool:
+    def __init__(self, size=ENRICHMENT_WORKERS):
+        self.size = size
+        self._wakeup = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.size):
+            threading.Thread(
+                target=self._work, args=(app,), name=f"enrichment-{i}", daemon=True
+            ).start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _work(self, app):
+        while True:
+            try:
+                with app.app_context():
+                    task = claim_next()
+                    if task is not None:
+                        run_task(task)
+                        continue
+            except Exception as e:
+                print("Enrichment worker error:", e)
+            self._wakeup.wait(POLL_SECONDS)
+            self._wakeup.clear()
+
+
+pool = EnrichmentPool()
+
+
+@on_change
+def _wake_for_new_jobs(events):
+    if any(e["type"] == "job" and e["op"] == "created" for e in events):
+        pool.wake()
+
+
+def init_app(app):
+    @app.before_request
+    def _start_enrichment_pool():
+        pool.start(app)
@@ -0,0 +1,209 @@
+"""
+Live change events over Server-Sent Events.
+
+Every committed change (see changes.py) is pushed to the open /events
+streams of this worker. To reach clients connected to other gunicorn
+workers, the worker also sends the events with Postgres NOTIFY. Each worker
+runs one LISTEN thread that relays its peers' events to its own streams and
+to its change listeners, which keeps per-worker indexes current too.
+Events are packed into as few NOTIFY payloads as fit pg_notify's size
+limit, with previous_* fields left out where they equal the current value
+(the receiver fills them back in), and each payload is sent on its own.
+When LISTEN/NOTIFY isn't available the hub falls back to local fan-out only.
+
+Each open stream holds one gunicorn thread (and no database connection)
+for as long as the client stays connected, so a worker takes at most
+MAX_STREAMS of them, by default half its WEB_THREADS; the rest are kept for
+ordinary requests. Past that, /events answers 503 and the browser retries
+later. The stream sends a comment line every KEEPALIVE_SECONDS so proxies
+keep it open.
+"""
+
+import json
+import os
+import queue
+import select
+import threading
+import time
+import uuid
+
+from sqlalchemy import func, select as sql_select
+
+import changes
+from models import db
+
+CHANNEL = "epicmap_changes"
+KEEPALIVE_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 256
+WEB_THREADS = int(os.getenv("WEB_THREADS", "32"))
+MAX_STREAMS = int(os.getenv("EVENTS_MAX_STREAMS", str(WEB_THREADS // 2)))
+# NOTIFY payloads must stay under 8000 bytes
+MAX_NOTIFY_BYTES = 7900
+
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def compact(change):
+    """Drop the fields clients don't need from a change event."""
+    data = {k: v for k, v in change["data"].items() if not k.startswith("previous_")}
+    return {"type": change["type"], "op": change["op"], "id": change["id"], "data": data}
+
+
+def _to_wire(change):
+    """`change` without the previous_* fields that equal the current value."""
+    data = change["data"]
+    slim = {
+        k: v
+        for k, v in data.items()
+        if not (k.startswith("previous_") and v == data.get(k[len("previous_") :]))
+    }
+    return {**change, "data": slim}
+
+
+def _from_wire(change):
+    data = dict(change["data"])
+    for k, v in change["data"].items():
+        if not k.startswith("previous_"):
+            data.setdefault(f"previous_{k}", v)
+    return {**change, "data": data, "remote": True}
+
+
+def notify_payloads(events):
+    """JSON NOTIFY payloads for `events`, each under MAX_NOTIFY_BYTES where possible."""
+    head = f'{{"origin":{json.dumps(WORKER_ID)},"events":['
+    batches, batch, size = [], [], len(head) + 2
+    for change in events:
+        encoded = json.dumps(_to_wire(change), separators=(",", ":"))
+        # +1 for the comma between events
+        if batch and size + len(encoded) + 1 > MAX_NOTIFY_BYTES:
+            batches.append(batch)
+            batch, size = [], len(head) + 2
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        batches.append(batch)
+    return [head + ",".join(batch) + "]}" for batch in batches]
+
+
+class EventHub:
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._engine = None
+        self._listener = None
+
+    # --- local fan-out ---
+
+    def subscribe(self, role):
+        """A queue for a new stream, or None if this worker has MAX_STREAMS open."""
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            if len(self._subscribers) >= MAX_STREAMS:
+                return None
+            self._subscribers[q] = role
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.pop(q, None)
+
+    def publish(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for q, role in subscribers:
+            # User events are only for admins
+            visible = [e for e in events if e["type"] != "user" or role == "admin"]
+            if not visible:
+                continue
+            try:
+                q.put_nowait(visible)
+            except queue.Full:
+                # A client that stopped reading gets dropped, not waited on
+                self.unsubscribe(q)
+
+    def stream(self, q):
+        yield "retry: 5000\n\n"
+        try:
+            while True:
+                try:
+                    events = q.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: changes\ndata: {json.dumps(events)}\n\n"
+        finally:
+            self.unsubscribe(q)
+
+    # --- cross-worker relay ---
+
+    def start(self, engine):
+        """Start the LISTEN thread once; does nothing off Postgres."""
+        if self._listener is not None or engine.dialect.name != "postgresql":
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._engine = engine
+            self._listener = threading.Thread(
+                target=self._listen, name="event-hub-listener", daemon=True
+            )
+            self._listener.start()
+
+    def broadcast(self, events):
+        """NOTIFY peers about locally committed events."""
+        if self._engine is None:
+            return
+        # One transaction per payload, so a failed one doesn't take the rest with it
+        for payload in notify_payloads(events):
+            try:
+                with self._engine.begin() as conn:
+                    conn.execute(sql_select(func.pg_notify(CHANNEL, payload)))
+            except Exception as e:
+                print("Change broadcast failed:", e)
+
+    def _listen(self):
+        backoff = 1
+        while True:
+            try:
+                conn = self._engine.raw_connection()
+                try:
+                    dbapi_conn = conn.dbapi_connection
+                    dbapi_conn.autocommit = True
+                    dbapi_conn.cursor().execute(f"LISTEN {CHANNEL}")
+                    backoff = 1
+                    while True:
+                        if select.select([dbapi_conn], [], [], 60) == ([], [], []):
+                            continue
+                        dbapi_conn.poll()
+                        while dbapi_conn.notifies:
+                            self._relay(dbapi_conn.notifies.pop(0).payload)
+                finally:
+                    conn.invalidate()
+            except Exception as e:
+                print(f"Event listener disconnected ({e}); retrying in {backoff}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def _relay(self, payload):
+        message = json.loads(payload)
+        if message["origin"] == WORKER_ID:
+            return
+        changes.dispatch([_from_wire(e) for e in message["events"]])
+
+
+hub = EventHub()
+
+
+@changes.on_change
+def _push_changes(events):
+    hub.publish([compact(e) for e in events])
+    # Relayed events arrive here too; only re-send what this worker committed
+    local = [e for e in events if not e.get("remote")]
+    if local:
+        hub.broadcast(local)
+
+
+def init_app(app):
+    @app.before_request
+    def _start_event_listener():
+        hub.start(db.engine)
@@ -0,0 +1,194 @@
+"""
+Google geocoding with a two-tier cache.
+
+Lookups go through an in-process LRU first, then the `geocode_cache` table,
+and only then out to Google. Successful results are kept for
+GEOCODE_CACHE_TTL_DAYS; addresses Google could not resolve (ZERO_RESULTS)
+are cached for a shorter GEOCODE_NEGATIVE_TTL_HOURS so typos don't keep
+hitting the API. Transient failures (HTTP errors, quota, timeouts) are never
+cached.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta, timezone
+
+import requests
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from http_client import get_client
+from models import GeocodeCache, db
+
+# Overridable so benchmarks can point it at bench/fake_providers.py
+GEOCODE_URL = os.getenv("GEOCODE_URL", "https://maps.googleapis.com/maps/api/geocode/json")
+
+CACHE_TTL = timedelta(days=int(os.getenv("GEOCODE_CACHE_TTL_DAYS", "90")))
+NEGATIVE_TTL = timedelta(hours=int(os.getenv("GEOCODE_NEGATIVE_TTL_HOURS", "24")))
+LRU_SIZE = int(os.getenv("GEOCODE_LRU_SIZE", "4096"))
+
+# Google statuses that are a definitive answer about the address itself
+CACHEABLE_STATUSES = {"OK", "ZERO_RESULTS"}
+
+
+class GeocodeResult(namedtuple("GeocodeResult", "status lat lng formatted_address")):
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.status == "OK"
+
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+_stats = {"lru_hits": 0, "db_hits": 0, "misses": 0, "negative_hits": 0}
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def normalize_address(address):
+    """Cache key for an address: case, punctuation and spacing don't matter."""
+    key = re.sub(r"[.,#]", " ", address or "").upper()
+    return " ".join(key.split())
+
+
+def _count(stat):
+    with _lock:
+        _stats[stat] += 1
+
+
+def _lru_get(key):
+    with _lock:
+        entry = _lru.get(key)
+        if entry is None:
+            return None
+        result, expires_at = entry
+        if expires_at <= _utcnow():
+            del _lru[key]
+            return None
+        _lru.move_to_end(key)
+        return result
+
+
+def _lru_put(key, result, expires_at):
+    with _lock:
+        _lru[key] = (result, expires_at)
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _db_get(key):
+    # Own connection so a cache read never flushes or commits the caller's session
+    with db.engine.connect() as conn:
+        row = conn.execute(
+            select(GeocodeCache).where(
+                GeocodeCache.address_key == key,
+                GeocodeCache.expires_at > _utcnow(),
+            )
+        ).first()
+    if not row:
+        return None
+    result = GeocodeResult(row.status, row.lat, row.lng, row.formatted_address)
+    return result, row.expires_at
+
+
+def _db_put(key, result, expires_at):
+    values = {
+        "address_key": key,
+        "status": result.status,
+        "lat": result.lat,
+        "lng": result.lng,
+        "formatted_address": result.formatted_address,
+        "fetched_at": _utcnow(),
+        "expires_at": expires_at,
+    }
+    stmt = insert(GeocodeCache).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GeocodeCache.address_key],
+        set_={k: stmt.excluded[k] for k in values if k != "address_key"},
+    )
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(stmt)
+    except Exception as e:
+        print("Geocode cache write failed:", e)
+
+
+def _fetch(address, api_key):
+    try:
+        res = get_client("google_geocoding").get(
+            GEOCODE_URL, params={"address": address, "key": api_key}
+        )
+    except requests.RequestException as e:
+        print("Geocoding failed:", e)
+        return GeocodeResult("REQUEST_FAILED", None, None, None)
+
+    if res.status_code != 200:
+        return GeocodeResult(f"HTTP_{res.status_code}", None, None, None)
+
+    geo_data = res.json()
+    status = geo_data.get("status", "UNKNOWN_ERROR")
+    if status == "OK" and geo_data.get("results"):
+        result = geo_data["results"][0]
+        location = result["geometry"]["location"]
+        return GeocodeResult(
+            "OK", location["lat"], location["lng"], result["formatted_address"]
+        )
+    if status == "OK":
+        status = "ZERO_RESULTS"
+    return GeocodeResult(status, None, None, None)
+
+
+def geocode_address(address):
+    """
+    Geocode an address, returning a GeocodeResult.
+
+    Returns None when GOOGLE_GEOCODING_API_KEY is not configured. Check
+    `result.ok` before using the coordinates; `result.status` carries the
+    Google status (or HTTP_<code> / REQUEST_FAILED) otherwise.
+    """
+    key = normalize_address(address)
+    if not key:
+        return GeocodeResult("INVALID_REQUEST", None, None, None)
+
+    result = _lru_get(key)
+    if result is not None:
+        _count("lru_hits" if result.ok else "negative_hits")
+        return result
+
+    cached = _db_get(key)
+    if cached is not None:
+        result, expires_at = cached
+        _lru_put(key, result, expires_at)
+        _count("db_hits" if result.ok else "negative_hits")
+        return result
+
+    api_key = os.getenv("GOOGLE_GEOCODING_API_KEY")
+    if not api_key:
+        return None
+
+    _count("misses")
+    result = _fetch(address, api_key)
+    if result.status in CACHEABLE_STATUSES:
+        ttl = CACHE_TTL if result.ok else NEGATIVE_TTL
+        expires_at = _utcnow() + ttl
+        _lru_put(key, result, expires_at)
+        _db_put(key, result, expires_at)
+    return result
+
+
+def cache_stats():
+    """Hit/miss counters for this worker process."""
+    with _lock:
+        stats = dict(_stats)
+        stats["lru_entries"] = len(_lru)
+    lookups = (
+        stats["lru_hits"] + stats["db_hits"] + stats["negative_hits"] + stats["misses"]
+    )
+    stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 3) if lookups else None
+    return stats
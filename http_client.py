@@ -0,0 +1,318 @@
+"""
+Outbound HTTP to third-party providers (Google geocoding, BCPAO).
+
+Each provider gets one HTTPClient with:
+
+* a requests.Session whose connection pool is reused across requests and
+  threads, instead of a new TCP/TLS handshake per call;
+* connect and read timeouts on every request, so a hung upstream costs at
+  most a few seconds of a worker thread;
+* retries with jittered exponential backoff, for connection errors,
+  timeouts, 429s and 5xx responses only;
+* a circuit breaker that fails fast after BREAKER_THRESHOLD consecutive
+  failed calls and lets a single trial call through after
+  BREAKER_RESET_SECONDS;
+* a token-bucket rate limit kept in a lock-protected file under
+  RATE_LIMIT_DIR, so every worker process on the host shares one budget;
+* latency and error counters per provider (see provider_stats), with the
+  time also charged to the current request (see metrics.py).
+
+CircuitOpenError and RateLimitedError subclass requests.RequestException,
+so callers that already handle request failures handle these too.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: the bucket is per process there
+    fcntl = None
+
+RATE_LIMIT_DIR = os.getenv(
+    "RATE_LIMIT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "ratelimits"),
+)
+POOL_SIZE = 16
+BREAKER_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+PROVIDERS = {
+    "google_geocoding": {
+        "rate": float(os.getenv("GEOCODE_RATE_LIMIT", "40")),
+        "connect_timeout": 3.05,
+        "read_timeout": 10,
+        "retries": 2,
+    },
+    "bcpao": {
+        "rate": float(os.getenv("BCPAO_RATE_LIMIT", "5")),
+        "connect_timeout": 3.05,
+        "read_timeout": 10,
+        "retries": 2,
+    },
+}
+
+
+class CircuitOpenError(requests.RequestException):
+    pass
+
+
+class RateLimitedError(requests.RequestException):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            # Half-open: let exactly one trial call through
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def cancel(self):
+        """Give back a half-open trial that never reached the provider."""
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class TokenBucket:
+    """`rate` requests per second with bursts up to `burst`, shared through a file."""
+
+    def __init__(self, name, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.path = os.path.join(RATE_LIMIT_DIR, f"{name}.bucket")
+        self._lock = threading.Lock()
+        self._local = {"tokens": self.burst, "updated": time.time()}
+
+    def _take(self, state):
+        now = time.time()
+        tokens = min(self.burst, state["tokens"] + (now - state["updated"]) * self.rate)
+        state["updated"] = now
+        if tokens >= 1:
+            state["tokens"] = tokens - 1
+            return 0.0
+        state["tokens"] = tokens
+        return (1 - tokens) / self.rate
+
+    def _try_acquire(self):
+        """0 if a token was taken, else seconds until one is available."""
+        with self._lock:
+            if fcntl is None:
+                return self._take(self._local)
+
+            os.makedirs(RATE_LIMIT_DIR, exist_ok=True)
+            with open(self.path, "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read())
+                    except ValueError:
+                        state = {"tokens": self.burst, "updated": time.time()}
+                    wait = self._take(state)
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            return wait
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._try_acquire()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class ProviderMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.short_circuited = 0
+        self.rate_limited = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds, error):
+        with self._lock:
+            self.calls += 1
+            self.errors += bool(error)
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "short_circuited": self.short_circuited,
+                "rate_limited": self.rate_limited,
+                "avg_ms": round(self.total_seconds / self.calls * 1000, 1)
+                if self.calls
+                else None,
+                "max_ms": round(self.max_seconds * 1000, 1),
+                "total_seconds": round(self.total_seconds, 3),
+            }
+
+
+class HTTPClient:
+    def __init__(
+        self,
+        name,
+        rate=None,
+        burst=None,
+        connect_timeout=3.05,
+        read_timeout=10,
+        retries=2,
+        backoff=0.5,
+        max_wait=5,
+    ):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.breaker = CircuitBreaker()
+        self.bucket = TokenBucket(name, rate, burst) if rate else None
+        self.metrics = ProviderMetrics()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request with this provider's limits applied.
+
+        Returns the last response, even a 5xx once retries run out, and
+        raises a requests.RequestException if no response was received.
+        """
+        if not self.breaker.allow():
+            self.metrics.count("short_circuited")
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        if self.bucket and not self.bucket.acquire(self.max_wait):
+            self.breaker.cancel()
+            self.metrics.count("rate_limited")
+            raise RateLimitedError(f"{self.name} rate limit exceeded")
+        kwargs.setdefault("timeout", self.timeout)
+
+        response = error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.metrics.count("retries")
+                # Full jitter, so retrying workers don't hit the provider in step
+                time.sleep(random.uniform(0, self.backoff * 2**attempt))
+                if self.bucket and not self.bucket.acquire(self.max_wait):
+                    self.metrics.count("rate_limited")
+                    break
+
+            start = time.perf_counter()
+            try:
+                response, error = self.session.request(method, url, **kwargs), None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                response, error = None, e
+            except requests.RequestException:
+                # Not worth retrying, but it still counts against the breaker
+                elapsed = time.perf_counter() - start
+                self.metrics.record(elapsed, True)
+                metrics.record_http(elapsed)
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Never leave a half-open trial taken, or the circuit stays shut
+                self.breaker.cancel()
+                raise
+            failed = error is not None or response.status_code in RETRY_STATUSES
+            elapsed = time.perf_counter() - start
+            self.metrics.record(elapsed, failed)
+            metrics.record_http(elapsed)
+            if not failed:
+                self.breaker.record_success()
+                return response
+
+        self.breaker.record_failure()
+        if response is not None:
+            return response
+        raise error
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name):
+    """The process-wide HTTPClient for a provider listed in PROVIDERS."""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = HTTPClient(name, **PROVIDERS[name])
+    return client
+
+
+def provider_stats():
+    """Per-provider call counts, latency and circuit state for this worker."""
+    return {
+        name: {**client.metrics.snapshot(), "circuit": client.breaker.state}
+        for name, client in list(_clients.items())
+    }
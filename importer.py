@@ -0,0 +1,216 @@
+"""
+Bulk job import.
+
+Streams rows from an .xlsx or .csv file and inserts them as jobs in batched
+transactions:
+
+  1. existing job numbers are loaded once and duplicates are skipped
+  2. each batch is geocoded concurrently on a bounded thread pool
+  3. counties for the whole batch are resolved in one vectorized lookup
+  4. the batch is inserted with a single executemany and committed, and
+     the new jobs are reported to the change listeners (changes.py)
+
+After every committed batch a JSON checkpoint records how many source rows
+are done, and which rows failed, so an interrupted import resumes where it
+stopped and still reports the failures from earlier runs.
+"""
+
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from flask import current_app
+from openpyxl import load_workbook
+from sqlalchemy import insert, select
+
+from changes import record_created_jobs
+from geocoding import geocode_address
+from models import Job, db
+from utils import get_counties_for_coords
+from versioning import bump_data_version
+
+DEFAULT_COLUMNS = {"job_number": "Num", "client": "Client", "address": "Address"}
+
+
+def iter_rows(path):
+    """Yield each data row of a spreadsheet or CSV as a dict keyed by header."""
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+        return
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        wb.close()
+
+
+def _cell(value):
+    # Excel hands back job numbers like 2301 as 2301.0
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() if value is not None else ""
+
+
+def _batched(iterable, size):
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+class Checkpoint:
+    def __init__(self, path, source):
+        self.path = Path(path)
+        self.source = str(source)
+        self.state = {"source": self.source, "rows_done": 0, "created": 0,
+                      "skipped": 0, "failed": 0, "ungeocoded": 0, "failures": []}
+
+    def load(self):
+        if self.path.exists():
+            state = json.loads(self.path.read_text())
+            if state.get("source") == self.source:
+                self.state.update(state)
+        return self.state
+
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state, indent=2))
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+
+def _geocode_all(app, addresses, workers):
+    def work(address):
+        with app.app_context():
+            try:
+                return geocode_address(address)
+            except Exception as e:
+                print(f"Geocoding error for {address!r}: {e}")
+                return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(work, addresses))
+
+
+def import_jobs(
+    path,
+    status="Estimate/Quote Available",
+    created_by_id=None,
+    batch_size=500,
+    workers=8,
+    checkpoint_path=None,
+    restart=False,
+    columns=DEFAULT_COLUMNS,
+):
+    """
+    Import jobs from `path`. Must run inside an app context.
+
+    Returns the final checkpoint state, whose `failures` list holds
+    (row number, job number, reason) for every run of this import. Rows
+    that could not be geocoded are still created, without coordinates, and
+    listed there too.
+    """
+    app = current_app._get_current_object()
+    path = Path(path)
+    checkpoint = Checkpoint(
+        checkpoint_path or path.with_name(path.name + ".checkpoint.json"), path
+    )
+    if restart:
+        checkpoint.clear()
+    state = checkpoint.load()
+    if state["rows_done"]:
+        print(f"↪️  Resuming after row {state['rows_done']}")
+
+    seen = set(db.session.scalars(select(Job.job_number)))
+    failures = state["failures"]
+    started = time.monotonic()
+    rows_at_start = state["rows_done"]
+
+    rows = itertools.islice(iter_rows(path), state["rows_done"], None)
+    for batch in _batched(enumerate(rows, start=state["rows_done"] + 1), batch_size):
+        pending = []
+        batch_failures = []
+        for row_num, row in batch:
+            if not any(v not in (None, "") for v in row.values()):
+                continue  # blank trailing rows
+            job_number = _cell(row.get(columns["job_number"]))
+            client = _cell(row.get(columns["client"]))
+            address = _cell(row.get(columns["address"]))
+            if not job_number or not client or not address:
+                batch_failures.append((row_num, job_number, "missing job number, client or address"))
+                continue
+            if job_number in seen:
+                state["skipped"] += 1
+                continue
+            seen.add(job_number)
+            pending.append((row_num, job_number, client, address))
+
+        geos = _geocode_all(app, [p[3] for p in pending], workers)
+        located = [i for i, geo in enumerate(geos) if geo and geo.ok]
+        counties = get_counties_for_coords([(geos[i].lat, geos[i].lng) for i in located])
+        county_by_row = dict(zip(located, counties))
+
+        now = datetime.now(timezone.utc)
+        values = []
+        for i, (row_num, job_number, client, address) in enumerate(pending):
+            geo = geos[i]
+            if not (geo and geo.ok):
+                reason = geo.status if geo else "not geocoded"
+                failures.append((row_num, job_number, f"created without coordinates ({reason})"))
+                state["ungeocoded"] += 1
+            values.append(
+                {
+                    "job_number": job_number,
+                    "client": client,
+                    "address": geo.formatted_address if geo and geo.ok else address,
+                    "status": status,
+                    "lat": str(geo.lat) if geo and geo.ok else None,
+                    "long": str(geo.lng) if geo and geo.ok else None,
+                    "latitude": geo.lat if geo and geo.ok else None,
+                    "longitude": geo.lng if geo and geo.ok else None,
+                    "county": county_by_row.get(i),
+                    "created_at": now,
+                    "created_by_id": created_by_id,
+                    "visited": 0,
+                    "total_time_spent": 0.0,
+                    "tags": [],
+                }
+            )
+
+        if values:
+            # Bulk inserts skip the ORM flush hooks, so bump the version and
+            # report the new jobs (tiles, clusters, autocomplete, /events) by hand
+            ids = db.session.scalars(
+                insert(Job).returning(Job.id, sort_by_parameter_order=True), values
+            ).all()
+            record_created_jobs(db.session, ids, values)
+            bump_data_version(db.session)
+        db.session.commit()
+
+        state["rows_done"] += len(batch)
+        state["created"] += len(values)
+        state["failed"] += len(batch_failures)
+        failures.extend(batch_failures)
+        checkpoint.save()
+
+        rate = (state["rows_done"] - rows_at_start) / max(time.monotonic() - started, 1e-6)
+        print(
+            f"[{state['rows_done']:6d}] created {state['created']}, "
+            f"skipped {state['skipped']}, failed {state['failed']}, "
+            f"ungeocoded {state['ungeocoded']} "
+            f"({rate:.0f} rows/s)"
+        )
+
+    return state
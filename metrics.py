@@ -0,0 +1,328 @@
+"""
+Request, SQL and outbound HTTP metrics for this worker process.
+
+init_app() times every request and files it under its URL rule (not the
+raw path, so job numbers don't each get a series). It keeps a latency
+histogram per endpoint, plus how many SQL statements the request ran and
+how long they and any outbound provider calls took. SQL is measured with
+SQLAlchemy cursor events on every engine. Statements outside a request
+(enrichment, backfills) only count toward the process totals. A request
+slower than SLOW_REQUEST_SECONDS is logged with its statement list.
+
+The cost per request is a few perf_counter() calls and counter updates
+under one lock, so this stays on in production. Counters are per worker
+and reset on restart, like the cache stats next to them; Prometheus
+handles that with rate().
+"""
+
+import hmac
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+SLOW_LOG_STATEMENTS = 25
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Upper bounds in seconds; the last bucket is +Inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PREFIX = "epicmap"
+
+
+class EndpointStats:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.http_seconds = 0.0
+        self.statuses = {}
+
+    def observe(self, seconds, status, queries, sql_seconds, http_seconds):
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.queries += queries
+        self.sql_seconds += sql_seconds
+        self.http_seconds += http_seconds
+        status_class = f"{status // 100}xx"
+        self.statuses[status_class] = self.statuses.get(status_class, 0) + 1
+
+    def quantile(self, q):
+        """Estimate a latency quantile by interpolating inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if seen + n >= rank and n:
+                lower = BUCKETS[i - 1] if i else 0.0
+                # Never report more than the slowest request actually seen
+                upper = min(BUCKETS[i] if i < len(BUCKETS) else self.max_seconds, self.max_seconds)
+                lower = min(lower, upper)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max_seconds
+
+    def snapshot(self):
+        def ms(seconds):
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        return {
+            "count": self.count,
+            "queries": self.queries,
+            "avg_ms": ms(self.seconds / self.count) if self.count else None,
+            "p50_ms": ms(self.quantile(0.5)),
+            "p95_ms": ms(self.quantile(0.95)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max_seconds),
+            "queries_per_request": round(self.queries / self.count, 2) if self.count else None,
+            "sql_ms_per_request": ms(self.sql_seconds / self.count) if self.count else None,
+            "http_ms_per_request": ms(self.http_seconds / self.count) if self.count else None,
+            "statuses": dict(self.statuses),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.endpoints = {}  # (method, rule) -> EndpointStats
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.slow_requests = 0
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def record_request(self, key, seconds, status, queries, sql_seconds, http_seconds):
+        with self._lock:
+            stats = self.endpoints.get(key)
+            if stats is None:
+                stats = self.endpoints[key] = EndpointStats()
+            stats.observe(seconds, status, queries, sql_seconds, http_seconds)
+            if seconds >= SLOW_REQUEST_SECONDS:
+                self.slow_requests += 1
+
+    def record_query(self, seconds):
+        with self._lock:
+            self.sql_queries += 1
+            self.sql_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = [
+                {"method": method, "endpoint": rule, **stats.snapshot()}
+                for (method, rule), stats in self.endpoints.items()
+            ]
+            totals = {
+                "uptime_seconds": round(time.time() - self.started_at),
+                "requests": sum(e["count"] for e in endpoints),
+                "slow_requests": self.slow_requests,
+                "slow_request_seconds": SLOW_REQUEST_SECONDS,
+                "sql_queries": self.sql_queries,
+                "sql_seconds": round(self.sql_seconds, 3),
+            }
+        endpoints.sort(key=lambda e: e["p95_ms"] or 0, reverse=True)
+        return {**totals, "endpoints": endpoints}
+
+    def prometheus(self, providers=None, caches=None):
+        """Everything in the Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{PREFIX}_{name}{suffix}{label_text} {value}")
+
+        with self._lock:
+            items = [
+                ({"method": method, "endpoint": rule}, stats)
+                for (method, rule), stats in sorted(self.endpoints.items())
+            ]
+            histogram = []
+            for labels, stats in items:
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ("+Inf",), stats.buckets):
+                    cumulative += n
+                    histogram.append(("_bucket", {**labels, "le": str(bound)}, cumulative))
+                histogram.append(("_sum", labels, stats.seconds))
+                histogram.append(("_count", labels, stats.count))
+            metric(
+                "request_duration_seconds", "histogram",
+                "Request latency by endpoint.", histogram,
+            )
+            metric(
+                "requests_total", "counter", "Requests by endpoint and status class.",
+                [
+                    ("", {**labels, "status": status}, n)
+                    for labels, stats in items
+                    for status, n in sorted(stats.statuses.items())
+                ],
+            )
+            metric(
+                "request_sql_queries_total", "counter", "SQL statements run by requests.",
+                [("", labels, stats.queries) for labels, stats in items],
+            )
+            metric(
+                "request_sql_seconds_total", "counter", "SQL time spent by requests.",
+                [("", labels, stats.sql_seconds) for labels, stats in items],
+            )
+            metric(
+                "request_http_seconds_total", "counter",
+                "Outbound provider time spent by requests.",
+                [("", labels, stats.http_seconds) for labels, stats in items],
+            )
+            metric(
+                "sql_queries_total", "counter",
+                "SQL statements run by this process, background work included.",
+                [("", {}, self.sql_queries)],
+            )
+            metric(
+                "sql_seconds_total", "counter", "SQL time spent by this process.",
+                [("", {}, self.sql_seconds)],
+            )
+            metric(
+                "slow_requests_total", "counter",
+                f"Requests slower than {SLOW_REQUEST_SECONDS}s.",
+                [("", {}, self.slow_requests)],
+            )
+
+        providers = providers or {}
+        for name, field, help_text in (
+            ("http_client_calls_total", "calls", "Outbound calls by provider."),
+            ("http_client_errors_total", "errors", "Failed outbound calls by provider."),
+            ("http_client_seconds_total", "total_seconds", "Outbound call time by provider."),
+            ("http_client_short_circuited_total", "short_circuited", "Calls refused by an open circuit."),
+            ("http_client_rate_limited_total", "rate_limited", "Calls refused by the rate limit."),
+        ):
+            metric(
+                name, "counter", help_text,
+                [("", {"provider": p}, stats[field]) for p, stats in sorted(providers.items())],
+            )
+
+        caches = caches or {}
+        for name, field, kind, help_text in (
+            ("cache_hits_total", "hits", "counter", "Cache hits by cache."),
+            ("cache_misses_total", "misses", "counter", "Cache misses by cache."),
+            ("cache_hit_ratio", "hit_ratio", "gauge", "Cache hit ratio by cache."),
+        ):
+            metric(
+                name, kind, help_text,
+                [
+                    ("", {"cache": c}, stats[field])
+                    for c, stats in sorted(caches.items())
+                    if stats.get(field) is not None
+                ],
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+
+
+def _request_state():
+    return g.get("request_metrics") if has_request_context() else None
+
+
+def record_http(seconds):
+    """Charge outbound provider time to the current request, if any."""
+    state = _request_state()
+    if state is not None:
+        state["http_seconds"] += seconds
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start"].pop()
+    metrics.record_query(seconds)
+    state = _request_state()
+    if state is not None:
+        state["queries"] += 1
+        state["sql_seconds"] += seconds
+        if len(state["statements"]) < SLOW_LOG_STATEMENTS:
+            state["statements"].append((seconds, statement))
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    starts = context.connection.info.get("query_start") if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def token_ok():
+    """True if the request carries METRICS_TOKEN as a bearer token (for scrapers)."""
+    header = request.headers.get("Authorization", "")
+    return bool(METRICS_TOKEN) and hmac.compare_digest(header, f"Bearer {METRICS_TOKEN}")
+
+
+def _log_slow(seconds, status, state):
+    print(
+        f"Slow request: {request.method} {request.full_path.rstrip('?')} {status}"
+        f" {seconds:.3f}s, {state['queries']} queries ({state['sql_seconds']:.3f}s SQL),"
+        f" {state['http_seconds']:.3f}s HTTP"
+    )
+    for query_seconds, statement in state["statements"]:
+        print(f"  {query_seconds * 1000:8.1f}ms  {' '.join(statement.split())[:300]}")
+    if state["queries"] > len(state["statements"]):
+        print(f"  ... {state['queries'] - len(state['statements'])} more")
+
+
+def _finish(status):
+    state = g.pop("request_metrics", None)
+    if state is None:
+        return
+    seconds = time.perf_counter() - state["start"]
+    rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    metrics.record_request(
+        (request.method, rule),
+        seconds,
+        status,
+        state["queries"],
+        state["sql_seconds"],
+        state["http_seconds"],
+    )
+    if seconds >= SLOW_REQUEST_SECONDS:
+        _log_slow(seconds, status, state)
+
+
+def init_app(app):
+    @app.before_request
+    def _start_request_metrics():
+        g.request_metrics = {
+            "start": time.perf_counter(),
+            "queries": 0,
+            "sql_seconds": 0.0,
+            "http_seconds": 0.0,
+            "statements": [],
+        }
+
+    @app.after_request
+    def _record_request_metrics(resp):
+        _finish(resp.status_code)
+        return resp
+
+    @app.teardown_request
+    def _record_failed_request(exc):
+        # after_request doesn't run when a view raises
+        _finish(500)
@@ -0,0 +1,28 @@
+"""Stamp job updated_at with clock_timestamp
+
+Revision ID: a9d4e2f7c310
+Revises: f19c6e3a7b50
+Create Date: 2026-10-17 10:12:44.301958
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d4e2f7c310'
+down_revision = 'f19c6e3a7b50'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.alter_column('updated_at',
+                              server_default=sa.text("timezone('UTC', clock_timestamp())"))
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.alter_column('updated_at',
+                              server_default=sa.text("timezone('UTC', now())"))
@@ -0,0 +1,26 @@
+"""Add (job_number, id) index for keyset pagination
+
+Revision ID: b52e7a09c1d4
+Revises: f83a91c4d2e6
+Create Date: 2026-10-16 21:32:44.508213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b52e7a09c1d4'
+down_revision = 'f83a91c4d2e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_jobs_job_number_id', ['job_number', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_jobs_job_number_id')
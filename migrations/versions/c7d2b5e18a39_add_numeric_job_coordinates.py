@@ -0,0 +1,42 @@
+"""Add numeric job coordinates
+
+Revision ID: c7d2b5e18a39
+Revises: a3c1e7d92f04
+Create Date: 2026-10-16 11:03:27.554190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2b5e18a39'
+down_revision = 'a3c1e7d92f04'
+branch_labels = None
+depends_on = None
+
+NUMBER = r"'^\s*-?[0-9]+(\.[0-9]+)?\s*$'"
+
+
+def upgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+
+    # Backfill from the string columns, skipping anything that isn't a number
+    op.execute(f"""
+        UPDATE jobs
+        SET latitude = CAST(lat AS double precision),
+            longitude = CAST(long AS double precision)
+        WHERE lat ~ {NUMBER} AND long ~ {NUMBER}
+    """)
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_jobs_latitude_longitude', ['latitude', 'longitude'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_jobs_latitude_longitude')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
@@ -0,0 +1,34 @@
+"""Add trigram indexes for job search
+
+Revision ID: d6f0c3a8e215
+Revises: b52e7a09c1d4
+Create Date: 2026-10-16 22:05:17.931406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f0c3a8e215'
+down_revision = 'b52e7a09c1d4'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ('job_number', 'client', 'address')
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        for column in SEARCH_COLUMNS:
+            batch_op.create_index(f'ix_jobs_{column}_trgm', [column], unique=False,
+                                  postgresql_using='gin',
+                                  postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        for column in SEARCH_COLUMNS:
+            batch_op.drop_index(f'ix_jobs_{column}_trgm', postgresql_using='gin')
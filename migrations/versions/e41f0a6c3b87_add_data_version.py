@@ -0,0 +1,30 @@
+"""Add data version
+
+Revision ID: e41f0a6c3b87
+Revises: c7d2b5e18a39
+Create Date: 2026-10-16 13:40:12.902375
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41f0a6c3b87'
+down_revision = 'c7d2b5e18a39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO data_version (id, version, updated_at) VALUES (1, 1, timezone('UTC', now()))")
+
+
+def downgrade():
+    op.drop_table('data_version')
@@ -0,0 +1,49 @@
+"""Add job enrichment status and enrichment task queue
+
+Revision ID: e7a4b9d2c816
+Revises: d6f0c3a8e215
+Create Date: 2026-10-16 22:48:39.215804
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a4b9d2c816'
+down_revision = 'd6f0c3a8e215'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('enrichment_status', sa.String(length=20), nullable=False,
+                                      server_default='done'))
+
+    op.create_table('enrichment_tasks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('enrichment_tasks', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_enrichment_tasks_job_id'), ['job_id'], unique=False)
+        batch_op.create_index('ix_enrichment_tasks_status_run_at', ['status', 'run_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('enrichment_tasks', schema=None) as batch_op:
+        batch_op.drop_index('ix_enrichment_tasks_status_run_at')
+        batch_op.drop_index(batch_op.f('ix_enrichment_tasks_job_id'))
+
+    op.drop_table('enrichment_tasks')
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_column('enrichment_status')
@@ -0,0 +1,47 @@
+"""Add job revision and updated_at
+
+Revision ID: f83a91c4d2e6
+Revises: e41f0a6c3b87
+Create Date: 2026-10-16 15:21:08.117642
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f83a91c4d2e6'
+down_revision = 'e41f0a6c3b87'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE SEQUENCE job_revision_seq")
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Backfill in id order so existing jobs get stable, increasing revisions
+    op.execute("""
+        UPDATE jobs SET revision = ordered.rev, updated_at = COALESCE(jobs.created_at, timezone('UTC', now()))
+        FROM (SELECT id, nextval('job_revision_seq') AS rev FROM (SELECT id FROM jobs ORDER BY id) AS ids) AS ordered
+        WHERE jobs.id = ordered.id
+    """)
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.alter_column('revision', nullable=False,
+                              server_default=sa.text("nextval('job_revision_seq')"))
+        batch_op.alter_column('updated_at', nullable=False,
+                              server_default=sa.text("timezone('UTC', now())"))
+        batch_op.create_index(batch_op.f('ix_jobs_revision'), ['revision'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_jobs_revision'))
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('revision')
+
+    op.execute("DROP SEQUENCE job_revision_seq")
@@ -1,9 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import validates
 from datetime import datetime, timezone
 
 db = SQLAlchemy()
 
+
+def parse_coordinate(value):
+    """Float value of a lat/long as stored in the string columns, or None."""
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
 related_jobs_table = db.Table(
     "related_jobs",
     db.Column("job_id", db.Integer, db.ForeignKey("jobs.id"), primary_key=True),
@@ -24,6 +33,14 @@ class Job(db.Model):
     lat = db.Column(db.String(100))
     long = db.Column(db.String(100))
 
+    # Numeric copies of lat/long, kept in sync by _sync_coordinates, so the
+    # database can index and range-filter them (see Job.in_bbox)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+
+    # pending -> done | failed; see enrichment.py
+    enrichment_status = db.Column(db.String(20), nullable=False, default="done")
+
     prop_appr_link = db.Column(db.String(300))
     plat_link = db.Column(db.String(300))
     fema_link = db.Column(db.String(300))
@@ -42,6 +59,23 @@ class Job(db.Model):
     )
 
     deleted_at = db.Column(db.DateTime, nullable=True)
+
+    # Bumped from job_revision_seq on every insert/update; /jobs/changes cursor
+    revision = db.Column(
+        db.BigInteger,
+        nullable=False,
+        index=True,
+        default=db.func.nextval("job_revision_seq"),
+        onupdate=db.func.nextval("job_revision_seq"),
+    )
+    # clock_timestamp(), not now(): the settle window in /jobs/changes needs
+    # the time the revision was drawn, not when its transaction began
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=db.func.timezone("UTC", db.func.clock_timestamp()),
+        onupdate=db.func.timezone("UTC", db.func.clock_timestamp()),
+    )
     deleted_by_id = db.Column(db.Integer, db.ForeignKey("user.id"))
     deleted_by = db.relationship(
         "User", foreign_keys=[deleted_by_id], backref="jobs_deleted"
@@ -59,6 +93,31 @@ class Job(db.Model):
 
     field_work = db.relationship("FieldWork", back_populates="job", lazy=True)
 
+    __table_args__ = (
+        db.Index("ix_jobs_latitude_longitude", "latitude", "longitude"),
+        # Keyset pagination order, see pagination.py
+        db.Index("ix_jobs_job_number_id", "job_number", "id"),
+        # Trigram indexes for search.py and the ilike filters
+        *(
+            db.Index(
+                f"ix_jobs_{column}_trgm",
+                column,
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+            )
+            for column in ("job_number", "client", "address")
+        ),
+    )
+
+    @validates("lat", "long")
+    def _sync_coordinates(self, key, value):
+        numeric = parse_coordinate(value)
+        if key == "lat":
+            self.latitude = numeric
+        else:
+            self.longitude = numeric
+        return value
+
     def to_dict(self):
         return {
             "job_number": self.job_number,
@@ -79,10 +138,15 @@ class Job(db.Model):
             "visited": self.visited,
             "total_time_spent": self.total_time_spent,
             "tags": self.tags,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "enrichment_status": self.enrichment_status,
+            "created_at": self.created_at,
             "created_by": self.created_by.name if self.created_by else None,
         }
 
+    def soft_delete(self, user_id=None):
+        self.deleted_at = datetime.now(timezone.utc)
+        self.deleted_by_id = user_id
+
     @classmethod
     def active(cls):
         return cls.query.filter(cls.deleted_at == None)
@@ -95,6 +159,61 @@ class Job(db.Model):
     def by_user(cls, user_id):
         return cls.active().filter(cls.created_by_id == user_id)
 
+    @classmethod
+    def in_bbox(cls, query, west, south, east, north):
+        return query.filter(
+            cls.latitude.between(south, north), cls.longitude.between(west, east)
+        )
+
+    @classmethod
+    def add_fieldwork_totals(cls, job_id, visits, hours):
+        """
+        Apply a fieldwork delta to visited/total_time_spent in one UPDATE.
+
+        The increment happens in the database against the locked row, so
+        concurrent fieldwork writes on the same job can't lose each other's
+        changes the way read-modify-write in Python can.
+        """
+        db.session.execute(
+            db.update(cls)
+            .where(cls.id == job_id)
+            .values(
+                visited=db.func.coalesce(cls.visited, 0) + visits,
+                total_time_spent=db.func.coalesce(cls.total_time_spent, 0.0) + hours,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def reconcile_fieldwork_totals(cls):
+        """Recompute drifted totals for every job from field_work; returns rows fixed."""
+        jobs = cls.__table__.alias("j")
+        totals = (
+            db.select(
+                jobs.c.id,
+                db.func.count(FieldWork.id).label("visits"),
+                db.func.coalesce(db.func.sum(FieldWork.total_time), 0.0).label("hours"),
+            )
+            .select_from(jobs.outerjoin(FieldWork, FieldWork.job_id == jobs.c.id))
+            .group_by(jobs.c.id)
+            .subquery()
+        )
+        result = db.session.execute(
+            db.update(cls)
+            .where(cls.id == totals.c.id)
+            .where(
+                db.or_(
+                    cls.visited.is_distinct_from(totals.c.visits),
+                    db.func.abs(db.func.coalesce(cls.total_time_spent, 0.0) - totals.c.hours)
+                    > 0.005,
+                    cls.total_time_spent == None,
+                )
+            )
+            .values(visited=totals.c.visits, total_time_spent=totals.c.hours)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
 
 class FieldWork(db.Model):
     __tablename__ = "field_work"
@@ -119,6 +238,21 @@ class FieldWork(db.Model):
         super().__init__(**kwargs)
         self.compute_total_time()
 
+    @classmethod
+    def locked(cls, entry_id):
+        """
+        The entry, row-locked (SELECT ... FOR UPDATE) until commit, or 404.
+
+        Edits and deletes derive the job totals delta from the entry's
+        current hours, so concurrent writes to one entry must take turns.
+        """
+        return (
+            cls.query.filter_by(id=entry_id)
+            .with_for_update()
+            .populate_existing()
+            .first_or_404()
+        )
+
     def compute_total_time(self):
         if self.start_time and self.end_time:
             start = datetime.combine(self.work_date, self.start_time)
@@ -130,7 +264,8 @@ class FieldWork(db.Model):
         return {
             "id": self.id,
             "job_id": self.job.job_number if self.job else None,
-            "work_date": self.work_date.isoformat() if self.work_date else None,
+            "work_date": self.work_date,
+            # Minutes only, which orjson's ISO times would add seconds to
             "start_time": self.start_time.strftime("%H:%M")
             if self.start_time
             else None,
@@ -167,7 +302,63 @@ class User(db.Model):
             "name": self.name,
             "username": self.username,
             "role": self.role,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "last_login": self.last_login.isoformat() if self.last_login else None,
+            "created_at": self.created_at,
+            "last_login": self.last_login,
             "last_ip": self.last_ip,
         }
+
+
+class GeocodeCache(db.Model):
+    __tablename__ = "geocode_cache"
+    # Normalized address (see geocoding.normalize_address)
+    address_key = db.Column(db.Text, primary_key=True)
+
+    status = db.Column(db.String(40), nullable=False)  # 'OK' or 'ZERO_RESULTS'
+    formatted_address = db.Column(db.String(300))
+    lat = db.Column(db.Float)
+    lng = db.Column(db.Float)
+
+    fetched_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class PropertyAccountCache(db.Model):
+    """BCPAO account per address; account is NULL when BCPAO has no record."""
+
+    __tablename__ = "property_account_cache"
+    # Normalized address (see geocoding.normalize_address)
+    address_key = db.Column(db.Text, primary_key=True)
+    account = db.Column(db.String(40))
+
+    fetched_at = db.Column(db.DateTime, nullable=False)
+    # Only set for misses; found accounts don't expire
+    expires_at = db.Column(db.DateTime, index=True)
+
+
+class DataVersion(db.Model):
+    """Single row bumped by every transaction that writes jobs, fieldwork or users."""
+
+    __tablename__ = "data_version"
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+class EnrichmentTask(db.Model):
+    """Durable queue entry to geocode a job and fill in its county and property link."""
+
+    __tablename__ = "enrichment_tasks"
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey("jobs.id"), nullable=False, index=True)
+    job = db.relationship("Job", backref="enrichment_tasks")
+
+    # pending -> running -> done | failed
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # When a pending task may next run, or when a running task's lease expires
+    run_at = db.Column(db.DateTime, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index("ix_enrichment_tasks_status_run_at", "status", "run_at"),)
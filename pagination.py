@@ -0,0 +1,103 @@
+"""
+Keyset (cursor) pagination for job listings.
+
+Pages are ordered on (job_number, id) descending and fetched with a row
+comparison against the last row seen, which the (job_number, id) index
+answers directly. Any page costs the same whether it is the first or the
+thousandth, unlike OFFSET, which has to walk every skipped row.
+
+Cursors are opaque URL-safe tokens. A "next" token continues after the
+last row of a page; a "prev" token continues before its first row.
+
+Totals are not counted per request. Listings report the planner's row
+estimate on Postgres, which is flagged as approximate; the query is
+EXPLAINed with bound parameters, so filter values never become SQL text.
+"""
+
+import base64
+import json
+
+from sqlalchemy import tuple_
+
+from models import Job, db
+
+MAX_PER_PAGE = 100
+
+
+def encode_cursor(job, direction):
+    payload = json.dumps([direction, job.job_number, job.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """(direction, job_number, id) from a token; raises ValueError if malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        direction, job_number, job_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if direction not in ("next", "prev") or not isinstance(job_id, int):
+        raise ValueError("Invalid cursor")
+    return direction, job_number, job_id
+
+
+class KeysetPage:
+    def __init__(self, items, per_page, has_next, has_prev):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = encode_cursor(items[-1], "next") if has_next else None
+        self.prev_cursor = encode_cursor(items[0], "prev") if has_prev else None
+
+
+def keyset_paginate(query, cursor=None, per_page=20):
+    """One page of `query` (Job rows) after/before `cursor`; raises ValueError on a bad cursor."""
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    key = tuple_(Job.job_number, Job.id)
+
+    if cursor is None:
+        rows = query.order_by(Job.job_number.desc(), Job.id.desc()).limit(per_page + 1).all()
+        more = len(rows) > per_page
+        return KeysetPage(rows[:per_page], per_page, has_next=more, has_prev=False)
+
+    direction, job_number, job_id = decode_cursor(cursor)
+    if direction == "next":
+        rows = (
+            query.filter(key < (job_number, job_id))
+            .order_by(Job.job_number.desc(), Job.id.desc())
+            .limit(per_page + 1)
+            .all()
+        )
+        more = len(rows) > per_page
+        return KeysetPage(rows[:per_page], per_page, has_next=more, has_prev=True)
+
+    rows = (
+        query.filter(key > (job_number, job_id))
+        .order_by(Job.job_number.asc(), Job.id.asc())
+        .limit(per_page + 1)
+        .all()
+    )
+    more = len(rows) > per_page
+    items = rows[:per_page][::-1]
+    return KeysetPage(items, per_page, has_next=bool(items), has_prev=more)
+
+
+def estimate_count(query):
+    """Planner row estimate for `query` on Postgres, or None elsewhere."""
+    if db.engine.dialect.name != "postgresql":
+        return None
+    compiled = query.statement.compile(
+        dialect=db.engine.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    plan = (
+        db.session.connection()
+        .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+        .scalar()
+    )
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def job_total(query):
+    """(total, exact) for a job listing without running COUNT(*)."""
+    return estimate_count(query), False
@@ -1,53 +1,70 @@
 #!/usr/bin/env python3
-import pandas as pd
+"""
+Bulk-import jobs from a spreadsheet (.xlsx) or CSV.
+
+    python populate.py invoices_valid_addresses.xlsx
+    python populate.py jobs.csv --batch-size 1000 --workers 16 --user pablo
+
+Rows are deduplicated against existing job numbers, geocoded concurrently and
+inserted in batches. Progress is checkpointed next to the source file, so
+re-running the same command after a crash resumes where it stopped (use
+--restart to start over). Rows that failed, in this run or an earlier one of
+the same import, are written to <source>.failures.csv.
+"""
+import argparse
+import csv
 from pathlib import Path
 
-# 1) import your real app
 from app import app
+from importer import import_jobs
+from models import User
 
-# 2) path to your spreadsheet
-EXCEL_PATH = Path(__file__).parent / "invoices_valid_addresses.xlsx"
-
-# 3) admin credentials
-ADMIN_USER = "pablo"
-ADMIN_PASS = "123"
+DEFAULT_PATH = Path(__file__).parent / "invoices_valid_addresses.xlsx"
 
 
 def main():
-    # load the sheet into a list of dicts
-    df = pd.read_excel(EXCEL_PATH, engine="openpyxl")
-    rows = df.to_dict(orient="records")
-
-    # 4) use Flask's test_client
-    with app.test_client() as client:
-        # 4a) log in
-        login_resp = client.post(
-            "/login",
-            data={"username": ADMIN_USER, "password": ADMIN_PASS},
-            follow_redirects=True,
+    parser = argparse.ArgumentParser(description="Bulk-import jobs.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH, type=Path)
+    parser.add_argument("--status", default="Estimate/Quote Available")
+    parser.add_argument("--user", help="username recorded as the jobs' creator")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=8, help="geocoding threads")
+    parser.add_argument("--checkpoint", type=Path)
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint")
+    args = parser.parse_args()
+
+    with app.app_context():
+        created_by_id = None
+        if args.user:
+            user = User.query.filter_by(username=args.user).first()
+            if not user:
+                parser.error(f"No such user: {args.user}")
+            created_by_id = user.id
+
+        print(f"📂 Importing jobs from {args.path}…")
+        result = import_jobs(
+            args.path,
+            status=args.status,
+            created_by_id=created_by_id,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            checkpoint_path=args.checkpoint,
+            restart=args.restart,
         )
-        assert login_resp.status_code == 200, f"Login failed: {login_resp.status_code}"
-
-        print(f"✅ Logged in as {ADMIN_USER}. Now creating jobs…")
-
-        # 4b) hit your JSON API
-        for i, row in enumerate(rows, start=1):
-            payload = {
-                "job_number": str(row["Num"]),
-                "client": row["Client"],
-                "address": row["Address"],
-                "status": "Estimate/Quote Available",
-            }
-            resp = client.post("/admin/api/jobs", json=payload)
-            if resp.status_code in (200, 201):
-                print(f"[{i:3d}] ✔️ Created {row['Num']}")
-            else:
-                print(
-                    f"[{i:3d}] ❌ Failed {row['Num']}: "
-                    f"{resp.status_code} {resp.get_data(as_text=True)[:100]}"
-                )
-
-    print(f"\nDone. Attempted {len(rows)} jobs via admin API.")
+
+    failures = result["failures"]
+    if failures:
+        failures_path = args.path.with_name(args.path.name + ".failures.csv")
+        with open(failures_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["row", "job_number", "reason"])
+            writer.writerows(failures)
+        print(f"⚠️  {len(failures)} rows need attention, see {failures_path.name}")
+
+    print(
+        f"\nDone. {result['rows_done']} rows read: {result['created']} created, "
+        f"{result['skipped']} already existed, {result['failed']} failed."
+    )
 
 
 if __name__ == "__main__":
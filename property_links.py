@@ -0,0 +1,263 @@
+"""
+Brevard County property appraiser (BCPAO) links.
+
+BCPAO accounts are cached per normalized address in property_account_cache.
+A found account never expires. An address BCPAO has no record for is
+re-checked after BCPAO_NEGATIVE_TTL_DAYS. Failed requests are not cached.
+Once any job at an address has been looked up, new jobs there don't call
+BCPAO again.
+
+backfill() fills prop_appr_link on Brevard jobs that are missing it. It
+first seeds the cache from links jobs already have, then resolves each
+distinct remaining address once, on a bounded thread pool. Each worker
+process also runs it every PROPERTY_BACKFILL_INTERVAL seconds; a Postgres
+advisory lock keeps that to one run at a time across workers.
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import requests
+from flask import current_app
+from sqlalchemy import func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from geocoding import normalize_address
+from http_client import get_client
+from models import Job, PropertyAccountCache, db
+from versioning import bump_data_version
+
+BCPAO_URL = os.getenv("BCPAO_URL", "https://www.bcpao.us/api/records")
+LINK_TEMPLATE = "https://www.bcpao.us/propertysearch/#/account/{}"
+NEGATIVE_TTL = timedelta(days=int(os.getenv("BCPAO_NEGATIVE_TTL_DAYS", "30")))
+
+BACKFILL_WORKERS = int(os.getenv("PROPERTY_BACKFILL_WORKERS", "4"))
+BACKFILL_BATCH = 200
+# Seconds between scheduled backfills; 0 turns the schedule off
+BACKFILL_INTERVAL = int(os.getenv("PROPERTY_BACKFILL_INTERVAL", str(6 * 3600)))
+BACKFILL_LOCK_KEY = 7_245_311
+
+_MISS = object()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def link_for(account):
+    return LINK_TEMPLATE.format(account) if account else None
+
+
+def fetch_account(address):
+    """BCPAO account for `address`, None if it has no record; raises RequestException on failure."""
+    res = get_client("bcpao").get(BCPAO_URL, params={"address": address})
+    res.raise_for_status()
+    data = res.json()
+    return str(data[0]["account"]) if data else None
+
+
+def _cached_account(key):
+    # Own connection so a cache read never flushes or commits the caller's session
+    with db.engine.connect() as conn:
+        row = conn.execute(
+            select(PropertyAccountCache.account).where(
+                PropertyAccountCache.address_key == key,
+                or_(
+                    PropertyAccountCache.expires_at == None,
+                    PropertyAccountCache.expires_at > _utcnow(),
+                ),
+            )
+        ).first()
+    return _MISS if row is None else row.account
+
+
+def _store(rows, overwrite=True):
+    """Upsert (address_key, account) pairs into the cache."""
+    now = _utcnow()
+    values = [
+        {
+            "address_key": key,
+            "account": account,
+            "fetched_at": now,
+            "expires_at": None if account else now + NEGATIVE_TTL,
+        }
+        for key, account in rows
+    ]
+    if not values:
+        return
+    stmt = insert(PropertyAccountCache).values(values)
+    if overwrite:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PropertyAccountCache.address_key],
+            set_={k: stmt.excluded[k] for k in ("account", "fetched_at", "expires_at")},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[PropertyAccountCache.address_key])
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(stmt)
+    except Exception as e:
+        print("Property account cache write failed:", e)
+
+
+def lookup_account(address):
+    """Cached BCPAO account for `address`; raises RequestException if BCPAO can't answer."""
+    key = normalize_address(address)
+    if not key:
+        return None
+    cached = _cached_account(key)
+    with _lock:
+        _stats["hits" if cached is not _MISS else "misses"] += 1
+    if cached is not _MISS:
+        return cached
+
+    account = fetch_account(address)
+    _store([(key, account)])
+    return account
+
+
+def get_property_link(address):
+    """BCPAO link for `address`, or None if there is none or BCPAO is unavailable."""
+    try:
+        return link_for(lookup_account(address))
+    except (requests.RequestException, ValueError, KeyError) as e:
+        print("BCPAO lookup failed:", e)
+        return None
+
+
+def cache_stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_ratio": round(_stats["hits"] / lookups, 3) if lookups else None,
+        }
+
+
+def seed_from_jobs():
+    """Cache the accounts jobs already link to; returns how many addresses were seen."""
+    prefix = LINK_TEMPLATE.format("")
+    rows = db.session.execute(
+        select(Job.address, Job.prop_appr_link).where(
+            Job.prop_appr_link.startswith(prefix)
+        )
+    ).all()
+    known = {}
+    for address, link in rows:
+        key = normalize_address(address)
+        if key:
+            known[key] = link[len(prefix) :]
+    _store(known.items(), overwrite=False)
+    return len(known)
+
+
+def backfill(workers=BACKFILL_WORKERS, limit=None):
+    """Fill prop_appr_link on Brevard jobs missing it; returns counts of what happened."""
+    seed_from_jobs()
+
+    query = (
+        select(Job.id, Job.address)
+        .where(
+            Job.deleted_at == None,
+            Job.prop_appr_link == None,
+            func.upper(Job.county) == "BREVARD",
+        )
+        .order_by(Job.id)
+    )
+    if limit:
+        query = query.limit(limit)
+
+    # One lookup per distinct address, however many jobs share it
+    by_address = {}
+    for job_id, address in db.session.execute(query):
+        key = normalize_address(address)
+        if key:
+            by_address.setdefault(key, (address, []))[1].append(job_id)
+    db.session.rollback()
+
+    app = current_app._get_current_object()
+
+    def resolve(address):
+        with app.app_context():
+            try:
+                return lookup_account(address)
+            except (requests.RequestException, ValueError, KeyError) as e:
+                print(f"BCPAO lookup failed for {address!r}:", e)
+                return _MISS
+
+    counts = {"addresses": len(by_address), "linked_jobs": 0, "not_found": 0, "failed": 0}
+    groups = list(by_address.values())
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(groups), BACKFILL_BATCH):
+            chunk = groups[start : start + BACKFILL_BATCH]
+            # Resolve the whole chunk before writing, so no transaction (and
+            # no row lock or revision) is held across BCPAO calls
+            accounts = list(executor.map(resolve, [address for address, _ in chunk]))
+
+            linked = 0
+            for (_, job_ids), account in zip(chunk, accounts):
+                if account is _MISS:
+                    counts["failed"] += 1
+                elif account is None:
+                    counts["not_found"] += 1
+                else:
+                    db.session.execute(
+                        update(Job)
+                        .where(Job.id.in_(job_ids), Job.prop_appr_link == None)
+                        .values(prop_appr_link=link_for(account))
+                        .execution_options(synchronize_session=False)
+                    )
+                    linked += len(job_ids)
+            if linked:
+                bump_data_version(db.session)
+            db.session.commit()
+            counts["linked_jobs"] += linked
+
+    return counts
+
+
+def run_backfill(**kwargs):
+    """backfill() unless another process is already running one; None if so."""
+    if db.engine.dialect.name != "postgresql":
+        return backfill(**kwargs)
+    params = {"key": BACKFILL_LOCK_KEY}
+    with db.engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), params).scalar():
+            return None
+        try:
+            return backfill(**kwargs)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), params)
+
+
+def _scheduled_backfill(app):
+    # Spread workers out so they don't all wake at the same moment
+    time.sleep(random.uniform(0, BACKFILL_INTERVAL))
+    while True:
+        try:
+            with app.app_context():
+                counts = run_backfill()
+            if counts:
+                print("Property link backfill:", counts)
+        except Exception as e:
+            print("Property link backfill failed:", e)
+        time.sleep(BACKFILL_INTERVAL)
+
+
+def init_app(app):
+    started = threading.Event()
+
+    @app.before_request
+    def _start_backfill_schedule():
+        if started.is_set() or not BACKFILL_INTERVAL:
+            return
+        started.set()
+        threading.Thread(
+            target=_scheduled_backfill, args=(app,), name="property-backfill", daemon=True
+        ).start()
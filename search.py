@@ -0,0 +1,203 @@
+"""
+Fuzzy job search across job number, client and address.
+
+On Postgres, search runs on pg_trgm. GIN trigram indexes on the three
+columns answer both the substring match on job_number and the
+word-similarity match (`<%`) on client and address. That match tolerates
+typos and partial words, and results are ranked by their best score over
+the three fields. Elsewhere, an in-memory trigram index built from the
+jobs table gives the same kind of ranking. It follows job changes
+through changes.on_change.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import text
+
+from changes import on_change
+from models import Job, db
+
+SEARCH_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# pg_trgm's default word_similarity_threshold (0.6) misses most one-letter typos
+SEARCH_THRESHOLD = float(os.getenv("SEARCH_THRESHOLD", "0.4"))
+SEARCH_INDEX_MAX_AGE = int(os.getenv("SEARCH_INDEX_MAX_AGE", "300"))
+
+SEARCH_SQL = text("""
+    SELECT id, job_number, client, address, status, latitude, longitude,
+           GREATEST(
+               CASE WHEN job_number ILIKE :prefix THEN 1.0
+                    WHEN job_number ILIKE :contains THEN 0.9
+                    ELSE similarity(job_number, :q) END,
+               word_similarity(:q, client),
+               word_similarity(:q, address)
+           ) AS score
+    FROM jobs
+    WHERE deleted_at IS NULL
+      AND (job_number ILIKE :contains
+           OR job_number % :q
+           OR :q <% client
+           OR :q <% address)
+    ORDER BY score DESC, job_number
+    LIMIT :limit
+""")
+
+RESULT_FIELDS = ("id", "job_number", "client", "address", "status", "latitude", "longitude")
+
+
+def _escape_like(value):
+    return re.sub(r"([\\%_])", r"\\\1", value)
+
+
+def trigrams(value):
+    """pg_trgm-style trigrams: lowercased words padded with two spaces in front, one behind."""
+    grams = set()
+    for word in re.findall(r"[a-z0-9]+", (value or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.docs = {}  # job id -> (result dict, [trigram set per field])
+        self.postings = {}  # trigram -> job ids
+        self.built_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, job_id, job_number, client, address, status, latitude, longitude):
+        with self._lock:
+            self._remove(job_id)
+            fields = [trigrams(job_number), trigrams(client), trigrams(address)]
+            values = (job_id, job_number, client, address, status, latitude, longitude)
+            doc = dict(zip(RESULT_FIELDS, values))
+            self.docs[job_id] = (doc, fields)
+            for gram in set().union(*fields):
+                self.postings.setdefault(gram, set()).add(job_id)
+
+    def remove(self, job_id):
+        with self._lock:
+            self._remove(job_id)
+
+    def _remove(self, job_id):
+        entry = self.docs.pop(job_id, None)
+        if entry is None:
+            return
+        for gram in set().union(*entry[1]):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(job_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def search(self, q, limit=SEARCH_LIMIT):
+        query_grams = trigrams(q)
+        if not query_grams:
+            return []
+        needle = q.lower()
+
+        with self._lock:
+            hits = Counter()
+            for gram in query_grams:
+                hits.update(self.postings.get(gram, ()))
+            # Only score candidates that share enough trigrams to pass the threshold
+            minimum = SEARCH_THRESHOLD * len(query_grams)
+            results = []
+            for job_id, shared in hits.items():
+                if shared < minimum:
+                    continue
+                doc, fields = self.docs[job_id]
+                score = max(len(query_grams & grams) / len(query_grams) for grams in fields)
+                number = (doc["job_number"] or "").lower()
+                if number.startswith(needle):
+                    score = 1.0
+                elif needle in number:
+                    score = max(score, 0.9)
+                if score >= SEARCH_THRESHOLD:
+                    results.append({**doc, "score": round(score, 3)})
+
+        results.sort(key=lambda r: (-r["score"], r["job_number"]))
+        return results[:limit]
+
+    @classmethod
+    def from_database(cls):
+        index = cls()
+        rows = db.session.query(
+            Job.id, Job.job_number, Job.client, Job.address,
+            Job.status, Job.latitude, Job.longitude,
+        ).filter(Job.deleted_at == None)
+        for row in rows:
+            index.add(*row)
+        return index
+
+
+_index = None
+_build_lock = threading.Lock()
+
+
+def get_search_index():
+    """The process-wide TrigramIndex, (re)built from the database as needed."""
+    global _index
+    index = _index
+    if index is not None and time.monotonic() - index.built_at < SEARCH_INDEX_MAX_AGE:
+        return index
+    with _build_lock:
+        if _index is index:
+            _index = TrigramIndex.from_database()
+        return _index
+
+
+def search_jobs(q, limit=SEARCH_LIMIT):
+    """Active jobs matching `q`, best match first, each with a 0-1 `score`."""
+    q = q.strip()
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    if not q:
+        return []
+
+    if db.engine.dialect.name != "postgresql":
+        return get_search_index().search(q, limit)
+
+    # Transaction-local, so other queries keep pg_trgm's defaults
+    db.session.execute(
+        text(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', :t, true),"
+            " set_config('pg_trgm.similarity_threshold', :t, true)"
+        ),
+        {"t": str(SEARCH_THRESHOLD)},
+    )
+    like = _escape_like(q)
+    rows = db.session.execute(
+        SEARCH_SQL,
+        {"q": q, "prefix": f"{like}%", "contains": f"%{like}%", "limit": limit},
+    ).mappings()
+    return [{**row, "score": round(float(row["score"]), 3)} for row in rows]
+
+
+@on_change
+def _apply_job_changes(events):
+    index = _index
+    if index is None:
+        return
+    for change in events:
+        if change["type"] != "job":
+            continue
+        if change["op"] == "deleted":
+            index.remove(change["id"])
+        else:
+            data = change["data"]
+            index.add(
+                change["id"],
+                data["job_number"],
+                data["client"],
+                data["address"],
+                data["status"],
+                data["latitude"],
+                data["longitude"],
+            )
@@ -0,0 +1,147 @@
+"""
+API serializers.
+
+Each serializer declares the loader options its `dump` relies on, so a list
+endpoint built with `Serializer.query(...)` runs a fixed number of queries
+no matter how many rows it returns. Anything `dump` touches beyond the
+model's own columns has to be covered by `load_options`.
+"""
+
+from sqlalchemy.orm import joinedload, load_only
+
+from models import FieldWork, Job, User
+
+
+class JobSerializer:
+    # to_dict reads created_by.name
+    load_options = (joinedload(Job.created_by).load_only(User.id, User.name),)
+
+    # Response key -> Job attribute, for ?fields= sparse fieldsets
+    fields = {
+        "id": "id",
+        "job_number": "job_number",
+        "client": "client",
+        "address": "address",
+        "county": "county",
+        "latitude": "lat",
+        "lat": "lat",
+        "longitude": "long",
+        "long": "long",
+        "property_link": "prop_appr_link",
+        "plat_link": "plat_link",
+        "fema_link": "fema_link",
+        "notes": "notes",
+        "document_URL": "document_url",
+        "status": "status",
+        "visited": "visited",
+        "total_time_spent": "total_time_spent",
+        "tags": "tags",
+        "enrichment_status": "enrichment_status",
+        "created_at": "created_at",
+        "created_by": "created_by",
+    }
+
+    @classmethod
+    def parse_fields(cls, value):
+        """Parse a comma-separated ?fields= value; None means every field."""
+        if not value:
+            return None
+        fields = [f.strip() for f in value.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in cls.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+
+    @classmethod
+    def query(cls, query=None, fields=None):
+        query = query if query is not None else Job.query
+        if fields is None:
+            return query.options(*cls.load_options)
+
+        columns = {cls.fields[f] for f in fields} | {"id"}
+        if "created_by" in fields:
+            columns = columns - {"created_by"} | {"created_by_id"}
+            query = query.options(*cls.load_options)
+        return query.options(load_only(*(getattr(Job, c) for c in columns)))
+
+    @classmethod
+    def dump(cls, job, fields=None):
+        if fields is None:
+            return job.to_dict()
+
+        data = {}
+        for field in fields:
+            value = getattr(job, cls.fields[field])
+            if field == "created_by":
+                value = value.name if value else None
+            data[field] = value
+        return data
+
+    @classmethod
+    def dump_many(cls, jobs, fields=None):
+        return [cls.dump(job, fields) for job in jobs]
+
+
+class FieldWorkSerializer:
+    # to_dict reads job.job_number
+    load_options = (joinedload(FieldWork.job).load_only(Job.id, Job.job_number),)
+
+    @classmethod
+    def query(cls, query=None):
+        return (query if query is not None else FieldWork.query).options(
+            *cls.load_options
+        )
+
+    @staticmethod
+    def dump(entry):
+        return entry.to_dict()
+
+    @classmethod
+    def dump_many(cls, entries):
+        return [cls.dump(entry) for entry in entries]
+
+
+class UserSerializer:
+    load_options = ()
+
+    @classmethod
+    def query(cls, query=None):
+        return (query if query is not None else User.query).options(*cls.load_options)
+
+    @staticmethod
+    def dump(user):
+        return user.to_dict()
+
+    @classmethod
+    def dump_many(cls, users):
+        return [cls.dump(user) for user in users]
+
+
+def dump_markers(rows, precision=6):
+    """
+    Columnar marker feed for the map from (id, job_number, lat, long, status)
+    rows. Jobs without usable coordinates are left out; `status` holds an
+    index into `statuses` (or None). Coordinates are rounded to `precision`
+    decimal places.
+    """
+    feed = {"statuses": [], "id": [], "job_number": [], "lat": [], "lng": [], "status": []}
+    codes = {}
+    for job_id, job_number, lat, lng, status in rows:
+        try:
+            lat = round(float(lat), precision)
+            lng = round(float(lng), precision)
+        except (TypeError, ValueError):
+            continue
+        if status is None:
+            code = None
+        elif status in codes:
+            code = codes[status]
+        else:
+            code = codes[status] = len(feed["statuses"])
+            feed["statuses"].append(status)
+        feed["id"].append(job_id)
+        feed["job_number"].append(job_number)
+        feed["lat"].append(lat)
+        feed["lng"].append(lng)
+        feed["status"].append(code)
+    return feed
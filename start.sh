@@ -1,2 +1,4 @@
 #!/bin/bash
-gunicorn app:app --bind 0.0.0.0:$PORT
+# gthread workers so open /events streams don't each hold a whole worker;
+# events.py caps streams at half of WEB_THREADS and app.py sizes the DB pool
+gunicorn app:app --bind 0.0.0.0:$PORT --worker-class gthread --threads ${WEB_THREADS:-32}
@@ -18,3 +18,5 @@ print(f"✅ Found {len(filtered)} matching counties.")
 print("💾 Exporting to GeoJSON...")
 filtered.to_file("florida_counties.geojson", driver="GeoJSON")
 print("✅ Done: 'florida_counties.geojson' created.")
+print("➡️  Next: run counties.py from the repo root (or 'flask build-county-assets')")
+print("   to load the counties table and rebuild the map's county layers.")
@@ -5,6 +5,10 @@ class AdminSPA {
     this.cache = new Map();
     this.cacheTimestamps = new Map();
     this.cacheTTL = 5 * 60 * 1000; // 5 minutes
+    // Last response + ETag per section, for conditional revalidation
+    this.validated = new Map();
+    // Active job filters and page cursor for the jobs section
+    this.jobParams = new URLSearchParams();
 
     this.init();
   }
@@ -22,6 +26,37 @@ class AdminSPA {
     // Load initial section based on hash
     const initialSection = window.location.hash.replace("#", "") || "dashboard";
     this.loadSection(initialSection, true);
+
+    this.subscribeToChanges();
+  }
+
+  // Other admins' edits arrive over /events; drop the affected sections from
+  // the cache and refresh the dashboard in place (the jobs and users views
+  // may have filters or open forms, so they refresh on the next visit)
+  subscribeToChanges() {
+    if (!window.EventSource) return;
+
+    const source = new EventSource("/events");
+    source.addEventListener("changes", (e) => {
+      const changes = JSON.parse(e.data);
+      const touched = new Set();
+      changes.forEach((change) => {
+        touched.add("dashboard");
+        touched.add(change.type === "user" ? "users" : "jobs");
+      });
+      touched.forEach((section) => this.invalidateCache(section));
+
+      if (this.currentSection === "dashboard") {
+        this.loadSection("dashboard", false);
+      }
+    });
+    // A worker with no free stream slots answers 503, which closes the
+    // stream for good instead of reconnecting; try again in a while
+    source.addEventListener("error", () => {
+      if (source.readyState === EventSource.CLOSED) {
+        setTimeout(() => this.subscribeToChanges(), 30000);
+      }
+    });
   }
 
   setupNavigation() {
@@ -70,16 +105,7 @@ class AdminSPA {
   }
 
   async loadSectionContent(section) {
-    // Check cache first
-    if (this.isCacheValid(section)) {
-      console.log(`Using cached data for ${section}`);
-      const cachedData = this.cache.get(section);
-      this.renderSection(section, cachedData);
-      return;
-    }
-
-    // Fetch fresh data
-    console.log(`Fetching fresh data for ${section}`);
+    // Always revalidate: an unchanged section costs the server a 304
     const data = await this.fetchSectionData(section);
 
     // Cache the data
@@ -97,13 +123,29 @@ class AdminSPA {
       users: "/admin/api/users",
     };
 
-    const response = await fetch(endpoints[section]);
+    const url =
+      section === "jobs" && this.jobParams.toString()
+        ? `${endpoints.jobs}?${this.jobParams}`
+        : endpoints[section];
+    const cached = this.validated.get(section);
+    if (cached && cached.url !== url) this.validated.delete(section);
+    const response = await fetch(url, {
+      headers: cached ? { "If-None-Match": cached.etag } : {},
+      cache: "no-store",
+    });
 
+    if (response.status === 304 && this.validated.has(section)) {
+      console.log(`${section} unchanged, using cached data`);
+      return cached.data;
+    }
     if (!response.ok) {
       throw new Error(`HTTP ${response.status}: ${response.statusText}`);
     }
 
-    return await response.json();
+    const data = await response.json();
+    const etag = response.headers.get("ETag");
+    if (etag) this.validated.set(section, { url, etag, data });
+    return data;
   }
 
   renderSection(section, data) {
@@ -143,9 +185,13 @@ class AdminSPA {
                     <div>Total Users</div>
                 </div>
                 <div class="metric-card">
-                    <div class="metric-number">${Object.keys(data.status_counts).length}</div>
+                    <div class="metric-number">${Object.values(data.status_counts).filter((count) => count > 0).length}</div>
                     <div>Active Job Statuses</div>
                 </div>
+                <div class="metric-card" id="dashboard-geocode">
+                    <div class="metric-number">&hellip;</div>
+                    <div>Geocode Cache Hits</div>
+                </div>
             </div>
             
             <h3>Recent Jobs</h3>
@@ -182,7 +228,136 @@ class AdminSPA {
             `,
               )
               .join("")}
+
+            <h3>Hours by Crew</h3>
+            <table class="spa-table">
+                <thead>
+                    <tr>
+                        <th>Crew</th>
+                        <th>Hours</th>
+                        <th>Visits</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${data.crew_hours
+                      .map(
+                        (row) => `
+                        <tr>
+                            <td>${row.crew}</td>
+                            <td>${row.hours}</td>
+                            <td>${row.visits}</td>
+                        </tr>
+                    `,
+                      )
+                      .join("")}
+                </tbody>
+            </table>
+
+            <h3>External Providers</h3>
+            <div id="dashboard-providers">Loading...</div>
+
+            <h3>Response Times</h3>
+            <div id="dashboard-metrics">Loading...</div>
+
+            <h3>Jobs by County</h3>
+            ${Object.entries(data.county_counts)
+              .map(
+                ([county, count]) => `
+                <p><strong>${county}:</strong> ${count} jobs</p>
+            `,
+              )
+              .join("")}
         `;
+    this.loadMetrics();
+  }
+
+  // Live per-worker numbers (caches, providers, response times), so fetched
+  // fresh rather than through the ETag cache
+  async loadMetrics() {
+    const container = document.getElementById("dashboard-metrics");
+    const providers = document.getElementById("dashboard-providers");
+    try {
+      const response = await fetch("/admin/api/metrics", { cache: "no-store" });
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+      const data = await response.json();
+      const geocode = data.caches.geocode;
+      document.getElementById("dashboard-geocode").innerHTML = `
+                    <div class="metric-number">${geocode.hit_ratio !== null ? Math.round(geocode.hit_ratio * 100) + "%" : "N/A"}</div>
+                    <div>Geocode Cache Hits</div>
+                    <small>${geocode.hits} hits / ${geocode.misses} misses</small>
+            `;
+      providers.innerHTML = `
+            <table class="spa-table">
+                <thead>
+                    <tr>
+                        <th>Provider</th>
+                        <th>Calls</th>
+                        <th>Errors</th>
+                        <th>Avg (ms)</th>
+                        <th>Circuit</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${Object.entries(data.providers)
+                      .map(
+                        ([name, stats]) => `
+                        <tr>
+                            <td>${name}</td>
+                            <td>${stats.calls}</td>
+                            <td>${stats.errors}</td>
+                            <td>${stats.avg_ms ?? "N/A"}</td>
+                            <td>${stats.circuit}</td>
+                        </tr>
+                    `,
+                      )
+                      .join("")}
+                </tbody>
+            </table>
+        `;
+      const caches = Object.entries(data.caches)
+        .map(
+          ([name, stats]) =>
+            `${name}: ${stats.hit_ratio !== null ? Math.round(stats.hit_ratio * 100) + "%" : "N/A"}`,
+        )
+        .join(" &middot; ");
+      container.innerHTML = `
+            <p>${data.requests} requests, ${data.slow_requests} slower than ${data.slow_request_seconds}s
+               &middot; Cache hits: ${caches}</p>
+            <table class="spa-table">
+                <thead>
+                    <tr>
+                        <th>Endpoint</th>
+                        <th>Requests</th>
+                        <th>p50 (ms)</th>
+                        <th>p95 (ms)</th>
+                        <th>Queries / req</th>
+                        <th>SQL (ms) / req</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${data.endpoints
+                      .slice(0, 10)
+                      .map(
+                        (e) => `
+                        <tr>
+                            <td>${e.method} ${e.endpoint.replace(/</g, "&lt;")}</td>
+                            <td>${e.count}</td>
+                            <td>${e.p50_ms ?? "N/A"}</td>
+                            <td>${e.p95_ms ?? "N/A"}</td>
+                            <td>${e.queries_per_request ?? "N/A"}</td>
+                            <td>${e.sql_ms_per_request ?? "N/A"}</td>
+                        </tr>
+                    `,
+                      )
+                      .join("")}
+                </tbody>
+            </table>
+        `;
+    } catch (err) {
+      console.error("Metrics load failed:", err);
+      container.textContent = "Metrics unavailable";
+      providers.textContent = "Metrics unavailable";
+    }
   }
 
   renderJobs(data) {
@@ -252,9 +427,11 @@ class AdminSPA {
         
         <!-- Pagination -->
         <div class="pagination">
+            <button onclick="adminSPA.loadJobsPage('${data.prev_cursor || ""}')" class="spa-btn spa-btn-small spa-btn-secondary" ${data.has_prev ? "" : "disabled"}>&laquo; Previous</button>
+            <button onclick="adminSPA.loadJobsPage('${data.next_cursor || ""}')" class="spa-btn spa-btn-small spa-btn-secondary" ${data.has_next ? "" : "disabled"}>Next &raquo;</button>
             <div class="pagination-info">
-                Showing ${data.jobs.length} of ${data.total_jobs} jobs
-                (Page ${data.current_page} of ${data.total_pages})
+                Showing ${data.jobs.length} of
+                ${data.total_jobs === null ? "many" : (data.total_exact ? "" : "~") + data.total_jobs} jobs
             </div>
         </div>
         
@@ -347,6 +524,9 @@ class AdminSPA {
             </div>
         </div>
     `;
+
+    attachAutocomplete(document.getElementById("new-client"), "client");
+    attachAutocomplete(document.getElementById("new-address"), "address");
   }
   renderUsers(data) {
     const content = document.getElementById("users-content");
@@ -557,8 +737,6 @@ class AdminSPA {
   }
 
   async applyJobFilters() {
-    this.invalidateCache("jobs");
-
     const params = new URLSearchParams();
     const jobNumber = document.getElementById("filter-job-number").value;
     const client = document.getElementById("filter-client").value;
@@ -568,16 +746,8 @@ class AdminSPA {
     if (client) params.append("client", client);
     if (status) params.append("status", status);
 
-    try {
-      const response = await fetch(`/admin/api/jobs?${params}`);
-      const data = await response.json();
-
-      this.cache.set("jobs", data);
-      this.cacheTimestamps.set("jobs", Date.now());
-      this.renderJobs(data);
-    } catch (error) {
-      this.showError("Failed to filter jobs: " + error.message);
-    }
+    this.jobParams = params;
+    await this.loadJobsPage("");
   }
 
   async clearJobFilters() {
@@ -585,10 +755,35 @@ class AdminSPA {
     document.getElementById("filter-client").value = "";
     document.getElementById("filter-status").value = "";
 
+    this.jobParams = new URLSearchParams();
     this.invalidateCache("jobs");
     this.loadSection("jobs", false);
   }
 
+  // Pages are fetched by cursor, so any page costs the same as the first
+  async loadJobsPage(cursor) {
+    if (cursor) {
+      this.jobParams.set("cursor", cursor);
+    } else {
+      this.jobParams.delete("cursor");
+    }
+
+    try {
+      const data = await this.fetchSectionData("jobs");
+
+      this.cache.set("jobs", data);
+      this.cacheTimestamps.set("jobs", Date.now());
+      this.renderJobs(data);
+
+      // renderJobs redraws the filter form; keep showing the active filters
+      document.getElementById("filter-job-number").value = this.jobParams.get("job_number") || "";
+      document.getElementById("filter-client").value = this.jobParams.get("client") || "";
+      document.getElementById("filter-status").value = this.jobParams.get("status") || "";
+    } catch (error) {
+      this.showError("Failed to load jobs: " + error.message);
+    }
+  }
+
   showCreateJobModal() {
     this.openModal("createJobModal");
   }
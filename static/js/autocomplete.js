@@ -0,0 +1,39 @@
+// Client/address suggestions for form inputs, served from /autocomplete
+function attachAutocomplete(input, field) {
+  if (!input) return;
+
+  const list = document.createElement("datalist");
+  list.id = `${input.id || input.name}-suggestions`;
+  input.setAttribute("list", list.id);
+  input.after(list);
+
+  let timer;
+  let latest = 0;
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(async () => {
+      const q = input.value.trim();
+      if (!q) return;
+
+      const request = ++latest;
+      try {
+        const response = await fetch(
+          `/autocomplete?field=${field}&q=${encodeURIComponent(q)}`,
+        );
+        const values = await response.json();
+        // A slower response for an earlier keystroke mustn't overwrite this one
+        if (request !== latest || !Array.isArray(values)) return;
+
+        list.replaceChildren(
+          ...values.map((value) => {
+            const option = document.createElement("option");
+            option.value = value;
+            return option;
+          }),
+        );
+      } catch (error) {
+        console.error("Autocomplete failed:", error);
+      }
+    }, 100);
+  });
+}
@@ -2,12 +2,19 @@
 const INITIAL_CENTER = [28.5383, -81];
 const INITIAL_ZOOM = 10;
 const MAX_GEOCODE_CALLS = 10;
+// Up to this zoom unfiltered jobs are clustered by the server (/jobs/clusters)
+const SERVER_CLUSTER_MAX_ZOOM = 16;
 
 // Application State
 const AppState = {
   map: null,
   markerCluster: null,
-  lastFetchedJobs: [],
+  markers: null,
+  filters: {},
+  loadedBounds: null,
+  loadedZoom: null,
+  clustered: false,
+  selectedJob: null,
   selectedJobNumber: null,
   searchMarker: null,
 };
@@ -120,14 +127,22 @@ function createEpicMarkerSVG(status) {
   `;
 }
 
+const statusIconCache = new Map();
+
 function getStatusIcon(status) {
-  return L.divIcon({
-    html: createEpicMarkerSVG(status),
-    className: "epic-svg-marker",
-    iconSize: [25, 41],
-    iconAnchor: [12, 41],
-    popupAnchor: [1, -34],
-  });
+  if (!statusIconCache.has(status)) {
+    statusIconCache.set(
+      status,
+      L.divIcon({
+        html: createEpicMarkerSVG(status),
+        className: "epic-svg-marker",
+        iconSize: [25, 41],
+        iconAnchor: [12, 41],
+        popupAnchor: [1, -34],
+      }),
+    );
+  }
+  return statusIconCache.get(status);
 }
 
 // Map Setup
@@ -142,9 +157,20 @@ const baseMaps = {
   ),
 };
 
-const countiesLayer = L.geoJSON(null, {
-  style: { color: "#f00", weight: 1, fillOpacity: 0 },
-});
+// County outlines come from prebuilt per-zoom assets (county_assets.py) when
+// they have been built, and from vector tiles (/tiles/counties/...) otherwise
+const countyAssets = window.COUNTY_ASSETS;
+const countiesLayer = countyAssets
+  ? L.geoJSON(null, {
+      style: { color: "#f00", weight: 1, fill: false },
+      interactive: false,
+    })
+  : L.vectorGrid.protobuf("/tiles/counties/{z}/{x}/{y}.mvt", {
+      vectorTileLayerStyles: {
+        counties: { color: "#f00", weight: 1, fill: false },
+      },
+      maxNativeZoom: 14,
+    });
 
 const countyLabelsLayer = L.layerGroup();
 
@@ -193,82 +219,193 @@ referenceLocations.forEach((loc) => {
   });
 });
 
-// Load Counties
-fetch("/static/data/florida_counties.geojson")
-  .then((res) => res.json())
-  .then((data) => {
-    countiesLayer.addData(data);
-    data.features.forEach((feature) => {
-      const name = feature.properties.NAME;
-      const center = turf.center(feature).geometry.coordinates;
-      const label = L.marker([center[1], center[0]], {
-        icon: L.divIcon({
-          className: "county-label",
-          html: name,
-          iconSize: [100, 20],
-          iconAnchor: [50, 10],
-        }),
-        interactive: false,
-      });
-      countyLabelsLayer.addLayer(label);
-    });
-  })
-  .catch((err) => console.error("County load failed:", err));
+function addCountyLabel(name, lat, lng) {
+  countyLabelsLayer.addLayer(
+    L.marker([lat, lng], {
+      icon: L.divIcon({
+        className: "county-label",
+        html: name,
+        iconSize: [100, 20],
+        iconAnchor: [50, 10],
+      }),
+      interactive: false,
+    }),
+  );
+}
 
-// Job Management Functions
-function fetchJobs(params = {}) {
-  if (AppState.markerCluster) {
-    AppState.map.removeLayer(AppState.markerCluster);
-  }
+if (countyAssets) {
+  // Files are content-hashed and cached for a year, so each level is fetched
+  // at most once per browser until the boundaries are rebuilt
+  const countyLevelData = {};
+  let countyLevel = null;
+
+  const levelForZoom = (zoom) =>
+    countyAssets.find(
+      (level) =>
+        zoom >= level.min_zoom && (level.max_zoom === null || zoom <= level.max_zoom),
+    ) || countyAssets[countyAssets.length - 1];
+
+  const showCountyLevel = () => {
+    const level = levelForZoom(AppState.map.getZoom());
+    if (level === countyLevel) return;
+    countyLevel = level;
+    countyLevelData[level.url] ||= fetch(level.url).then((res) => res.json());
+    countyLevelData[level.url]
+      .then((data) => {
+        if (countyLevel !== level) return;
+        countiesLayer.clearLayers().addData(data);
+        if (!countyLabelsLayer.getLayers().length) {
+          data.features.forEach(({ properties: { name, label } }) =>
+            addCountyLabel(name, label[0], label[1]),
+          );
+        }
+      })
+      .catch((err) => {
+        delete countyLevelData[level.url];
+        countyLevel = null;
+        console.error("County load failed:", err);
+      });
+  };
 
-  const query = new URLSearchParams(params).toString();
-  return fetch(`/jobs?${query}`)
+  AppState.map.on("zoomend", showCountyLevel);
+  showCountyLevel();
+} else {
+  // Load county labels (anchors are computed on the server)
+  fetch("/counties/labels")
     .then((res) => res.json())
-    .then((data) => {
-      AppState.lastFetchedJobs = data;
-      const cluster = renderMarkers(data);
-      AppState.markerCluster = cluster;
-      AppState.map.addLayer(cluster);
-    });
+    .then((labels) => {
+      labels.forEach(({ name, lat, lng }) => addCountyLabel(name, lat, lng));
+    })
+    .catch((err) => console.error("County load failed:", err));
 }
 
-function renderMarkers(jobs) {
-  const cluster = L.markerClusterGroup();
-  jobs.forEach((job) => {
-    // Use correct field names from to_dict() method
-    if (job.latitude && job.longitude) {
-      const lat = parseFloat(job.latitude);
-      const lng = parseFloat(job.longitude);
-
-      // Validate coordinates
-      if (!isNaN(lat) && !isNaN(lng)) {
-        const marker = L.marker([lat, lng], {
-          icon: getStatusIcon(job.status),
-        });
-        marker.on("click", () => showJobDetails(job));
-        cluster.addLayer(marker);
+// Job Management Functions
+// Only jobs inside the (padded) viewport are requested; call with new
+// filters to change them, or with no arguments to reload the current ones.
+// Unfiltered views at low and medium zoom get server-side clusters; filtered
+// results are small enough to cluster in the browser.
+function fetchJobs(params = AppState.filters) {
+  AppState.filters = params;
+  const bounds = AppState.map.getBounds().pad(0.5);
+  const zoom = AppState.map.getZoom();
+  const filtered = Object.values(params).some((value) => value);
+  const clustered = !filtered && zoom <= SERVER_CLUSTER_MAX_ZOOM;
+
+  const query = new URLSearchParams({
+    ...params,
+    bbox: bounds.toBBoxString(),
+    zoom,
+  }).toString();
+  const url = clustered ? `/jobs/clusters?${query}` : `/jobs/markers?${query}`;
+  // "no-cache" makes the browser revalidate with its stored ETag, so an
+  // unchanged view is answered with an empty 304
+  return fetch(url, { cache: "no-cache" })
+    .then((res) => {
+      if (!res.ok) {
+        throw new Error(`HTTP ${res.status}: ${res.statusText}`);
+      }
+      return res.json();
+    })
+    .then((data) => {
+      if (AppState.markerCluster) {
+        AppState.map.removeLayer(AppState.markerCluster);
       }
+      AppState.markers = clustered ? null : data;
+      AppState.loadedBounds = bounds;
+      AppState.loadedZoom = zoom;
+      AppState.clustered = clustered;
+      const layer = clustered ? renderClusters(data) : renderMarkers(data);
+      AppState.markerCluster = layer;
+      AppState.map.addLayer(layer);
+    })
+    // Keep the markers already on the map rather than blanking it
+    .catch((err) => console.error("Job load failed:", err));
+}
+
+// Refetch when the user pans outside what was loaded or changes zoom level
+// (server clusters are per zoom; raw markers only need refetching to gain
+// coordinate precision when zooming in)
+AppState.map.on(
+  "moveend",
+  debounce(() => {
+    const zoom = AppState.map.getZoom();
+    const inside =
+      AppState.loadedBounds &&
+      AppState.loadedBounds.contains(AppState.map.getBounds());
+    const sameZoom = AppState.clustered
+      ? zoom === AppState.loadedZoom
+      : zoom <= AppState.loadedZoom;
+    if (inside && sameZoom) return;
+    fetchJobs();
+  }, 250),
+);
+
+function renderClusters(data) {
+  const layer = L.layerGroup();
+  data.clusters.forEach((item) => {
+    if (item.count === 1) {
+      const marker = L.marker([item.lat, item.lng], {
+        icon: getStatusIcon(item.status),
+      });
+      marker.on("click", () => loadJobDetails(item.job_number));
+      layer.addLayer(marker);
+      return;
     }
+
+    const size =
+      item.count < 10 ? "small" : item.count < 100 ? "medium" : "large";
+    const marker = L.marker([item.lat, item.lng], {
+      icon: L.divIcon({
+        html: `<div><span>${item.count}</span></div>`,
+        className: `marker-cluster marker-cluster-${size}`,
+        iconSize: L.point(40, 40),
+      }),
+    });
+    marker.on("click", () => {
+      AppState.map.setView(
+        [item.lat, item.lng],
+        Math.min(data.zoom + 2, AppState.map.getMaxZoom()),
+      );
+    });
+    layer.addLayer(marker);
   });
+  return layer;
+}
+
+// Markers come as parallel arrays (see /jobs/markers); coordinates are
+// already validated floats and status is an index into data.statuses
+function renderMarkers(data) {
+  const cluster = L.markerClusterGroup();
+  const markers = [];
+  for (let i = 0; i < data.id.length; i++) {
+    const jobNumber = data.job_number[i];
+    const marker = L.marker([data.lat[i], data.lng[i]], {
+      icon: getStatusIcon(data.statuses[data.status[i]]),
+    });
+    marker.on("click", () => loadJobDetails(jobNumber));
+    markers.push(marker);
+  }
+  cluster.addLayers(markers);
   return cluster;
 }
 
-function refreshSidebarJob(job_number) {
-  fetch(`/jobs?job_number=${job_number}`)
+// Full job details are only fetched when a marker is clicked
+function loadJobDetails(job_number) {
+  return fetch(`/jobs/${encodeURIComponent(job_number)}`)
     .then((res) => res.json())
-    .then((data) => {
-      const updatedJob = data[0];
-      if (updatedJob) {
-        AppState.lastFetchedJobs = AppState.lastFetchedJobs.map((j) =>
-          j.job_number === job_number ? updatedJob : j,
-        );
-        showJobDetails(updatedJob);
-      }
+    .then((job) => {
+      if (!job.error) showJobDetails(job);
+      return job;
     });
 }
 
+function refreshSidebarJob(job_number) {
+  loadJobDetails(job_number);
+}
+
 // Job Details & Editing - Updated for unified styling
 function showJobDetails(job) {
+  AppState.selectedJob = job;
   AppState.selectedJobNumber = job.job_number;
   document.getElementById("visited-count").textContent = job.visited || 0;
   document.getElementById("total-time-spent").textContent = Number(
@@ -377,9 +514,7 @@ function openEditFieldworkModal(
 
 // Function to populate edit job modal
 function populateEditJobModal() {
-  const job = AppState.lastFetchedJobs.find(
-    (j) => j.job_number === AppState.selectedJobNumber,
-  );
+  const job = AppState.selectedJob;
   if (!job) return;
 
   document.getElementById("edit-job-number").value = job.job_number;
@@ -397,8 +532,8 @@ function populateEditJobModal() {
 
 // Legacy function for compatibility
 function editJob(job_number) {
-  const job = AppState.lastFetchedJobs.find((j) => j.job_number === job_number);
-  if (!job) return;
+  const job = AppState.selectedJob;
+  if (!job || job.job_number !== job_number) return;
 
   const content = document.getElementById("info-content");
   content.innerHTML = `
@@ -495,12 +630,6 @@ function submitUpdate(updated) {
       }
       alert("Job updated!");
       fetchJobs();
-      Object.assign(
-        AppState.lastFetchedJobs.find(
-          (j) => j.job_number === AppState.selectedJobNumber,
-        ),
-        data,
-      );
       showJobDetails(data);
     });
 }
@@ -573,6 +702,65 @@ function setupAddressAutocomplete() {
   });
 }
 
+// Existing jobs matching the search box, as you type (see /search)
+function setupJobSearch() {
+  const input = document.getElementById("search");
+  const results = document.getElementById("job-search-results");
+  if (!input || !results) return;
+
+  let latest = 0;
+  const debouncedSearch = debounce(async (q) => {
+    if (q.length < 2) {
+      results.style.display = "none";
+      return;
+    }
+
+    const request = ++latest;
+    try {
+      const response = await fetch(
+        `/search?q=${encodeURIComponent(q)}&limit=8`,
+      );
+      const jobs = await response.json();
+      // Drop responses that arrive after a newer keystroke's
+      if (request !== latest) return;
+      showJobSearchResults(jobs, results);
+    } catch (error) {
+      console.error("Job search failed:", error);
+    }
+  }, 150);
+
+  input.addEventListener("input", (e) => {
+    debouncedSearch(e.target.value.trim());
+  });
+}
+
+function showJobSearchResults(jobs, container) {
+  if (!jobs.length) {
+    container.style.display = "none";
+    return;
+  }
+
+  container.innerHTML = jobs
+    .map(
+      (job) => `
+    <div style="padding: 6px 8px; background: #f0f0f0; border: 1px solid #ccc; cursor: pointer;"
+         onclick="selectSearchResult('${job.job_number}', ${job.latitude}, ${job.longitude})">
+      <strong>#${job.job_number}</strong> ${job.client} &ndash; ${job.address}
+    </div>
+  `,
+    )
+    .join("");
+  container.style.display = "block";
+}
+
+function selectSearchResult(job_number, lat, lng) {
+  document.getElementById("job-search-results").style.display = "none";
+  if (lat !== null && lng !== null) {
+    AppState.map.flyTo([lat, lng], 17);
+  }
+  loadJobDetails(job_number);
+}
+
 function showAddressSuggestion(geocodeData, container) {
   if (!geocodeData.formatted_address) return;
 
@@ -651,12 +839,13 @@ const searchFormHandler = function (e) {
 
 function clearFilters() {
   document.getElementById("filterForm").reset();
-  fetchJobs();
+  fetchJobs({});
 }
 
 // Initialize Event Listeners
 document.addEventListener("DOMContentLoaded", function () {
   setupAddressAutocomplete();
+  setupJobSearch();
 
   // Filter form
   document
@@ -823,5 +1012,37 @@ document.addEventListener("DOMContentLoaded", function () {
   }
 });
 
+// Live updates: other users' edits arrive over /events instead of polling
+function subscribeToChanges() {
+  if (!window.EventSource) return;
+
+  const refreshMarkers = debounce(() => fetchJobs(), 1000);
+  const source = new EventSource("/events");
+  source.addEventListener("changes", (e) => {
+    const changes = JSON.parse(e.data);
+    if (changes.some((c) => c.type === "job")) refreshMarkers();
+
+    const selected = AppState.selectedJob;
+    if (
+      selected &&
+      changes.some(
+        (c) =>
+          (c.type === "job" && c.id === selected.id) ||
+          (c.type === "fieldwork" && c.data.job_id === selected.id),
+      )
+    ) {
+      refreshSidebarJob(selected.job_number);
+    }
+  });
+  // A worker with no free stream slots answers 503, which closes the
+  // stream for good instead of reconnecting; try again in a while
+  source.addEventListener("error", () => {
+    if (source.readyState === EventSource.CLOSED) {
+      setTimeout(subscribeToChanges, 30000);
+    }
+  });
+}
+
 // Load initial jobs
 fetchJobs();
+subscribeToChanges();
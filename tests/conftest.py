@@ -0,0 +1,131 @@
+"""
+Shared setup for the query-budget tests.
+
+They run the app against a scratch Postgres database (with pg_trgm
+available) named by TEST_DATABASE_URL, and are skipped when it is unset.
+The schema is brought up with the app's migrations, and every table is
+emptied before each dataset is generated, so never point it at a database
+you care about. Geocoding and BCPAO calls go to bench.fake_providers on a
+local port, and county lookups use a one-county stand-in, so nothing
+needs PostGIS or the network.
+"""
+
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+if TEST_DATABASE_URL:
+    from bench import fake_providers
+
+    _providers = ThreadingHTTPServer(("127.0.0.1", 0), fake_providers.Handler)
+    threading.Thread(
+        target=_providers.serve_forever, name="fake-providers", daemon=True
+    ).start()
+    _providers_url = f"http://127.0.0.1:{_providers.server_port}"
+
+    # Read at import time by the app's modules, so set before importing it
+    os.environ.update(
+        {
+            "DATABASE_URL": TEST_DATABASE_URL,
+            "SESSION_KEY": "query-budget-tests",
+            "GOOGLE_GEOCODING_API_KEY": "test",
+            "GEOCODE_URL": f"{_providers_url}/maps/api/geocode/json",
+            "BCPAO_URL": f"{_providers_url}/api/records",
+            "BCRYPT_ROUNDS": "4",
+            "ENRICHMENT_WORKERS": "0",
+            "PROPERTY_BACKFILL_INTERVAL": "0",
+        }
+    )
+
+
+@pytest.fixture(scope="session")
+def app():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    import shapely
+    from flask_migrate import upgrade
+
+    import county_index
+    from app import app
+
+    app.config["TESTING"] = True
+    with app.app_context():
+        upgrade()
+
+    county_index._index = county_index.CountyIndex(
+        ["TEST"], [shapely.box(-83.0, 27.0, -80.0, 31.0)]
+    )
+    county_index._loaded = True
+    return app
+
+
+def seed(app, jobs, seed=42):
+    """Empty every table, then generate `jobs` bench jobs (and a crew per 10)."""
+    from sqlalchemy import text
+
+    from bench import generate
+    from models import db
+
+    with app.app_context():
+        tables = ", ".join(f'"{t.name}"' for t in db.metadata.sorted_tables)
+        db.session.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+        db.session.commit()
+        generate.generate(jobs, seed, max(2, jobs // 10), batch_size=1000)
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE jobs"))
+            conn.execute(text("ANALYZE field_work"))
+    reset_caches()
+
+
+def reset_caches():
+    """Drop the process caches that are built from the database on demand."""
+    import autocomplete
+    import clustering
+    from dashboard import dashboard_cache
+
+    # Don't let a warm-up still in flight repopulate them afterwards
+    for thread in threading.enumerate():
+        if thread.name in ("autocomplete-warmup", "autocomplete-rebuild"):
+            thread.join()
+    autocomplete._autocomplete = None
+    clustering._index = None
+    dashboard_cache.invalidate()
+
+
+class StatementLog:
+    """Records the SQL statements run while handling requests, inside a `with` block."""
+
+    def __init__(self):
+        self.statements = []
+        self._active = False
+
+    def __enter__(self):
+        self.statements = []
+        self._active = True
+        return self
+
+    def __exit__(self, *exc):
+        self._active = False
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        from flask import has_request_context
+
+        # Background threads (event listener, warm-ups) have no request context
+        if self._active and has_request_context():
+            self.statements.append(" ".join(statement.split()))
+
+
+@pytest.fixture(scope="session")
+def statement_log(app):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    log = StatementLog()
+    event.listen(Engine, "before_cursor_execute", log.record)
+    yield log
+    event.remove(Engine, "before_cursor_execute", log.record)
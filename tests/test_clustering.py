@@ -0,0 +1,34 @@
+"""Web Mercator projection at the edges of the map."""
+
+import pytest
+
+from clustering import ClusterIndex, project
+
+
+@pytest.mark.parametrize("lat", [90, -90, 89.9, -89.9])
+def test_project_clamps_the_poles(lat):
+    x, y = project(lat, 0)
+    assert x == 0.5
+    assert y == (0.0 if lat > 0 else 1.0)
+
+
+def test_whole_world_bbox_queries():
+    index = ClusterIndex()
+    index.add(1, 28.5383, -81.3792, "J-1", "Needs Fieldwork")
+    index.add(2, 90, 0, "J-2", "Needs Fieldwork")
+    clusters = index.clusters(-180, -90, 180, 90, 3)
+    assert sum(c["count"] for c in clusters) == 2
+
+
+def test_fingerprint_depends_only_on_the_points():
+    a, b = ClusterIndex(), ClusterIndex()
+    a.add(1, 28.5, -81.3, "J-1", "Needs Fieldwork")
+    a.add(2, 28.1, -80.6, "J-2", "On Hold/Pending")
+    b.add(2, 28.1, -80.6, "J-2", "On Hold/Pending")
+    b.add(1, 28.4, -81.3, "J-1", "Needs Fieldwork")
+    assert a.fingerprint != b.fingerprint
+    b.add(1, 28.5, -81.3, "J-1", "Needs Fieldwork")
+    assert a.fingerprint == b.fingerprint
+    a.remove(1)
+    a.remove(2)
+    assert a.fingerprint == 0
@@ -0,0 +1,44 @@
+"""Packing change events into NOTIFY payloads for the cross-worker relay."""
+
+import json
+
+from events import MAX_NOTIFY_BYTES, _from_wire, notify_payloads
+
+
+def job_event(job_id):
+    address = f"{job_id} Indian River Blvd, Melbourne, FL 32901, USA" * 3
+    data = {
+        "job_number": f"J-{job_id}",
+        "client": "Smith & Garcia Land Co.",
+        "address": address,
+        "status": "Needs Fieldwork",
+        "county": "BREVARD",
+        "latitude": 28.0836,
+        "longitude": -80.6081,
+        "previous_client": "Smith & Garcia Land Co.",
+        "previous_address": "1 Old Rd, Melbourne, FL 32901",
+        "previous_latitude": 28.0836,
+        "previous_longitude": -80.6081,
+        "previous_deleted": False,
+    }
+    return {"type": "job", "op": "updated", "id": job_id, "data": data}
+
+
+def test_payloads_fit_the_notify_limit_and_keep_every_event():
+    events = [job_event(i) for i in range(100)]
+    payloads = notify_payloads(events)
+    assert len(payloads) > 1
+    assert all(len(p.encode()) <= MAX_NOTIFY_BYTES for p in payloads)
+    relayed = [e for p in payloads for e in json.loads(p)["events"]]
+    assert [e["id"] for e in relayed] == list(range(100))
+
+
+def test_unchanged_previous_fields_round_trip():
+    event = job_event(7)
+    (payload,) = notify_payloads([event])
+    (wire,) = json.loads(payload)["events"]
+    assert "previous_latitude" not in wire["data"]
+    restored = _from_wire(wire)
+    assert restored["remote"] is True
+    for key, value in event["data"].items():
+        assert restored["data"][key] == value
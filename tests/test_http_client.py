@@ -0,0 +1,44 @@
+"""Circuit breaker behaviour of HTTPClient, without touching the network."""
+
+import time
+
+import pytest
+import requests
+
+from http_client import HTTPClient
+
+
+def half_open_client(error):
+    """A client whose breaker is due a trial call, and whose calls raise `error`."""
+
+    def request(*args, **kwargs):
+        raise error
+
+    client = HTTPClient("test", retries=0)
+    client.breaker.opened_at = time.monotonic() - client.breaker.reset_seconds
+    client.session.request = request
+    return client
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        requests.exceptions.ChunkedEncodingError("truncated"),
+        requests.exceptions.InvalidURL("bad url"),
+        requests.exceptions.TooManyRedirects("loop"),
+    ],
+)
+def test_failed_trial_reopens_the_circuit(error):
+    client = half_open_client(error)
+    with pytest.raises(type(error)):
+        client.get("http://provider.invalid/")
+    assert client.breaker.state == "open"
+    assert not client.breaker._trial
+
+
+def test_unexpected_error_releases_the_trial():
+    client = half_open_client(RuntimeError("boom"))
+    with pytest.raises(RuntimeError):
+        client.get("http://provider.invalid/")
+    assert client.breaker.state == "half-open"
+    assert client.breaker.allow()
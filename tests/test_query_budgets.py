@@ -0,0 +1,357 @@
+"""
+Per-endpoint SQL statement budgets.
+
+Every route in app.py and admin/routes.py is requested against two seeded
+datasets, SMALL_JOBS and LARGE_JOBS jobs (with a crew user per ten jobs).
+A route fails if it runs more statements than its budget, or more on the
+large dataset than on the small one, which is how an N+1 query shows up.
+Failures list the statements the route ran at both sizes.
+
+Each request is made twice and only the second is counted, so one-time
+work (the county index, the geocode cache) stays out of the numbers.
+`cold` routes have the dashboard, cluster and autocomplete caches dropped
+before the counted request, so their budget covers a rebuild.
+
+When a change legitimately adds a statement, raise the budget with it.
+"""
+
+import itertools
+from collections import namedtuple
+from datetime import date
+
+import pytest
+
+from conftest import reset_caches, seed
+
+SMALL_JOBS = 10
+LARGE_JOBS = 150
+
+Case = namedtuple(
+    "Case",
+    "method rule budget request status cold anonymous",
+    defaults=(200, False, False),
+)
+
+FIELDWORK = {"work_date": str(date.today()), "start_time": "08:00", "end_time": "10:30"}
+
+
+class Fixtures:
+    """Rows the requests point at, and factories for rows a request consumes."""
+
+    def __init__(self, app):
+        from models import FieldWork, Job, User
+
+        self.app = app
+        self._serial = itertools.count(1)
+        with app.app_context():
+            job = (
+                Job.active()
+                .filter(Job.visited > 0)
+                .order_by(Job.visited.desc(), Job.id)
+                .first()
+            )
+            self.job_id = job.id
+            self.job_number = job.job_number
+            self.address = job.address
+            self.client = job.client
+            self.fieldwork_id = (
+                FieldWork.query.filter_by(job_id=job.id).order_by(FieldWork.id).first().id
+            )
+            self.user_id = (
+                User.query.filter_by(role="user").order_by(User.id).first().id
+            )
+
+    def unique(self, prefix):
+        return f"{prefix}{next(self._serial)}"
+
+    def new_job(self):
+        from models import Job, db
+
+        with self.app.app_context():
+            job = Job(
+                job_number=self.unique("QB-DEL-"),
+                client="Query Budget",
+                address=self.address,
+                visited=0,
+                total_time_spent=0.0,
+                tags=[],
+            )
+            db.session.add(job)
+            db.session.commit()
+            return job.id
+
+    def new_fieldwork(self):
+        from datetime import time
+
+        from models import FieldWork, Job, db
+
+        with self.app.app_context():
+            fw = FieldWork(
+                job_id=self.job_id,
+                work_date=date.today(),
+                start_time=time(8),
+                end_time=time(9),
+                total_time=1.0,
+            )
+            db.session.add(fw)
+            Job.add_fieldwork_totals(self.job_id, 1, 1.0)
+            db.session.commit()
+            return fw.id
+
+    def new_user(self):
+        from models import User, db
+
+        with self.app.app_context():
+            user = User(
+                username=self.unique("qb-user-"), name="Query Budget", password="x", role="user"
+            )
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+
+
+def new_job_form(f):
+    return {"job_number": f.unique("QB-"), "address": f.address, "client": "Query Budget"}
+
+
+CASES = [
+    # app.py
+    Case("GET", "/", 0, lambda f: {"path": "/"}),
+    Case("POST", "/", 6, lambda f: {"path": "/", "data": new_job_form(f)}),
+    Case("GET", "/jobs", 2, lambda f: {"path": "/jobs"}),
+    Case("GET", "/jobs/markers", 2, lambda f: {"path": "/jobs/markers?zoom=10"}),
+    Case("GET", "/jobs/clusters", 2, lambda f: {"path": "/jobs/clusters?zoom=8"}, cold=True),
+    Case("GET", "/jobs/changes", 2, lambda f: {"path": "/jobs/changes?since=0"}),
+    Case("GET", "/jobs/<job_number>", 1, lambda f: {"path": f"/jobs/{f.job_number}"}),
+    Case("GET", "/search", 2, lambda f: {"path": f"/search?q={f.client}"}),
+    Case(
+        "GET", "/autocomplete", 2,
+        lambda f: {"path": f"/autocomplete?field=client&q={f.client[:2]}"},
+        cold=True,
+    ),
+    Case(
+        "GET", "/geocode", 0,
+        lambda f: {"path": f"/geocode?address={f.address}"},
+        anonymous=True,
+    ),
+    Case(
+        "GET", "/assets/counties/<filename>", 0,
+        lambda f: {"path": "/assets/counties/counties.missing.json"},
+        status=404,
+    ),
+    Case("GET", "/counties/labels", 0, lambda f: {"path": "/counties/labels"}),
+    Case(
+        "PUT", "/jobs/<job_number>", 6,
+        lambda f: {"path": f"/jobs/{f.job_number}", "json": {"client": f.unique("Client ")}},
+    ),
+    Case(
+        "POST", "/jobs/<job_number>/fieldwork", 6,
+        lambda f: {"path": f"/jobs/{f.job_number}/fieldwork", "json": FIELDWORK},
+    ),
+    Case(
+        "GET", "/jobs/<job_number>/fieldwork", 2,
+        lambda f: {"path": f"/jobs/{f.job_number}/fieldwork"},
+    ),
+    Case(
+        "PUT", "/fieldwork/<int:entry_id>", 7,
+        lambda f: {"path": f"/fieldwork/{f.fieldwork_id}", "json": {"crew": f.unique("Crew ")}},
+    ),
+    Case("GET", "/login", 0, lambda f: {"path": "/login"}, anonymous=True),
+    Case(
+        "POST", "/login", 4,
+        lambda f: {"path": "/login", "data": login_form()},
+        status=302,
+        anonymous=True,
+    ),
+    Case("GET", "/logout", 0, lambda f: {"path": "/logout"}, status=302, anonymous=True),
+    # admin/routes.py
+    Case("GET", "/admin/", 0, lambda f: {"path": "/admin/"}),
+    Case("GET", "/admin/spa", 0, lambda f: {"path": "/admin/spa"}),
+    Case("GET", "/admin/users", 1, lambda f: {"path": "/admin/users"}),
+    Case(
+        "POST", "/admin/users/create", 4,
+        lambda f: {
+            "path": "/admin/users/create",
+            "data": {"username": f.unique("qb-"), "name": "QB", "password": "pw", "role": "user"},
+        },
+        status=302,
+    ),
+    Case(
+        "POST", "/admin/users/<int:user_id>/reset_password", 5,
+        lambda f: {
+            "path": f"/admin/users/{f.user_id}/reset_password",
+            "data": {"new_password": f.unique("pw-")},
+        },
+        status=302,
+    ),
+    Case(
+        "POST", "/admin/users/<int:user_id>/delete", 6,
+        lambda f: {"path": f"/admin/users/{f.new_user()}/delete"},
+        status=302,
+    ),
+    Case(
+        "POST", "/admin/users/<int:user_id>/toggle_role", 5,
+        lambda f: {"path": f"/admin/users/{f.user_id}/toggle_role"},
+        status=302,
+    ),
+    Case("GET", "/admin/jobs", 2, lambda f: {"path": "/admin/jobs"}),
+    Case(
+        "POST", "/admin/update_job/<int:job_id>", 5,
+        lambda f: {
+            "path": f"/admin/update_job/{f.job_id}",
+            "data": {"address": f.address, "client": f.unique("Client ")},
+        },
+        status=302,
+    ),
+    Case(
+        "POST", "/admin/delete_job/<int:job_id>", 5,
+        lambda f: {"path": f"/admin/delete_job/{f.new_job()}"},
+        status=302,
+    ),
+    Case(
+        "POST", "/admin/update_fieldwork/<int:entry_id>", 5,
+        lambda f: {
+            "path": f"/admin/update_fieldwork/{f.fieldwork_id}",
+            "data": {**FIELDWORK, "crew": f.unique("Crew ")},
+        },
+        status=302,
+    ),
+    Case(
+        "POST", "/admin/delete_fieldwork/<int:entry_id>", 5,
+        lambda f: {"path": f"/admin/delete_fieldwork/{f.new_fieldwork()}"},
+        status=302,
+    ),
+    Case(
+        "POST", "/admin/create_job", 5,
+        lambda f: {"path": "/admin/create_job", "data": new_job_form(f)},
+        status=302,
+    ),
+    Case(
+        "POST", "/admin/create_fieldwork/<job_id>", 5,
+        lambda f: {"path": f"/admin/create_fieldwork/{f.job_id}", "data": FIELDWORK},
+        status=302,
+    ),
+    Case("GET", "/admin/api/dashboard", 5, lambda f: {"path": "/admin/api/dashboard"}, cold=True),
+    Case("GET", "/admin/api/metrics", 0, lambda f: {"path": "/admin/api/metrics"}),
+    Case("GET", "/admin/api/jobs", 2, lambda f: {"path": "/admin/api/jobs"}),
+    Case("GET", "/admin/api/users", 2, lambda f: {"path": "/admin/api/users"}),
+    Case(
+        "POST", "/admin/api/users", 4,
+        lambda f: {
+            "path": "/admin/api/users",
+            "json": {"username": f.unique("qb-"), "name": "QB", "password": "pw", "role": "user"},
+        },
+    ),
+    Case(
+        "DELETE", "/admin/api/users/<int:user_id>", 6,
+        lambda f: {"path": f"/admin/api/users/{f.new_user()}"},
+    ),
+    Case(
+        "DELETE", "/admin/api/jobs/<int:job_id>", 5,
+        lambda f: {"path": f"/admin/api/jobs/{f.new_job()}"},
+    ),
+    Case(
+        "POST", "/admin/api/users/<int:user_id>/reset-password", 5,
+        lambda f: {
+            "path": f"/admin/api/users/{f.user_id}/reset-password",
+            "json": {"new_password": f.unique("pw-")},
+        },
+    ),
+    Case(
+        "POST", "/admin/api/users/<int:user_id>/toggle-role", 5,
+        lambda f: {"path": f"/admin/api/users/{f.user_id}/toggle-role"},
+    ),
+    Case(
+        "POST", "/admin/api/jobs", 7,
+        lambda f: {"path": "/admin/api/jobs", "json": new_job_form(f)},
+    ),
+    Case("GET", "/admin/api/jobs/<int:job_id>", 2, lambda f: {"path": f"/admin/api/jobs/{f.job_id}"}),
+    Case(
+        "PUT", "/admin/api/jobs/<int:job_id>", 6,
+        lambda f: {"path": f"/admin/api/jobs/{f.job_id}", "json": {"notes": f.unique("Note ")}},
+    ),
+    Case(
+        "GET", "/admin/api/fieldwork/<int:fieldwork_id>", 2,
+        lambda f: {"path": f"/admin/api/fieldwork/{f.fieldwork_id}"},
+    ),
+    Case(
+        "DELETE", "/admin/api/fieldwork/<int:fieldwork_id>", 5,
+        lambda f: {"path": f"/admin/api/fieldwork/{f.new_fieldwork()}"},
+    ),
+]
+
+# Routes without a budget, and why
+UNBUDGETED = {
+    ("GET", "/static/<path:filename>"): "serves files from disk",
+    ("GET", "/events"): "streams until the client disconnects",
+    ("GET", "/tiles/<layer>/<int:z>/<int:x>/<int:y>.mvt"): "needs PostGIS",
+}
+
+
+def login_form():
+    from bench.data import ADMIN_PASSWORD, ADMIN_USERNAME
+
+    return {"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD}
+
+
+def case_id(case):
+    return f"{case.method} {case.rule}"
+
+
+@pytest.fixture(scope="module")
+def measurements(app, statement_log):
+    """{(method, rule): {jobs: (status, statements)}} for both dataset sizes."""
+    results = {}
+    for jobs in (SMALL_JOBS, LARGE_JOBS):
+        seed(app, jobs)
+        fixtures = Fixtures(app)
+        client = app.test_client()
+        client.post("/login", data=login_form())
+
+        for case in CASES:
+            c = app.test_client() if case.anonymous else client
+            c.open(method=case.method, **case.request(fixtures))
+            if case.cold:
+                reset_caches()
+            with statement_log:
+                resp = c.open(method=case.method, **case.request(fixtures))
+            results.setdefault((case.method, case.rule), {})[jobs] = (
+                resp.status_code,
+                statement_log.statements,
+            )
+    return results
+
+
+def report(case, runs):
+    lines = [f"{case_id(case)} (budget {case.budget}):"]
+    for jobs, (status, statements) in runs.items():
+        lines.append(f"  {jobs} jobs: {len(statements)} statements")
+        lines.extend(f"    {s[:300]}" for s in statements)
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("case", CASES, ids=case_id)
+def test_within_budget(case, measurements):
+    runs = measurements[(case.method, case.rule)]
+    for jobs, (status, statements) in runs.items():
+        assert status == case.status, f"{case_id(case)} returned {status} with {jobs} jobs"
+    worst = max(len(statements) for _, statements in runs.values())
+    assert worst <= case.budget, report(case, runs)
+
+
+@pytest.mark.parametrize("case", CASES, ids=case_id)
+def test_statements_do_not_grow(case, measurements):
+    runs = measurements[(case.method, case.rule)]
+    small, large = len(runs[SMALL_JOBS][1]), len(runs[LARGE_JOBS][1])
+    assert large <= small, report(case, runs)
+
+
+def test_every_route_has_a_budget(app):
+    routes = {
+        (method, rule.rule)
+        for rule in app.url_map.iter_rules()
+        for method in rule.methods - {"HEAD", "OPTIONS"}
+    }
+    budgeted = {(case.method, case.rule) for case in CASES}
+    assert not routes - budgeted - UNBUDGETED.keys(), "routes without a budget"
+    assert not budgeted - routes, "budgets for routes that no longer exist"
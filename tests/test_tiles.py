@@ -0,0 +1,19 @@
+"""Which cached job tiles a changed point invalidates."""
+
+from tiles import JOB_TILE_MAX_ZOOM, tile_bounds, tiles_near, valid_tile
+
+
+def test_point_in_the_middle_of_a_tile_touches_only_that_tile():
+    assert tiles_near(28.5, -81.3, 10) == [(280, 427)]
+
+
+def test_point_on_a_tile_edge_touches_the_neighbour_too():
+    west, south, east, north = tile_bounds(12, 1120, 1710)
+    near = tiles_near((south + north) / 2, east - (east - west) * 0.001, 12)
+    assert sorted(near) == [(1120, 1710), (1121, 1710)]
+
+
+def test_job_tiles_stop_at_the_invalidated_zoom():
+    assert valid_tile("jobs", JOB_TILE_MAX_ZOOM, 0, 0)
+    assert not valid_tile("jobs", JOB_TILE_MAX_ZOOM + 1, 0, 0)
+    assert valid_tile("counties", JOB_TILE_MAX_ZOOM + 1, 0, 0)
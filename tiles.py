@@ -0,0 +1,166 @@
+"""
+Mapbox Vector Tiles for the map.
+
+Tiles are rendered by PostGIS (ST_AsMVT) and cached on disk under
+TILE_CACHE_DIR/<layer>/<z>/<x>/<y>.mvt. County tiles never change; a job
+tile is deleted whenever a job inside it or its edge buffer (before or
+after the change) is created, edited or deleted, so the next request
+re-renders just those tiles. Job tiles stop at JOB_TILE_MAX_ZOOM, the
+deepest level that is invalidated; clients overzoom past it. The cache
+lives on disk so every worker on the host shares it.
+
+A job tile rendered while a write commits can reach the disk after that
+write's invalidation ran. So the data version is read before rendering and
+again after the tile is stored, and the tile is dropped if it moved.
+"""
+
+import math
+import os
+import tempfile
+
+from sqlalchemy import text
+
+from changes import on_change
+from models import db
+from versioning import current_version
+
+TILE_CACHE_DIR = os.getenv(
+    "TILE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "tiles"),
+)
+TILE_MAX_ZOOM = 22
+# Job tiles are served, and invalidated, at every zoom up to this level
+JOB_TILE_MAX_ZOOM = int(os.getenv("JOB_TILE_MAX_ZOOM", "18"))
+# ST_AsMVTGeom's default buffer (256 of a 4096 extent), as a share of a tile
+TILE_BUFFER = 256 / 4096
+
+JOBS_SQL = text("""
+    WITH bounds AS (SELECT ST_TileEnvelope(:z, :x, :y) AS geom)
+    SELECT ST_AsMVT(tile, 'jobs') FROM (
+        SELECT j.id, j.job_number, j.status, j.county,
+               ST_AsMVTGeom(
+                   ST_Transform(ST_SetSRID(ST_MakePoint(j.longitude, j.latitude), 4326), 3857),
+                   bounds.geom
+               ) AS geom
+        FROM jobs j, bounds
+        WHERE j.deleted_at IS NULL
+          AND j.latitude BETWEEN :south AND :north
+          AND j.longitude BETWEEN :west AND :east
+    ) AS tile
+""")
+
+COUNTIES_SQL = text("""
+    WITH bounds AS (SELECT ST_TileEnvelope(:z, :x, :y) AS geom)
+    SELECT ST_AsMVT(tile, 'counties') FROM (
+        SELECT c.name,
+               ST_AsMVTGeom(ST_Transform(c.geometry, 3857), bounds.geom) AS geom
+        FROM counties c, bounds
+        WHERE ST_Intersects(c.geometry, ST_Transform(bounds.geom, 4326))
+    ) AS tile
+""")
+
+TILE_LAYERS = {"jobs": JOBS_SQL, "counties": COUNTIES_SQL}
+
+
+def tile_bounds(z, x, y):
+    """(west, south, east, north) of an XYZ tile in degrees."""
+    n = 2**z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def tile_position(lat, lng, z):
+    """Fractional XYZ tile coordinates of (lat, lng) at zoom z."""
+    n = 2**z
+    lat = min(max(lat, -85.05112878), 85.05112878)
+    sin = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)) * n
+    return (lng + 180) / 360 * n, y
+
+
+def tiles_near(lat, lng, z, buffer=TILE_BUFFER):
+    """(x, y) of every tile at zoom z whose buffered extent contains (lat, lng)."""
+    n = 2**z
+    fx, fy = tile_position(lat, lng, z)
+    xs = range(max(int(fx - buffer), 0), min(int(fx + buffer), n - 1) + 1)
+    ys = range(max(int(fy - buffer), 0), min(int(fy + buffer), n - 1) + 1)
+    return [(x, y) for x in xs for y in ys]
+
+
+def valid_tile(layer, z, x, y):
+    max_zoom = JOB_TILE_MAX_ZOOM if layer == "jobs" else TILE_MAX_ZOOM
+    return layer in TILE_LAYERS and 0 <= z <= max_zoom and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def _path(layer, z, x, y):
+    return os.path.join(TILE_CACHE_DIR, layer, str(z), str(x), f"{y}.mvt")
+
+
+def render_tile(layer, z, x, y):
+    west, south, east, north = tile_bounds(z, x, y)
+    # Pad the coordinate prefilter a little so points on the edge still render
+    pad_x, pad_y = (east - west) * 0.01, (north - south) * 0.01
+    params = {
+        "z": z, "x": x, "y": y,
+        "west": west - pad_x, "east": east + pad_x,
+        "south": south - pad_y, "north": north + pad_y,
+    }
+    with db.engine.connect() as conn:
+        tile = conn.execute(TILE_LAYERS[layer], params).scalar()
+    return bytes(tile) if tile else b""
+
+
+def get_tile(layer, z, x, y):
+    """Tile bytes from the disk cache, rendering and storing them on a miss."""
+    path = _path(layer, z, x, y)
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    versioned = layer == "jobs"
+    if versioned:
+        version = current_version()[0]
+    tile = render_tile(layer, z, x, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(tile)
+    os.replace(tmp, path)
+    # A write committed since the render may have invalidated before the
+    # replace; anything committed after this check invalidates the new file
+    if versioned and current_version()[0] != version:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return tile
+
+
+def invalidate_point(layer, lat, lng):
+    """Drop the cached tiles that can draw (lat, lng), at every zoom served."""
+    for z in range(JOB_TILE_MAX_ZOOM + 1):
+        for x, y in tiles_near(lat, lng, z):
+            try:
+                os.remove(_path(layer, z, x, y))
+            except FileNotFoundError:
+                pass
+
+
+@on_change
+def _invalidate_job_tiles(events):
+    for change in events:
+        if change["type"] != "job":
+            continue
+        data = change["data"]
+        points = {
+            (data["latitude"], data["longitude"]),
+            (data["previous_latitude"], data["previous_longitude"]),
+        }
+        for lat, lng in points:
+            if lat is not None and lng is not None:
+                invalidate_point("jobs", lat, lng)
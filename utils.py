@@ -1,9 +1,10 @@
-import requests
 from sqlalchemy import text
 from flask import current_app as app
 from models import db
+from county_index import get_county_index
+from property_links import get_property_link
 
-def get_county_from_coords(lat, lon):
+def _query_county(conn, lat, lon):
     sql = text("""
         SELECT name FROM counties
         WHERE ST_Contains(
@@ -12,18 +13,28 @@ def get_county_from_coords(lat, lon):
         )
         LIMIT 1;
     """)
+    result = conn.execute(sql, {"lon": lon, "lat": lat}).fetchone()
+    return result[0] if result else None
+
+def get_county_from_coords(lat, lon):
+    index = get_county_index()
+    if index is not None:
+        return index.lookup(float(lat), float(lon))
+
+    with db.engine.connect() as conn:
+        return _query_county(conn, lat, lon)
+
+def get_counties_for_coords(coords):
+    """Batch version of get_county_from_coords for a list of (lat, lon) pairs."""
+    if not coords:
+        return []
+    index = get_county_index()
+    if index is not None:
+        lats, lons = zip(*coords)
+        return index.lookup_many(lats, lons)
+
     with db.engine.connect() as conn:
-        result = conn.execute(sql, {"lon": lon, "lat": lat}).fetchone()
-        return result[0] if result else None
+        return [_query_county(conn, lat, lon) for lat, lon in coords]
 
 def get_brevard_property_link(address):
-    try:
-        url = "https://www.bcpao.us/api/records"
-        res = requests.get(url, params={"address": address})
-        res.raise_for_status()
-        data = res.json()
-        if data:
-            return f"https://www.bcpao.us/propertysearch/#/account/{data[0]['account']}"
-    except:
-        pass
-    return None
+    return get_property_link(address)
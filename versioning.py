@@ -0,0 +1,129 @@
+"""
+Data version and conditional GET.
+
+Any transaction that writes a Job, FieldWork or User also bumps the single
+`data_version` row in the same transaction, so the version is shared by all
+workers and can never run ahead of or behind the data. Sign-in bookkeeping
+on a User (last_login, last_ip, a rehashed password) doesn't count, or
+every login would invalidate every client's cached reads; views that show
+sign-in times cover them with a `key` (see below). Read endpoints
+wrapped in @conditional derive their ETag from it and answer matching
+If-None-Match / If-Modified-Since requests with a 304 before running any
+query or serializing anything.
+
+Views whose body depends on more than the version pass @conditional(key=...)
+a function that describes the rest: an in-process index's contents, or the
+latest sign-in. It goes into the ETag, so such a body is never cached under
+a version it doesn't match.
+"""
+
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import make_response, request, session
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import DataVersion, FieldWork, Job, User, db
+
+VERSIONED_MODELS = (Job, FieldWork, User)
+# User columns written at sign-in; changing only these doesn't bump the version
+LOGIN_COLUMNS = {"last_login", "last_ip", "password"}
+
+
+def bump_data_version(session):
+    """Bump the version inside `session`'s current transaction (once per transaction)."""
+    if session.info.get("data_version_bumped"):
+        return
+    session.info["data_version_bumped"] = True
+    now = func.timezone("UTC", func.now())
+    stmt = insert(DataVersion).values(id=1, version=1, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DataVersion.id],
+        set_={"version": DataVersion.version + 1, "updated_at": now},
+    )
+    session.connection().execute(stmt)
+
+
+def _login_only(obj):
+    state = inspect(obj)
+    changed = {
+        attr.key for attr in state.attrs if attr.history.has_changes()
+    }
+    return changed <= LOGIN_COLUMNS
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_write(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, VERSIONED_MODELS):
+            continue
+        if obj in session.dirty and (
+            not session.is_modified(obj, include_collections=False)
+            or (isinstance(obj, User) and _login_only(obj))
+        ):
+            continue
+        bump_data_version(session)
+        return
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset_bump(session):
+    session.info.pop("data_version_bumped", None)
+
+
+def current_version():
+    """(version, updated_at as an aware UTC datetime)."""
+    row = db.session.execute(
+        select(DataVersion.version, DataVersion.updated_at).where(DataVersion.id == 1)
+    ).first()
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def _etag(version, extra=None):
+    # The same URL can render differently per role, so that is part of the tag
+    key = f"{version}:{extra}:{session.get('role')}:{request.full_path}"
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def conditional(view=None, *, key=None):
+    """
+    Answer conditional GETs with 304 while the data version is unchanged.
+
+    `key`, if given, is called for a value that also has to be unchanged.
+    Such views get no Last-Modified, which can't express it.
+    """
+    if view is None:
+        return lambda view: conditional(view, key=key)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version, updated_at = current_version()
+        if key is not None:
+            updated_at = None
+        etag = _etag(version, key() if key is not None else None)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = bool(since and updated_at and updated_at <= since)
+        if not_modified:
+            resp = make_response("", 304)
+        else:
+            resp = make_response(view(*args, **kwargs))
+            if resp.status_code != 200:
+                return resp
+
+        resp.set_etag(etag)
+        if updated_at:
+            resp.last_modified = updated_at
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
+
+    return wrapper